@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+依頼単位のアーカイブマニフェスト
+- DB登録と同じ対象（アーカイブ後処理完了ファイル）を gzip 圧縮CSVにまとめ、
+  S3の {prefix}/{request_id}/{日時}_{ホスト名}_{PID}.csv.gz にアップロード
+- データベース登録の前にアップロードするため、DB登録に失敗した場合やDBを失った場合でも
+  元ファイルパスとS3キーの対応が残る（manifest_rebuild.py で archive_history を再構築）
+- checksum=sha256 の場合はアップロード前に元ファイルのSHA-256を計算して記録
+  （元ファイルを追加で1回読み込むため既定は無効）
+
+マニフェストの列は MANIFEST_COLUMNS の順（1行目はヘッダ）。
+依頼単位の項目（request_id 等）も各行に持つが、gzip でほぼ圧縮される。
+"""
+
+import csv
+import datetime
+import gzip
+import hashlib
+import io
+import logging
+import os
+import socket
+import tempfile
+import uuid
+from typing import Dict, Optional
+
+MANIFEST_COLUMNS = ['request_id', 'requester', 'request_date', 'archive_date',
+                    'original_file_path', 's3_path', 'file_size', 'file_mtime', 'checksum']
+
+CHECKSUM_ALGORITHMS = ('none', 'sha256')
+
+
+def file_checksum(file_path: str, chunk_size: int = 8388608) -> str:
+    """ファイルのSHA-256（16進）"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ManifestWriter:
+    """マニフェストの作成・アップロードクラス"""
+
+    def __init__(self, prefix: str = '_manifests', checksum: str = 'none', storage_class: str = 'STANDARD',
+                 logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            prefix: マニフェストを置くS3キープレフィックス
+            checksum: 元ファイルのチェックサム（none / sha256）
+            storage_class: マニフェストのストレージクラス（再構築時に即時読み出せるクラス）
+            logger: ログ出力先
+        """
+        self.prefix = prefix.strip('/')
+        self.logger = logger or logging.getLogger(__name__)
+        if checksum not in CHECKSUM_ALGORITHMS:
+            self.logger.warning(f"無効なチェックサム指定: {checksum} - none を使用します")
+            checksum = 'none'
+        self.checksum = checksum
+        self.storage_class = storage_class
+
+    @classmethod
+    def from_config(cls, config: Dict, logger: Optional[logging.Logger] = None) -> Optional['ManifestWriter']:
+        """設定辞書（manifestセクション）から生成（無効時はNone）"""
+        if not config.get('enabled', True):
+            return None
+        return cls(
+            config.get('prefix', '_manifests'),
+            checksum=config.get('checksum', 'none'),
+            storage_class=config.get('storage_class', 'STANDARD'),
+            logger=logger
+        )
+
+    def manifest_key(self, request_id: str, created_at: datetime.datetime) -> str:
+        """
+        マニフェストのS3キー
+
+        日時（秒単位）・ホスト名・PID は確認用で、一意性は末尾の UUID で保証する
+        （ワーカーモードでは同じプロセスが同じ秒に同一依頼のバッチを続けて登録することがある）
+        """
+        name = (f"{created_at.strftime('%Y%m%d_%H%M%S')}_{socket.gethostname()}_{os.getpid()}_"
+                f"{uuid.uuid4().hex}.csv.gz")
+        return f"{self.prefix}/{request_id}/{name}"
+
+    def write(self, fileobj, results, bucket_name: str, request_id: str, requester: str,
+              request_date: datetime.datetime, archive_date: datetime.datetime) -> int:
+        """
+        マニフェスト本体（gzip圧縮CSV）の書き込み
+
+        Args:
+            fileobj: 書き込み先（バイナリ）
+            results: 処理結果（FileRecordStore または ResultsLog、completed() の行を出力）
+
+        Returns:
+            int: 出力件数
+        """
+        count = 0
+        with gzip.GzipFile(fileobj=fileobj, mode='wb') as gz:
+            with io.TextIOWrapper(gz, encoding='utf-8', newline='') as text:
+                writer = csv.writer(text)
+                writer.writerow(MANIFEST_COLUMNS)
+                for result in results.completed():
+                    writer.writerow([
+                        request_id, requester, request_date.isoformat(), archive_date.isoformat(),
+                        result.path, f"s3://{bucket_name}/{result.s3_key}", result.size,
+                        result.mtime, result.checksum or ''
+                    ])
+                    count += 1
+        return count
+
+    def upload(self, s3_client, retry_policy, results, bucket_name: str, request_id: str, requester: str,
+               request_date: datetime.datetime, archive_date: datetime.datetime) -> Optional[str]:
+        """
+        マニフェストの作成・アップロード（一時ファイル経由、全件をメモリに載せない）
+
+        Returns:
+            Optional[str]: アップロードしたS3キー（失敗時はNone）
+        """
+        key = self.manifest_key(request_id, archive_date)
+        with tempfile.TemporaryFile() as f:
+            count = self.write(f, results, bucket_name, request_id, requester, request_date, archive_date)
+            size = f.tell()
+
+            def upload():
+                f.seek(0)
+                s3_client.upload_fileobj(f, bucket_name, key,
+                                         ExtraArgs={'StorageClass': self.storage_class,
+                                                    'ContentType': 'text/csv',
+                                                    'ContentEncoding': 'gzip'})
+
+            outcome = retry_policy.call(upload, 'upload', key)
+        if not outcome['success']:
+            self.logger.error(f"マニフェストアップロード失敗: {key} - {retry_policy.failure_message(outcome)}")
+            return None
+        self.logger.info(f"マニフェストアップロード完了: s3://{bucket_name}/{key} ({count:,}件 / {size:,} bytes)")
+        return key
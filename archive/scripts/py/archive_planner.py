@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+アーカイブ実行計画（--plan）
+- CSV検証・ファイル列挙のみを行い、S3・データベースには一切アクセスしない
+- ディレクトリごとのサイズ分布・拡張子別の件数と容量を集計
+- 直近の実行レポート（logs/archive_*.metrics.json）の PUT 実績から
+  ワーカー1本あたりの転送速度を求め、設定の並列数で UploadScheduler の計画を立てて所要時間を推定
+- 結果はログとJSONレポート（ログファイルと同名の .plan.json）に出力
+"""
+
+import bisect
+import datetime
+import json
+import logging
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from upload_scheduler import UploadScheduler
+
+# サイズ分布の区切り（bytes）とラベル
+SIZE_BUCKET_BOUNDS = [65536, 1048576, 8388608, 67108864, 1073741824]
+SIZE_BUCKET_LABELS = ['<64KB', '64KB-1MB', '1MB-8MB', '8MB-64MB', '64MB-1GB', '>=1GB']
+
+
+def _size_histogram(sizes: List[int]) -> Dict[str, Dict]:
+    """サイズ区分ごとの件数・容量"""
+    histogram = {label: {'files': 0, 'bytes': 0} for label in SIZE_BUCKET_LABELS}
+    for size in sizes:
+        bucket = histogram[SIZE_BUCKET_LABELS[bisect.bisect_right(SIZE_BUCKET_BOUNDS, size)]]
+        bucket['files'] += 1
+        bucket['bytes'] += size
+    return histogram
+
+
+def _extension_histogram(records, top: int) -> List[Dict]:
+    """拡張子ごとの件数・容量（容量の大きい順に上位 top 件、残りは「その他」）"""
+    files = Counter()
+    sizes = Counter()
+    for record in records:
+        dot = record.name.rfind('.')
+        ext = record.name[dot:].lower() if dot > 0 else '(なし)'
+        files[ext] += 1
+        sizes[ext] += record.size
+
+    ranked = sizes.most_common()
+    histogram = [{'extension': ext, 'files': files[ext], 'bytes': size} for ext, size in ranked[:top]]
+    rest = ranked[top:]
+    if rest:
+        histogram.append({
+            'extension': 'その他',
+            'files': sum(files[ext] for ext, _ in rest),
+            'bytes': sum(size for _, size in rest)
+        })
+    return histogram
+
+
+def _format_duration(seconds: float) -> str:
+    return str(datetime.timedelta(seconds=int(seconds)))
+
+
+class ArchivePlanner:
+    """アーカイブ実行計画の作成クラス"""
+
+    def __init__(self, processor, logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            processor: ArchiveProcessor（設定・CSV検証・ファイル列挙を利用）
+            logger: ログ出力先
+        """
+        self.processor = processor
+        self.config = processor.config
+        self.logger = logger or processor.logger
+        plan_config = self.config.get('plan', {})
+        self.history_runs = plan_config.get('history_runs', 5)
+        self.default_worker_mbps = plan_config.get('default_worker_mbps', 10.0)
+        self.top_extensions = plan_config.get('top_extensions', 10)
+
+    def measured_worker_throughput(self) -> Dict:
+        """
+        直近の実行レポートからワーカー1本あたりの転送速度を算出
+
+        PUT の (転送量 + 件数 × per_file_overhead_bytes) / PUT所要時間の合計 を
+        UploadScheduler のコスト（バイト換算）に対する速度として用いる。
+        実績がない場合は plan.default_worker_mbps を使用する。
+        """
+        overhead = self.config.get('processing', {}).get('per_file_overhead_bytes', 262144)
+        log_directory = Path(self.config.get('logging', {}).get('log_directory', 'logs'))
+        reports = sorted(log_directory.glob('archive_*.metrics.json'),
+                         key=lambda path: path.stat().st_mtime, reverse=True)
+
+        used = []
+        total_cost = 0
+        total_seconds = 0.0
+        for report_path in reports:
+            if len(used) >= self.history_runs:
+                break
+            try:
+                with open(report_path, 'r', encoding='utf-8') as f:
+                    put = json.load(f).get('operations', {}).get('put', {})
+            except (OSError, ValueError):
+                continue
+            if not put.get('bytes') or not put.get('total_seconds'):
+                continue
+            used.append(report_path.name)
+            total_cost += put['bytes'] + put['count'] * overhead
+            total_seconds += put['total_seconds']
+
+        if used:
+            return {'source': 'measured', 'reports': used,
+                    'worker_bytes_per_sec': round(total_cost / total_seconds, 1)}
+        return {'source': 'default', 'reports': [],
+                'worker_bytes_per_sec': self.default_worker_mbps * 1048576}
+
+    def _bandwidth_cap(self) -> Optional[float]:
+        """帯域制御の上限（bytes/sec、時間帯スケジュールを含めた最小値）"""
+        bandwidth_config = self.config.get('bandwidth', {})
+        if not bandwidth_config.get('enabled', False):
+            return None
+        limits = [window.get('mbps', 0) for window in bandwidth_config.get('schedule', [])]
+        limits.append(bandwidth_config.get('default_mbps', 0))
+        limits = [mbps for mbps in limits if mbps and mbps > 0]
+        return min(limits) * 1000000 / 8 if limits else None
+
+    def create_plan(self, csv_path: str, request_id: Optional[str] = None) -> int:
+        """
+        実行計画の作成（S3・データベースにはアクセスしない）
+
+        Returns:
+            int: 終了コード
+        """
+        processor = self.processor
+        self.logger.info(f"アーカイブ実行計画の作成開始 - CSV: {csv_path}")
+
+        directories, csv_errors = processor.validate_csv_input(csv_path)
+        if not directories:
+            self.logger.error("処理対象のディレクトリが見つかりません")
+            return 1
+
+        with processor.metrics.stage('enumeration'):
+            files = processor.collect_files(directories)
+        enumeration_seconds = processor.metrics.summary()['stages']['enumeration']['seconds']
+
+        processing_config = self.config.get('processing', {})
+        workers = max(1, int(processing_config.get('parallel_workers', 1)))
+        scheduler = UploadScheduler(
+            workers=workers,
+            small_file_threshold=processing_config.get('small_file_threshold', 8388608),
+            per_file_overhead_bytes=processing_config.get('per_file_overhead_bytes', 262144),
+            logger=self.logger
+        )
+        scheduler.plan(files)
+        throughput = self.measured_worker_throughput()
+        worker_bps = throughput['worker_bytes_per_sec']
+        total_size = files.total_size()
+
+        estimate = None
+        if scheduler.last_plan:
+            upload_seconds = scheduler.last_plan['estimated_makespan_bytes'] / worker_bps
+            bandwidth_cap = self._bandwidth_cap()
+            if bandwidth_cap:
+                upload_seconds = max(upload_seconds, total_size / bandwidth_cap)
+            estimate = {
+                'workers': workers,
+                'worker_bytes_per_sec': worker_bps,
+                'throughput_source': throughput['source'],
+                'throughput_reports': throughput['reports'],
+                'bandwidth_cap_bytes_per_sec': bandwidth_cap,
+                'estimated_makespan_bytes': scheduler.last_plan['estimated_makespan_bytes'],
+                'estimated_upload_seconds': round(upload_seconds, 1),
+                'largest_files': scheduler.last_plan['largest_files'],
+            }
+
+        by_directory = {directory: [] for directory in directories}
+        for record in files:
+            by_directory[record.directory].append(record)
+        directory_reports = [
+            {
+                'directory': directory,
+                'files': len(records),
+                'bytes': sum(record.size for record in records),
+                'size_histogram': _size_histogram([record.size for record in records]),
+                'extensions': _extension_histogram(records, self.top_extensions),
+            }
+            for directory, records in by_directory.items()
+        ]
+
+        report = {
+            'request_id': request_id,
+            'csv_path': csv_path,
+            'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'directories': len(directories),
+            'csv_errors': len(csv_errors),
+            'total_files': len(files),
+            'total_bytes': total_size,
+            'enumeration_seconds': round(enumeration_seconds, 3),
+            'size_histogram': _size_histogram([record.size for record in files]),
+            'extensions': _extension_histogram(files, self.top_extensions),
+            'estimate': estimate,
+            'by_directory': directory_reports,
+        }
+        self._log_report(report)
+        self._write_report(report)
+        return 0
+
+    def _log_report(self, report: Dict) -> None:
+        """計画内容のログ出力"""
+        self.logger.info("=== アーカイブ実行計画 ===")
+        self.logger.info(f"対象ディレクトリ: {report['directories']}件 (CSV検証エラー: {report['csv_errors']}件)")
+        self.logger.info(f"対象ファイル: {report['total_files']:,}件 / {report['total_bytes']:,} bytes "
+                         f"(列挙所要時間: {report['enumeration_seconds']:,.1f}秒)")
+        self.logger.info("サイズ分布:")
+        for label, bucket in report['size_histogram'].items():
+            if bucket['files']:
+                self.logger.info(f"  {label:>9}: {bucket['files']:,}件 / {bucket['bytes']:,} bytes")
+        self.logger.info("拡張子別（容量順）:")
+        for item in report['extensions']:
+            self.logger.info(f"  {item['extension']}: {item['files']:,}件 / {item['bytes']:,} bytes")
+
+        estimate = report['estimate']
+        if not estimate:
+            return
+        source = ('直近の実行実績 ' + ', '.join(estimate['throughput_reports'])
+                  if estimate['throughput_source'] == 'measured' else '既定値（plan.default_worker_mbps）')
+        self.logger.info(f"ワーカー1本あたりの転送速度: {estimate['worker_bytes_per_sec'] / 1048576:.2f} MB/s ({source})")
+        if estimate['bandwidth_cap_bytes_per_sec']:
+            self.logger.info(f"帯域上限: {estimate['bandwidth_cap_bytes_per_sec'] / 1048576:.2f} MB/s")
+        self.logger.info(f"並列数: {estimate['workers']} / 推定アップロード所要時間: "
+                         f"{_format_duration(estimate['estimated_upload_seconds'])}")
+
+    def _write_report(self, report: Dict) -> Optional[Path]:
+        """JSONレポートの出力（ログファイルと同名の .plan.json）"""
+        processor = self.processor
+        if processor.log_file:
+            report_path = Path(processor.log_file).with_suffix('.plan.json')
+        else:
+            timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+            log_directory = self.config.get('logging', {}).get('log_directory', 'logs')
+            report_path = Path(log_directory) / f"archive_{timestamp}.plan.json"
+        try:
+            report_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(report_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+            self.logger.info(f"実行計画レポート出力: {report_path}")
+            return report_path
+        except Exception as e:
+            self.logger.error(f"実行計画レポート出力エラー: {e}")
+            return None
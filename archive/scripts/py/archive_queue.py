@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PostgreSQL作業キューによるアーカイブ分散処理
+- 依頼CSVをファイル単位のタスクとして archive_tasks に登録（--enqueue）
+- ワーカーは SELECT ... FOR UPDATE SKIP LOCKED でタスクを取得して処理（--worker）
+- 複数プロセス・複数EC2で同じ依頼を二重処理なく並列に消化
+- テーブル定義: sql/archive_queue_schema.sql
+"""
+
+import datetime
+import os
+import socket
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from file_records import FileRecordStore
+from metrics_exporter import PrometheusTextfileExporter
+from upload_scheduler import UploadScheduler
+
+
+class ArchiveQueue:
+    """アーカイブ作業キュー（archive_jobs / archive_tasks）の操作クラス"""
+
+    def __init__(self, processor, worker_id: Optional[str] = None):
+        """
+        Args:
+            processor: ArchiveProcessor（設定・ロガー・各処理ステージを利用）
+            worker_id: ワーカー識別子（省略時は ホスト名-PID）
+        """
+        self.processor = processor
+        self.logger = processor.logger
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+
+        queue_config = processor.config.get('queue', {})
+        self.batch_size = queue_config.get('batch_size', 100)
+        self.lease_seconds = queue_config.get('lease_seconds', 1800)
+        self.poll_interval = queue_config.get('poll_interval', 30)
+        self.exit_when_idle = queue_config.get('exit_when_idle', True)
+        self.max_attempts = queue_config.get('max_attempts', 3)
+
+        self._jobs = {}  # job_id -> ジョブ情報のキャッシュ
+        self._conn = None  # キュー操作用のDB接続（ワーカー実行中は使い回す）
+        self._heartbeat_stop = threading.Event()
+        self._held_task_ids = set()  # 処理中（リース保持中）のタスクID
+        self._held_lock = threading.Lock()
+        # リース喪失（延長失敗・他ワーカーによる再取得）の通知。処理側は未着手のアップロード・削除を中断する
+        self._lease_lost = threading.Event()
+        processor.stop_event = self._lease_lost
+
+    # ------------------------------------------------------------------
+    # 依頼登録
+    # ------------------------------------------------------------------
+    def enqueue(self, csv_path: str, request_id: str) -> int:
+        """依頼CSVを検証・列挙し、ジョブとファイル単位のタスクを登録"""
+        self.logger.info(f"キュー登録開始 - Request ID: {request_id}")
+
+        directories, csv_errors = self.processor.validate_csv_input(csv_path)
+        if csv_errors:
+            error_csv_path = self.processor.generate_csv_error_file(csv_path)
+            self.logger.warning(f"CSV検証エラーが発生しました: {error_csv_path}")
+
+        if not directories:
+            self.logger.error("処理対象のディレクトリが見つかりません")
+            return 1
+
+        files = self.processor.collect_files(directories)
+        if not files:
+            self.logger.warning("処理対象のファイルが見つかりません")
+            return 0
+
+        # タスクIDの順に取得されるため、登録順を大ファイル優先の計画順にする
+        processing_config = self.processor.config.get('processing', {})
+        scheduler = UploadScheduler(
+            workers=processing_config.get('parallel_workers', 1),
+            small_file_threshold=processing_config.get('small_file_threshold', 8388608),
+            per_file_overhead_bytes=processing_config.get('per_file_overhead_bytes', 262144),
+            logger=self.logger
+        )
+        ordered_files = scheduler.plan(files)
+
+        requester = self.processor.config.get('request', {}).get('requester', '00000000')
+
+        try:
+            from psycopg2.extras import execute_values
+
+            conn = self.processor._connect_database()
+            with conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        """
+                        INSERT INTO archive_jobs (request_id, requester, csv_path, total_tasks)
+                        VALUES (%s, %s, %s, %s)
+                        RETURNING job_id
+                        """,
+                        (request_id, requester, os.path.abspath(csv_path), len(ordered_files))
+                    )
+                    job_id = cursor.fetchone()[0]
+
+                    rows = [
+                        (job_id, f.path, f.directory, f.size, f.modified_time)
+                        for f in ordered_files
+                    ]
+                    execute_values(
+                        cursor,
+                        """
+                        INSERT INTO archive_tasks (job_id, file_path, directory, file_size, modified_time)
+                        VALUES %s
+                        """,
+                        rows,
+                        page_size=1000
+                    )
+
+            self.logger.info(f"キュー登録完了 - Job ID: {job_id}, タスク数: {len(ordered_files)}件")
+            return 0
+
+        except Exception as e:
+            self.logger.error(f"キュー登録エラー: {str(e)}")
+            return 1
+
+        finally:
+            try:
+                if 'conn' in locals():
+                    conn.close()
+            except Exception:
+                pass
+
+    # ------------------------------------------------------------------
+    # ワーカー
+    # ------------------------------------------------------------------
+    def run_worker(self, request_id: Optional[str] = None) -> int:
+        """
+        ワーカーモードの実行（メトリクスはワーカーごとのファイルに出力）
+
+        Args:
+            request_id: 指定時はこの依頼のタスクのみ処理
+        """
+        exporter = PrometheusTextfileExporter.from_config(
+            self.processor.config.get('metrics', {}).get('prometheus_textfile', {}),
+            self.processor.metrics, 'archive', 'put', {'worker_id': self.worker_id}, self.worker_id, self.logger
+        )
+        if exporter:
+            exporter.start()
+        exit_code = 1
+        try:
+            exit_code = self._run_worker_loop(request_id)
+            return exit_code
+        finally:
+            if exporter:
+                exporter.stop(exit_code)
+
+    def _run_worker_loop(self, request_id: Optional[str]) -> int:
+        """ワーカーモードのメインループ"""
+        stats = self.processor.stats
+        stats['start_time'] = datetime.datetime.now()
+        self.logger.info(f"ワーカー開始 - Worker ID: {self.worker_id}")
+        if request_id:
+            self.logger.info(f"処理対象依頼: {request_id}")
+
+        heartbeat = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        heartbeat.start()
+
+        try:
+            while True:
+                self._requeue_stale_tasks()
+                tasks = self._claim_tasks(request_id)
+
+                if tasks:
+                    self._process_tasks(tasks)
+                    if self._lease_lost.is_set():
+                        self.logger.error("リースを失ったためワーカーを終了します"
+                                          "（未完了のタスクはリース期限後に他のワーカーが再取得します）")
+                        return 1
+                    self._finalize_jobs()
+                    continue
+
+                self._finalize_jobs()
+                if self.exit_when_idle:
+                    self.logger.info("処理待ちタスクがないためワーカーを終了します")
+                    break
+                time.sleep(self.poll_interval)
+
+            return 0
+
+        except KeyboardInterrupt:
+            self.logger.warning("ワーカーを中断しました（処理中タスクはリース期限後に再取得されます）")
+            return 1
+
+        except Exception as e:
+            self.logger.error(f"ワーカー処理中にエラーが発生しました: {str(e)}")
+            return 1
+
+        finally:
+            self._heartbeat_stop.set()
+            self.processor._shutdown_deletion_stage()
+            self._close_connection()
+            stats['end_time'] = datetime.datetime.now()
+            self.processor.print_statistics()
+
+    def _claim_tasks(self, request_id: Optional[str] = None) -> List[Dict]:
+        """処理待ちタスクを取得（他ワーカーがロック中の行はスキップ）"""
+        request_filter = "AND j.request_id = %s" if request_id else ""
+        params = [self.worker_id]
+        if request_id:
+            params.append(request_id)
+        params.append(self.batch_size)
+
+        conn = self._connection()
+        with conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    UPDATE archive_tasks
+                    SET status = 'running', worker_id = %s,
+                        claimed_at = CURRENT_TIMESTAMP, attempts = attempts + 1
+                    WHERE task_id IN (
+                        SELECT t.task_id
+                        FROM archive_tasks t
+                        JOIN archive_jobs j ON j.job_id = t.job_id
+                        WHERE t.status = 'pending' {request_filter}
+                        ORDER BY t.task_id
+                        LIMIT %s
+                        FOR UPDATE OF t SKIP LOCKED
+                    )
+                    RETURNING task_id, job_id, file_path, directory, file_size, modified_time, attempts
+                    """,
+                    params
+                )
+                rows = cursor.fetchall()
+
+                job_ids = sorted({row[1] for row in rows})
+                if job_ids:
+                    cursor.execute(
+                        "UPDATE archive_jobs SET status = 'running' WHERE job_id = ANY(%s) AND status = 'pending'",
+                        (job_ids,)
+                    )
+
+        tasks = [
+            {
+                'task_id': task_id,
+                'job_id': job_id,
+                'path': file_path,
+                'directory': directory,
+                'size': file_size or 0,
+                'modified_time': modified_time,
+                'attempts': attempts
+            }
+            for task_id, job_id, file_path, directory, file_size, modified_time, attempts in rows
+        ]
+        with self._held_lock:
+            self._held_task_ids = {task['task_id'] for task in tasks}
+        if tasks:
+            self.logger.info(f"タスク取得: {len(tasks)}件")
+        return tasks
+
+    def _process_tasks(self, tasks: List[Dict]) -> None:
+        """取得したタスクをジョブ単位でアップロード・削除・DB登録"""
+        tasks_by_job = {}
+        for task in tasks:
+            tasks_by_job.setdefault(task['job_id'], []).append(task)
+
+        try:
+            for job_id, job_tasks in tasks_by_job.items():
+                if self._lease_lost.is_set():
+                    break
+                job = self._get_job(job_id)
+                self.processor.request_id = job['request_id']
+                self.processor.requester = job['requester']
+                self.logger.info(f"タスク処理開始 - Request ID: {job['request_id']} ({len(job_tasks)}件)")
+
+                stats = self.processor.stats
+                job_tasks, archived_count = self._skip_archived_tasks(job, job_tasks)
+                stats['total_files'] += archived_count
+                stats['processed_files'] += archived_count
+                if not job_tasks:
+                    continue
+
+                upload_results = self.processor.archive_to_s3(job_tasks)
+                processed_results = self.processor.create_archived_files(upload_results)
+                # リース喪失時も削除済みの元ファイルは履歴に登録する（再取得したワーカーが処理済みと判定できるように）
+                self.processor.save_to_database(processed_results)
+                self._complete_tasks(job_tasks, processed_results)
+
+                stats['total_files'] += len(job_tasks)
+                stats['total_size'] += sum(task['size'] for task in job_tasks)
+                processed_count = processed_results.count_successful()
+                stats['processed_files'] += processed_count
+                stats['failed_files'] += processed_results.count_failed()
+                stats['skipped_files'] += processed_results.count_skipped()
+        finally:
+            with self._held_lock:
+                self._held_task_ids = set()
+
+    def _skip_archived_tasks(self, job: Dict, tasks: List[Dict]) -> Tuple[List[Dict], int]:
+        """
+        再取得したタスクのうち、前回の処理でアーカイブ済み（archive_history に登録済み）のものを完了にする
+
+        前回のワーカーが元ファイル削除まで終えてからリースを失った場合に、
+        元ファイルが見つからず失敗扱いになることを防ぐ。
+
+        Returns:
+            Tuple[List[Dict], int]: 処理が必要なタスク, 完了にしたタスク数
+        """
+        reclaimed = [task for task in tasks if task['attempts'] > 1]
+        if not reclaimed:
+            return tasks, 0
+
+        conn = self._connection()
+        with conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT original_file_path, s3_path FROM archive_history
+                    WHERE request_id = %s AND original_file_path = ANY(%s)
+                    """,
+                    (job['request_id'], [task['path'] for task in reclaimed])
+                )
+                archived = dict(cursor.fetchall())
+                if archived:
+                    cursor.executemany(
+                        """
+                        UPDATE archive_tasks
+                        SET status = 'completed', s3_key = %s, error = NULL, completed_at = CURRENT_TIMESTAMP
+                        WHERE task_id = %s AND worker_id = %s AND status = 'running'
+                        """,
+                        [
+                            (self._s3_key_from_path(archived[task['path']]), task['task_id'], self.worker_id)
+                            for task in reclaimed if task['path'] in archived
+                        ]
+                    )
+
+        if not archived:
+            return tasks, 0
+        self.logger.info(f"前回の処理でアーカイブ済みのため完了にしたタスク: {len(archived)}件")
+        return [task for task in tasks if task['path'] not in archived], len(archived)
+
+    @staticmethod
+    def _s3_key_from_path(s3_path: str) -> str:
+        """s3://bucket/key 形式からキーを取り出す"""
+        if s3_path.startswith('s3://'):
+            parts = s3_path[5:].split('/', 1)
+            return parts[1] if len(parts) > 1 else ''
+        return s3_path
+
+    def _complete_tasks(self, tasks: List[Dict], results: FileRecordStore) -> None:
+        """
+        タスクの処理結果を記録（自ワーカーが保持するタスクのみ更新）
+
+        リース喪失後は元ファイル削除まで完了したタスクのみ記録し、
+        それ以外は処理中のまま残してリース期限後の再取得に任せる。
+        """
+        task_ids = {task['path']: task['task_id'] for task in tasks}
+        lease_lost = self._lease_lost.is_set()
+        updates = []
+        for result in results:
+            if lease_lost and not (result.archive_completed or result.skipped):
+                continue
+            # アーカイブ済みのためスキップしたファイルは処理不要として完了にする
+            status = 'completed' if result.archive_completed or result.skipped else 'failed'
+            updates.append((
+                status, result.s3_key, result.error,
+                task_ids[result.path], self.worker_id
+            ))
+
+        conn = self._connection()
+        with conn:
+            with conn.cursor() as cursor:
+                cursor.executemany(
+                    """
+                    UPDATE archive_tasks
+                    SET status = %s, s3_key = %s, error = %s, completed_at = CURRENT_TIMESTAMP
+                    WHERE task_id = %s AND worker_id = %s AND status = 'running'
+                    """,
+                    updates
+                )
+
+    def _finalize_jobs(self) -> None:
+        """全タスクが終了したジョブを完了にし、ディレクトリリネーム・エラーCSV生成を行う"""
+        conn = self._connection()
+        with conn:
+            with conn.cursor() as cursor:
+                # 完了判定は1ワーカーのみが成功する（行ロックで直列化）
+                # 失敗タスクを含むジョブは 'failed'（再試行用CSVから別依頼として再実行する）
+                cursor.execute(
+                    """
+                    UPDATE archive_jobs j
+                    SET status = CASE
+                            WHEN EXISTS (
+                                SELECT 1 FROM archive_tasks t
+                                WHERE t.job_id = j.job_id AND t.status = 'failed'
+                            ) THEN 'failed'
+                            ELSE 'completed'
+                        END,
+                        completed_at = CURRENT_TIMESTAMP
+                    WHERE j.status = 'running'
+                      AND NOT EXISTS (
+                          SELECT 1 FROM archive_tasks t
+                          WHERE t.job_id = j.job_id AND t.status IN ('pending', 'running')
+                      )
+                    RETURNING j.job_id, j.request_id, j.csv_path, j.status
+                    """
+                )
+                finished_jobs = cursor.fetchall()
+
+        for job_id, request_id, csv_path, job_status in finished_jobs:
+            with conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT file_path, directory, status, error FROM archive_tasks WHERE job_id = %s",
+                        (job_id,)
+                    )
+                    rows = cursor.fetchall()
+
+            results = FileRecordStore()
+            for file_path, directory, status, error in rows:
+                record = results.add(*os.path.split(file_path), 0, 0.0, directory)
+                record.success = status == 'completed'
+                record.error = error
+            if job_status == 'failed':
+                self.logger.warning(f"ジョブ終了（失敗あり） - Request ID: {request_id} "
+                                    f"({len(results)}件中 失敗 {results.count_failed()}件)")
+            else:
+                self.logger.info(f"ジョブ完了 - Request ID: {request_id} ({len(results)}件)")
+
+            self.processor.request_id = request_id
+            self.processor.rename_archived_directories(results)
+
+            if results.count_failed():
+                archive_error_csv = self.processor.generate_error_csv(results, csv_path)
+                self.logger.warning(f"アーカイブエラーが発生したファイルがあります: {archive_error_csv}")
+
+    def _requeue_stale_tasks(self) -> None:
+        """リース期限切れの処理中タスクを再取得可能に戻す（上限回数超過は失敗扱い）"""
+        conn = self._connection()
+        with conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    UPDATE archive_tasks
+                    SET status = CASE WHEN attempts >= %s THEN 'failed' ELSE 'pending' END,
+                        error = CASE WHEN attempts >= %s THEN 'リース期限切れ（最大試行回数到達）' ELSE error END,
+                        worker_id = NULL, claimed_at = NULL
+                    WHERE status = 'running'
+                      AND claimed_at < CURRENT_TIMESTAMP - make_interval(secs => %s)
+                    """,
+                    (self.max_attempts, self.max_attempts, self.lease_seconds)
+                )
+                if cursor.rowcount:
+                    self.logger.warning(f"リース期限切れタスクを戻しました: {cursor.rowcount}件")
+
+    def _heartbeat_loop(self) -> None:
+        """
+        処理中タスクのリースを定期的に延長
+
+        延長に失敗した場合、または保持中のタスクが他ワーカーに再取得されていた場合はリース喪失とし、
+        処理側に中断を通知する（期限切れ後に別ワーカーが同じタスクを処理するため）。
+        """
+        interval = max(5, self.lease_seconds // 3)
+        while not self._heartbeat_stop.wait(interval):
+            with self._held_lock:
+                held_task_ids = sorted(self._held_task_ids)
+            if not held_task_ids or self._lease_lost.is_set():
+                continue
+            try:
+                conn = self.processor._connect_database()
+                try:
+                    with conn:
+                        with conn.cursor() as cursor:
+                            # 完了記録済みのタスクも worker_id は自ワーカーのまま（再取得されると変わる）
+                            cursor.execute(
+                                """
+                                UPDATE archive_tasks
+                                SET claimed_at = CASE WHEN status = 'running' THEN CURRENT_TIMESTAMP ELSE claimed_at END
+                                WHERE task_id = ANY(%s) AND worker_id = %s
+                                """,
+                                (held_task_ids, self.worker_id)
+                            )
+                            renewed = cursor.rowcount
+                finally:
+                    conn.close()
+            except Exception as e:
+                self.logger.error(f"リース延長エラーのため処理中のタスクを中断します: {str(e)}")
+                self._lease_lost.set()
+                continue
+            if renewed < len(held_task_ids):
+                self.logger.error(f"処理中のタスクが他のワーカーに再取得されたため中断します: "
+                                  f"{len(held_task_ids) - renewed}件")
+                self._lease_lost.set()
+
+    def _connection(self):
+        """キュー操作用DB接続の取得（切断されていれば再接続）"""
+        if self._conn is None or self._conn.closed:
+            self._conn = self.processor._connect_database()
+        return self._conn
+
+    def _close_connection(self) -> None:
+        """キュー操作用DB接続のクローズ"""
+        try:
+            if self._conn is not None:
+                self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+    def _get_job(self, job_id: int) -> Dict:
+        """ジョブ情報の取得（キャッシュ付き）"""
+        if job_id not in self._jobs:
+            conn = self._connection()
+            with conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT request_id, requester, csv_path FROM archive_jobs WHERE job_id = %s",
+                        (job_id,)
+                    )
+                    request_id, requester, csv_path = cursor.fetchone()
+            self._jobs[job_id] = {'request_id': request_id, 'requester': requester, 'csv_path': csv_path}
+        return self._jobs[job_id]
@@ -9,28 +9,82 @@
 import argparse
 import csv
 import datetime
+import hashlib
 import json
 import logging
 import os
 import sys
+import threading
 import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import chain, islice
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
+from archive_manifest import ManifestWriter, file_checksum
+from archive_planner import ArchivePlanner
+from archive_queue import ArchiveQueue
+from archived_index import ArchivedIndex
+from bandwidth_limiter import BandwidthLimiter
+from concurrency_control import AdaptiveConcurrencyController, HostConcurrencyLimiter
+from fault_injection import FaultInjectingS3Client, FaultInjector
+from file_records import FileRecord, FileRecordStore
+from history_mirror import HistoryMirror, has_identity_columns, history_source
+from inventory_cache import InventoryCache, walk_files
+from log_setup import DETAIL, BatchingFileHandler, ConsoleDetailFilter, ProgressReporter, start_queue_logging
+from metrics_exporter import PrometheusTextfileExporter
+from request_scheduler import FairShareScheduler
+from results_log import ResultsLog
+from retry_policy import RetryPolicy
+from run_metrics import RunMetrics
+from upload_scheduler import UploadScheduler
+
 # 設定ファイルのデフォルトパス
 DEFAULT_CONFIG_PATH = "config/archive_config.json"
 
+# archive_history への1回あたりの挿入件数
+DB_INSERT_BATCH_SIZE = 10000
+
+# アーカイブ済み判定で更新日時を一致とみなす誤差（秒）
+DEDUP_MTIME_TOLERANCE = 0.001
+
 class ArchiveProcessor:
     """アーカイブ処理のメインクラス"""
     
     def __init__(self, config_path: str = DEFAULT_CONFIG_PATH):
         self.config = self.load_config(config_path)
+        self.log_file = None  # setup_loggerで設定（実行レポートの出力先に使用）
         self.logger = self.setup_logger()
+        self.metrics = RunMetrics('archive', self.logger)
         self.csv_errors = []  # CSV検証エラーを記録
+        self.requester = None  # 依頼者（キューワーカーではジョブの依頼者を設定）
+        self.concurrency_controller = None  # 適応的同時実行数制御（有効時のみ）
+        self.host_limiter = HostConcurrencyLimiter.from_config(
+            self.config.get('file_server', {}).get('host_concurrency', {}), self.logger
+        )
+        self.bandwidth_limiter = BandwidthLimiter.from_config(self.config.get('bandwidth', {}), self.logger)
+        self.fault_injector = FaultInjector.from_config(self.config.get('fault_injection', {}), self.logger)
+        self.inventory_cache = InventoryCache.from_config(self.config.get('inventory_cache', {}), self.logger)
+        self.refresh_inventory = False  # 列挙キャッシュを破棄して再列挙（--refresh-inventory）
+        self.manifest_writer = ManifestWriter.from_config(self.config.get('manifest', {}), self.logger)
+        self.history_mirror = HistoryMirror.from_config(self.config.get('history_mirror', {}), self.logger)
+        self.archived_index = ArchivedIndex.from_config(self.config.get('archived_index', {}), self.logger)
+        self.retry_policy = RetryPolicy.from_config(
+            self.config.get('retry', {}), self.config.get('processing', {}).get('retry_count', 3), self.metrics, self.logger
+        )
+        self._s3_client = None  # アーカイブ後処理（アップロード検証）でも使用
+        self._deletion_executor = None  # 並列削除ステージ（delete_workers > 1 の場合のみ）
+        self._pending_deletions = {}  # ファイルパス -> 削除処理のFuture（処理結果ファイル無効時のみ）
+        self._deletion_slots = None  # 並列削除ステージの投入待ち上限
+        self._upload_progress = None  # アップロード進捗サマリー（archive_to_s3実行中のみ）
+        self.results_log = None  # 処理結果ファイル（run実行中のみ）
+        self.stop_event = None  # 処理中断の指示（キューワーカーがリース喪失時に設定）
         self.stats = {
             'total_files': 0,
             'processed_files': 0,
             'failed_files': 0,
+            'skipped_files': 0,  # アーカイブ済みのためスキップ（dedup有効時のみ）
             'total_size': 0,
             'start_time': None,
             'end_time': None
@@ -42,16 +96,117 @@ class ArchiveProcessor:
         default_config = {
             "logging": {
                 "log_directory": "logs",
-                "log_level": "INFO"
+                "log_level": "INFO",
+                "metrics_report": True,  # ステージ別所要時間のJSONレポートを出力
+                "async_logging": True,  # ログ書き込みをバックグラウンドスレッドで実行
+                "flush_interval": 1.0,  # ファイル出力のflush間隔（秒）
+                "flush_records": 200,  # ファイル出力のflush件数
+                "console_detail": False,  # ファイル単位の詳細ログをコンソールにも出力
+                "progress_every_files": 100,  # 進捗サマリーの出力間隔（件数）
+                "progress_every_seconds": 10  # 進捗サマリーの出力間隔（秒）
             },
             "file_server": {
                 "exclude_extensions": [".tmp", ".lock", ".bak"],
-                "archived_suffix": "_archived"  # ディレクトリ用サフィックス
+                "archived_suffix": "_archived",  # ディレクトリ用サフィックス
+                "host_concurrency": {
+                    "default_limit": 0,  # サーバ毎の同時アクセス上限（0は無制限）
+                    "hosts": {}  # 例: {"fileserver01": 4}
+                }
             },
             "processing": {
                 "max_file_size": 10737418240,
                 "chunk_size": 8388608,
-                "retry_count": 3
+                "retry_count": 3,
+                "parallel_workers": 1,
+                "enumeration_workers": 1,
+                "progress_interval": 60,  # 複数依頼処理時の進捗ログ間隔（秒）
+                "delete_workers": 1,  # 2以上でアップロード完了ごとに並列削除
+                "verify_upload_size": False,  # 削除前にhead_objectでサイズ照合
+                "confirm_deletion": True,  # 削除後にos.path.existsで再確認
+                "small_file_threshold": 8388608,
+                "per_file_overhead_bytes": 262144,
+                "adaptive_concurrency": {
+                    "enabled": False,
+                    "min_workers": 1,
+                    "max_workers": 16,
+                    "adjust_interval": 10.0,
+                    "increase_step": 1,
+                    "decrease_factor": 0.5,
+                    "latency_threshold": 1.5  # 1MBあたりの所要時間（小・大ファイル別）の基準に対する悪化判定倍率
+                }
+            },
+            "bandwidth": {
+                "enabled": False,
+                "default_mbps": 0,  # スケジュール外の上限（0は無制限）
+                "schedule": []  # 例: [{"start": "08:00", "end": "20:00", "mbps": 200}]
+            },
+            "retry": {
+                "base_delay": 1.0,  # フルジッター付き指数バックオフの基準秒数
+                "max_delay": 30.0,  # バックオフ上限の最大秒数
+                "throttle_delay_factor": 2.0,  # スロットリング時のバックオフ上限倍率
+                "budget_ratio": 0.2,  # 実行全体のリトライ予算（初回呼び出し数に対する比率）
+                "budget_min_retries": 20,  # リトライ予算の最低保証回数
+                "sdk_max_attempts": 1  # botocore側の試行回数（1: SDKでは再試行しない）
+            },
+            "s3_key": {
+                "shard_chars": 0  # 1～4でキー先頭にハッシュ由来のシャード（16進）を付加（0は無効）
+            },
+            "dedup": {
+                "enabled": False  # パス・サイズ・更新日時（記録があればチェックサムも）が履歴と一致するファイルはスキップ（アップロード・削除・DB登録なし）
+            },
+            "history_mirror": {
+                "enabled": False,  # archive_history をローカル（SQLite）に差分同期し、アーカイブ済み判定はミラーで行う
+                "path": "cache/archive_history.db",
+                "overlap_minutes": 60,  # 差分同期で遡る時間（実行中だったトランザクションの行の取りこぼし防止）
+                "max_stale_hours": 24,  # 同期失敗時（DB停止中等）にミラーで検索を継続する最終同期からの時間
+                "batch_rows": 50000  # 1回に取り込む行数
+            },
+            "archived_index": {
+                "enabled": False,  # アーカイブ済みパスのスナップショット（archived_index.py で作成）で未アーカイブを即判定
+                "path": "cache/archived_paths.bloom",
+                "false_positive_rate": 0.001,  # スナップショット作成時の偽陽性率
+                "overlap_minutes": 60  # 作成以降の登録分の取り込みで遡る時間
+            },
+            "inventory_cache": {
+                "enabled": False,  # フォルダ一覧をディスクにキャッシュし、更新日時が同じフォルダは再列挙しない
+                "path": "cache/archive_inventory.db",
+                "max_age_hours": 24.0,  # 有効時間（上書きされたファイルのサイズ変更はフォルダ更新日時に現れないため）
+                "commit_every": 500  # まとめて書き込むフォルダ数
+            },
+            "fault_injection": {
+                "enabled": False,  # 検証環境専用（環境変数 ARCHIVE_FAULT_INJECTION でも有効化可能）
+                "seed": None,
+                "operations": {}  # 例: {"s3_put": {"throttle_rate": 0.05, "latency_ms": 50}}
+            },
+            "manifest": {
+                "enabled": True,  # DB登録前に依頼単位のマニフェスト（gzip CSV）をS3へアップロード
+                "prefix": "_manifests",  # マニフェストのキープレフィックス
+                "checksum": "none",  # sha256: 元ファイルのSHA-256を記録（元ファイルを追加で1回読み込む）
+                "storage_class": "STANDARD"  # 再構築時に即時読み出せるストレージクラス
+            },
+            "results_log": {
+                "enabled": True,  # 処理結果をSQLiteファイル（ログと同名の .results.db）へ追記し後処理で検索
+                "batch_size": 1000,  # まとめて書き込む件数
+                "keep": True  # 実行終了後もファイルを残す
+            },
+            "metrics": {
+                "prometheus_textfile": {
+                    "enabled": False,
+                    "textfile_directory": "",  # node_exporterの --collector.textfile.directory
+                    "interval": 15  # 出力間隔（秒）
+                }
+            },
+            "plan": {
+                "history_runs": 5,  # 転送速度の算出に使う直近の実行レポート数
+                "default_worker_mbps": 10.0,  # 実績がない場合のワーカー1本あたりの転送速度（MB/s）
+                "top_extensions": 10  # 拡張子別集計の出力件数
+            },
+            "queue": {
+                "batch_size": 100,  # 1回に取得するタスク数
+                "lease_seconds": 1800,  # 処理中タスクのリース期限
+                "poll_interval": 30,  # タスクがない場合の待機秒数
+                "exit_when_idle": True,  # タスクがなくなったらワーカー終了
+                "max_attempts": 3  # リース期限切れによる再取得の上限
             }
         }
         
@@ -92,27 +247,55 @@ class ArchiveProcessor:
             '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
         )
         
-        # コンソール出力
+        log_config = self.config.get('logging', {})
+        async_logging = log_config.get('async_logging', True)
+        
+        # コンソール出力（ファイル単位の詳細ログは進捗サマリーに置き換え）
         console_handler = logging.StreamHandler()
         console_handler.setLevel(logging.INFO)
         console_handler.setFormatter(formatter)
-        logger.addHandler(console_handler)
+        if not log_config.get('console_detail', False):
+            console_handler.addFilter(ConsoleDetailFilter())
+        handlers = [console_handler]
         
         # ファイル出力
+        log_file_error = None
         try:
-            log_config = self.config.get('logging', {})
             log_dir = Path(log_config.get('log_directory', 'logs'))
             log_dir.mkdir(exist_ok=True)
             
             log_file = log_dir / f"archive_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
-            file_handler = logging.FileHandler(log_file, encoding='utf-8')
+            if async_logging:
+                file_handler = BatchingFileHandler(
+                    log_file,
+                    flush_interval=log_config.get('flush_interval', 1.0),
+                    flush_records=log_config.get('flush_records', 200),
+                    encoding='utf-8'
+                )
+            else:
+                file_handler = logging.FileHandler(log_file, encoding='utf-8')
             file_handler.setLevel(logging.DEBUG)
             file_handler.setFormatter(formatter)
-            logger.addHandler(file_handler)
-            
-            logger.info(f"ログファイル: {log_file}")
+            handlers.append(file_handler)
+            self.log_file = log_file
         except Exception as e:
-            logger.warning(f"ログファイル設定エラー: {e}")
+            log_file_error = e
+        
+        # 非同期出力（書き込みはバックグラウンドスレッドで実行）
+        previous_listener = getattr(self, '_log_listener', None)
+        if previous_listener:
+            previous_listener.stop()
+        self._log_listener = None
+        if async_logging:
+            self._log_listener = start_queue_logging(logger, handlers)
+        else:
+            for handler in handlers:
+                logger.addHandler(handler)
+        
+        if log_file_error:
+            logger.warning(f"ログファイル設定エラー: {log_file_error}")
+        else:
+            logger.info(f"ログファイル: {self.log_file}")
         
         return logger
         
@@ -236,137 +419,379 @@ class ArchiveProcessor:
         result = self._validate_directory_path_with_details(path)
         return result['valid']
         
-    def collect_files(self, directories: List[str]) -> List[Dict]:
-        """ファイル列挙・収集処理"""
+    def collect_files(self, directories: List[str]) -> FileRecordStore:
+        """ファイル列挙・収集処理（ディレクトリ単位で並列化、ファイルサーバ毎の同時アクセス数制限付き）"""
         self.logger.info("ファイル収集開始")
         
-        files = []
+        enumeration_workers = max(1, int(self.config.get('processing', {}).get('enumeration_workers', 1)))
+        
+        if self.inventory_cache and self.refresh_inventory:
+            invalidated = self.inventory_cache.invalidate(directories)
+            self.logger.info(f"列挙キャッシュを破棄して再列挙します: {invalidated}フォルダ")
+        
+        if enumeration_workers == 1 or len(directories) <= 1:
+            directory_files = [self._collect_directory_files(directory) for directory in directories]
+        else:
+            self.logger.info(f"並列列挙数: {enumeration_workers}")
+            with ThreadPoolExecutor(max_workers=enumeration_workers) as executor:
+                directory_files = list(executor.map(self._collect_directory_files, directories))
+        
+        # CSV記載順を維持して結合
+        files = FileRecordStore()
+        for collected in directory_files:
+            files.extend(collected)
+        
+        self.logger.info(f"ファイル収集完了 - 総ファイル数: {len(files)}")
+        if self.inventory_cache:
+            self.inventory_cache.flush()
+            cache_summary = self.inventory_cache.summary()
+            self.logger.info(f"列挙キャッシュ: ヒット {cache_summary['hits']}フォルダ / "
+                             f"再列挙 {cache_summary['misses']}フォルダ")
+        return files
+    
+    def _collect_directory_files(self, directory: str) -> FileRecordStore:
+        """1ディレクトリ配下のファイル列挙"""
         exclude_extensions = self.config.get('file_server', {}).get('exclude_extensions', [])
         max_file_size = self.config.get('processing', {}).get('max_file_size', 10737418240)
         
-        for directory in directories:
-            dir_preview = directory[:50] + "..." if len(directory) > 50 else directory
-            self.logger.info(f"ディレクトリ処理開始: {dir_preview}")
+        dir_preview = directory[:50] + "..." if len(directory) > 50 else directory
+        self.logger.info(f"ディレクトリ処理開始: {dir_preview}")
+        
+        files = FileRecordStore()
+        try:
+            with self.host_limiter.slot(directory):
+                # 列挙キャッシュ有効時は、更新日時が変わっていないフォルダを再列挙しない
+                for root, filename, file_size, mtime in walk_files(
+                    directory, self._stat_entry, on_error=self._log_walk_error, cache=self.inventory_cache
+                ):
+                    # 拡張子チェック
+                    _, ext = os.path.splitext(filename)
+                    if ext.lower() in exclude_extensions:
+                        continue
+                    
+                    if file_size > max_file_size:
+                        continue
+                    
+                    files.add(root, filename, file_size, mtime, directory)
             
-            try:
-                file_count = 0
-                for root, dirs, filenames in os.walk(directory):
-                    for filename in filenames:
-                        file_path = os.path.join(root, filename)
-                        
-                        # 拡張子チェック
-                        _, ext = os.path.splitext(filename)
-                        if ext.lower() in exclude_extensions:
-                            continue
-                        
-                        try:
-                            stat_info = os.stat(file_path)
-                            file_size = stat_info.st_size
-                            
-                            if file_size > max_file_size:
-                                continue
-                            
-                            file_info = {
-                                'path': file_path,
-                                'size': file_size,
-                                'modified_time': datetime.datetime.fromtimestamp(stat_info.st_mtime),
-                                'directory': directory
-                            }
-                            
-                            files.append(file_info)
-                            file_count += 1
-                            
-                        except OSError:
-                            continue
-                
-                self.logger.info(f"ディレクトリ {dir_preview}: {file_count}個のファイルを収集")
+            self.logger.info(f"ディレクトリ {dir_preview}: {len(files)}個のファイルを収集")
                         
-            except Exception as e:
-                self.logger.error(f"ディレクトリ処理エラー: {str(e)}")
-                continue
+        except Exception as e:
+            self.logger.error(f"ディレクトリ処理エラー: {str(e)}")
         
-        self.logger.info(f"ファイル収集完了 - 総ファイル数: {len(files)}")
         return files
+    
+    def _log_walk_error(self, path: str, error: OSError) -> None:
+        """列挙できなかったフォルダ・ファイルの記録（対象外として続行）"""
+        self.logger.warning(f"列挙エラーのため対象外: {path} - {error}")
+    
+    def _stat_entry(self, entry: os.DirEntry) -> os.stat_result:
+        """列挙時のファイル情報取得（所要時間の計測・障害注入）"""
+        stat_started = time.perf_counter()
+        if self.fault_injector:
+            self.fault_injector.inject('fs_stat', entry.path)
+        stat_info = entry.stat()
+        self.metrics.record('stat', time.perf_counter() - stat_started)
+        return stat_info
         
-    def archive_to_s3(self, files: List[Dict]) -> List[Dict]:
-        """S3アップロード処理"""
+    def archive_to_s3(self, files) -> FileRecordStore:
+        """
+        S3アップロード処理（サイズ考慮スケジューリング・並列対応）
+        
+        結果は各FileRecordに直接書き込み、収集時と同じストアを返す
+        （キューのタスク辞書等が渡された場合はストアに変換）
+        """
         self.logger.info("S3アップロード開始")
+        if not isinstance(files, FileRecordStore):
+            files = FileRecordStore.from_mappings(files)
+        pending_files = deque()  # 計画順の未投入ファイル
+        in_flight = {}  # 投入済みで未完了のFuture -> ファイル
         
         try:
-            # boto3 S3クライアントの初期化
-            s3_client = self._initialize_s3_client()
+            # boto3 S3クライアントの初期化（クライアントはスレッド間で共有可能）
+            s3_client = self._s3_client or self._initialize_s3_client()
+            self._s3_client = s3_client
+            
+            # 並列削除ステージの開始（アップロード成功ファイルを順次削除）
+            self._start_deletion_stage()
             
             # 設定値の取得
             bucket_name = self.config['aws']['s3_bucket']
             storage_class = self.config['aws'].get('storage_class', 'STANDARD')
-            max_retries = self.config['processing'].get('retry_count', 3)
+            processing_config = self.config['processing']
+            max_retries = processing_config.get('retry_count', 3)
+            parallel_workers = max(1, int(processing_config.get('parallel_workers', 1)))
             
             # ストレージクラスの検証・調整
             storage_class = self._validate_storage_class(storage_class)
             
+            # アーカイブ済みファイルの除外（スキップとして記録し、アップロード・元ファイル削除・DB登録は行わない）
+            upload_targets = files
+            if self.config.get('dedup', {}).get('enabled', False):
+                upload_targets = self._skip_archived_files(files, bucket_name)
+            
+            # 適応的同時実行数制御（有効時はスレッドプールを上限サイズで用意）
+            adaptive_config = processing_config.get('adaptive_concurrency', {})
+            pool_size = parallel_workers
+            self.concurrency_controller = None
+            if adaptive_config.get('enabled', False):
+                # レイテンシの比較区分・ファイル単位の固定コストはアップロード計画と同じ値を使用
+                self.concurrency_controller = AdaptiveConcurrencyController.from_config(
+                    'upload', {
+                        'small_file_threshold': processing_config.get('small_file_threshold', 8388608),
+                        'per_file_overhead_bytes': processing_config.get('per_file_overhead_bytes', 262144),
+                        **adaptive_config
+                    }, parallel_workers, self.logger
+                )
+                pool_size = self.concurrency_controller.max_workers
+            
             self.logger.info(f"S3バケット: {bucket_name}")
             self.logger.info(f"ストレージクラス: {storage_class}")
             self.logger.info(f"処理対象ファイル数: {len(files)}")
+            self.logger.info(f"並列アップロード数: {parallel_workers}")
+            if self.concurrency_controller:
+                self.logger.info(f"適応的同時実行数制御: 有効 "
+                                 f"({self.concurrency_controller.min_workers}～{pool_size})")
+            
+            # アップロード順序の計画（大ファイル優先＋小ファイルで空き枠を埋める）
+            scheduler = UploadScheduler(
+                workers=parallel_workers,
+                small_file_threshold=processing_config.get('small_file_threshold', 8388608),
+                per_file_overhead_bytes=processing_config.get('per_file_overhead_bytes', 262144),
+                logger=self.logger
+            )
+            ordered_files = scheduler.plan(upload_targets)
+            scheduler.log_plan()
+            self.metrics.set_gauge('queued_files', len(ordered_files))
+            log_config = self.config.get('logging', {})
+            self._upload_progress = ProgressReporter(
+                self.logger, 'アップロード', len(ordered_files),
+                log_config.get('progress_every_files', 100), log_config.get('progress_every_seconds', 10)
+            )
             
-            results = []
-            successful_uploads = 0
-            failed_uploads = 0
-            
-            for i, file_info in enumerate(files, 1):
-                file_path = file_info['path']
-                file_size = file_info['size']
-                
-                # 進捗ログ
-                self.logger.info(f"[{i}/{len(files)}] アップロード中: {file_path} ({file_size:,} bytes)")
-                
-                # S3キーの生成
-                s3_key = self._generate_s3_key(file_path)
-                
-                # アップロード実行（リトライ付き）
-                upload_result = self._upload_file_with_retry(
-                    s3_client, file_path, bucket_name, s3_key, storage_class, max_retries
-                )
-                
-                if upload_result['success']:
-                    successful_uploads += 1
-                    self.logger.info(f"✓ アップロード成功: {s3_key}")
-                else:
-                    failed_uploads += 1
-                    self.logger.error(f"✗ アップロード失敗: {file_path} - {upload_result['error']}")
-                
-                # 結果をリストに追加
-                result = {
-                    'file_path': file_path,
-                    'file_size': file_size,
-                    'directory': file_info['directory'],
-                    'success': upload_result['success'],
-                    'error': upload_result.get('error'),
-                    's3_key': s3_key if upload_result['success'] else None,
-                    'modified_time': file_info['modified_time']
-                }
-                results.append(result)
+            total_count = len(ordered_files)
+            skipped_files = len(files) - len(upload_targets)
+            
+            # 処理結果ファイルへ逐次記録する場合（run）は、結果を確定したレコードを保持し続けないよう
+            # 収集結果のストアを手放し、計画順のキューから取り出しながら投入する
+            if self.results_log is not None:
+                files.clear()
+            upload_targets = None
+            pending_files.extend(ordered_files)
+            ordered_files = None
+            
+            index = 0
+            if pool_size == 1:
+                while pending_files:
+                    index += 1
+                    self._upload_single_file(
+                        s3_client, pending_files[0], index, total_count,
+                        bucket_name, storage_class, max_retries
+                    )
+                    pending_files.popleft()
+            else:
+                # 投入順 = 計画順。投入済みで未完了のファイルはスレッド数の2倍までに抑える
+                with ThreadPoolExecutor(max_workers=pool_size) as executor:
+                    while pending_files or in_flight:
+                        while pending_files and len(in_flight) < pool_size * 2:
+                            index += 1
+                            file_info = pending_files.popleft()
+                            future = executor.submit(
+                                self._upload_single_file, s3_client, file_info, index, total_count,
+                                bucket_name, storage_class, max_retries
+                            )
+                            in_flight[future] = file_info
+                        file_info = None
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+                            del in_flight[future]
+            
+            progress = self._upload_progress
+            self._upload_progress = None
+            successful_uploads = progress.done - progress.failed
+            failed_uploads = progress.failed
             
             self.logger.info(f"S3アップロード完了")
             self.logger.info(f"  - 成功: {successful_uploads}件")
             self.logger.info(f"  - 失敗: {failed_uploads}件")
+            if skipped_files:
+                self.logger.info(f"  - スキップ（アーカイブ済み）: {skipped_files}件")
+            if self.bandwidth_limiter:
+                self.logger.info(f"  - 帯域制御による待機時間: {self.bandwidth_limiter.throttled_seconds:,.1f}秒")
             
-            return results
+            return files
             
         except Exception as e:
             self.logger.error(f"S3アップロード処理でエラーが発生: {str(e)}")
-            # 全てのファイルを失敗として記録
-            return [
-                {
-                    'file_path': f['path'],
-                    'file_size': f['size'],
-                    'directory': f['directory'],
-                    'success': False,
-                    'error': f"S3初期化エラー: {str(e)}",
-                    's3_key': None,
-                    'modified_time': f['modified_time']
-                }
-                for f in files
-            ]
+            # 削除ステージ投入済みのファイルは結果確定まで待ち、
+            # 結果未確定のファイルのみ失敗として記録（確定済みのファイルは記録し直さない）
+            self._shutdown_deletion_stage()
+            error_msg = f"S3初期化エラー: {str(e)}"
+            for record in chain(files, pending_files, in_flight.values()):
+                if record.recorded:
+                    continue
+                record.success = False
+                record.error = error_msg
+                record.s3_key = None
+                self._record_result(record)
+            return files
+    
+    def _skip_archived_files(self, files: FileRecordStore, bucket_name: str) -> FileRecordStore:
+        """
+        アーカイブ時と同一のファイル（パス・サイズ・更新日時が一致）をアップロード対象から除外
+        
+        同じパスの履歴は元ファイル削除後に置かれた別のファイルであることが多いため、
+        アーカイブ時に記録した更新日時（file_mtime）まで一致する場合のみ同一とみなし、
+        チェックサムが記録されていれば元ファイルのSHA-256も照合する（記録のない旧い履歴は一致扱いにしない）。
+        除外したファイルはスキップとして記録し、元ファイル削除・DB登録は行わない。
+        履歴を検索できない場合は全件をアップロード対象とする。
+        アーカイブ済みパスのスナップショットが有効な場合は、スナップショットに含まれるパスのみ履歴を検索する。
+        
+        Returns:
+            FileRecordStore: アップロード対象のファイル
+        """
+        paths = [record.path for record in files]
+        if self.archived_index:
+            with self.metrics.timer('dedup_index'):
+                paths = self.archived_index.candidates(paths, self._connect_database)
+            self.logger.info(f"アーカイブ済み候補: {len(paths)}件 / {len(files)}件（残りは未アーカイブ）")
+            if not paths:
+                return files
+        
+        try:
+            with self.metrics.timer('dedup_lookup'):
+                with history_source(self.history_mirror, self._connect_database) as source:
+                    archived = source.lookup_paths(paths)
+        except Exception as e:
+            self.logger.warning(f"アーカイブ済み判定をスキップします（全件アップロード）: {str(e)}")
+            return files
+        
+        bucket_prefix = f"s3://{bucket_name.strip()}/"
+        upload_targets = FileRecordStore()
+        skipped = 0
+        for record in files:
+            hit = archived.get(record.path)
+            if hit and hit.s3_path.startswith(bucket_prefix) and self._is_same_file(record, hit):
+                record.skipped = True
+                record.error = None
+                record.s3_key = hit.s3_path[len(bucket_prefix):]
+                self.logger.info(f"アーカイブ済みのためスキップ: {record.path} ({hit.s3_path})", extra=DETAIL)
+                self._record_result(record)
+                skipped += 1
+            else:
+                upload_targets.append(record)
+        
+        self.metrics.increment('dedup_skipped_files', skipped)
+        self.logger.info(f"アーカイブ済みのためスキップ: {skipped}件 / アップロード対象: {len(upload_targets)}件")
+        return upload_targets
+    
+    def _is_same_file(self, record: FileRecord, hit) -> bool:
+        """アーカイブ履歴（ArchivedFile）と同一のファイルか（サイズ・更新日時、記録があればチェックサム）"""
+        if hit.file_size != record.size or hit.file_mtime is None:
+            return False
+        if abs(hit.file_mtime - record.mtime) > DEDUP_MTIME_TOLERANCE:
+            return False
+        if not hit.checksum:
+            return True
+        try:
+            with self.host_limiter.slot(record.path), self.metrics.timer('checksum'):
+                checksum = file_checksum(
+                    record.path, self.config.get('processing', {}).get('chunk_size', 8388608)
+                )
+        except OSError as e:
+            self.logger.warning(f"チェックサム計算エラー（アップロード対象とします）: {record.path} - {e}")
+            return False
+        if checksum != hit.checksum:
+            return False
+        record.checksum = checksum
+        return True
+    
+    def _upload_single_file(self, s3_client, file_info: FileRecord, index: int, total_count: int,
+                            bucket_name: str, storage_class: str, max_retries: int) -> FileRecord:
+        """単一ファイルのアップロード処理（ワーカースレッド内で実行、結果はレコードに直接記録）"""
+        file_path = file_info.path
+        file_size = file_info.size
+        
+        # 処理中断の指示があれば未着手のファイルはアップロードしない
+        if self.stop_event is not None and self.stop_event.is_set():
+            file_info.success = False
+            file_info.error = '処理中断（アップロード未実施）'
+            if self._upload_progress:
+                self._upload_progress.update(False, 0)
+            self._record_result(file_info)
+            return file_info
+        
+        # 進捗ログ
+        self.logger.info(f"[{index}/{total_count}] アップロード中: {file_path} ({file_size:,} bytes)", extra=DETAIL)
+        
+        # S3キーの生成
+        s3_key = self._generate_s3_key(file_path)
+        
+        # アップロード実行（リトライ付き）
+        # （元ファイル読み込みはファイルサーバ毎の同時アクセス数制限の対象。
+        #   同時実行数制御の枠を先に確保し、枠待ちの間はファイルサーバの枠を占有しない）
+        controller = self.concurrency_controller
+        try:
+            if self.manifest_writer and self.manifest_writer.checksum == 'sha256':
+                with self.host_limiter.slot(file_path), self.metrics.timer('checksum'):
+                    file_info.checksum = file_checksum(
+                        file_path, self.config.get('processing', {}).get('chunk_size', 8388608)
+                    )
+            if controller:
+                controller.acquire()
+            try:
+                with self.host_limiter.slot(file_path), self.metrics.active('put'):
+                    started = time.monotonic()
+                    upload_result = self._upload_file_with_retry(
+                        s3_client, file_path, bucket_name, s3_key, storage_class, max_retries
+                    )
+                latency = time.monotonic() - started
+                self.metrics.record('put', latency, file_size if upload_result['success'] else 0,
+                                    error=not upload_result['success'])
+                if controller and upload_result['success']:
+                    controller.record_success(file_size, upload_result['latency'])
+            finally:
+                if controller:
+                    controller.release()
+        except Exception as e:
+            upload_result = {'success': False, 'error': f"予期しないエラー: {str(e)}"}
+        
+        if upload_result['success']:
+            self.logger.info(f"✓ アップロード成功: {s3_key}", extra=DETAIL)
+        else:
+            self.logger.error(f"✗ アップロード失敗: {file_path} - {upload_result['error']}")
+        if self._upload_progress:
+            self._upload_progress.update(upload_result['success'], file_size)
+        
+        result = file_info
+        result.success = upload_result['success']
+        result.error = upload_result.get('error')
+        result.retry_count = upload_result.get('retry_count', 0)
+        result.s3_key = s3_key if upload_result['success'] else None
+        
+        # アップロード失敗は結果確定
+        if not upload_result['success']:
+            self._record_result(result)
+        
+        # アップロード確定次第、元ファイル削除を並列削除ステージへ投入
+        # （処理結果ファイルへ逐次記録する場合、並列削除なしではこのワーカーで削除して結果を確定）
+        if upload_result['success']:
+            if self._deletion_executor:
+                self._submit_deletion(result)
+            elif self.results_log is not None:
+                self._delete_source_file(result)
+        
+        return result
+    
+    def _submit_deletion(self, result: FileRecord) -> None:
+        """並列削除ステージへの投入（投入待ちが上限に達している場合は空くまで待機）"""
+        self._deletion_slots.acquire()
+        future = self._deletion_executor.submit(self._delete_source_file, result)
+        future.add_done_callback(lambda _: self._deletion_slots.release())
+        # 処理結果ファイル無効時は create_archived_files で完了を待つためFutureを保持
+        if self.results_log is None:
+            self._pending_deletions[result.path] = future
     
     def _validate_storage_class(self, storage_class: str) -> str:
         """ストレージクラスの検証と調整"""
@@ -411,10 +836,12 @@ class ArchiveProcessor:
             self.logger.info(f"S3バケット名: '{bucket_name}'")  # デバッグ用に引用符で囲む
             
             # boto3設定
+            # リトライは共通リトライポリシーで行うため、SDK側の再試行は retry.sdk_max_attempts に制限
+            # （adaptive モードのクライアント側レート制御は有効のまま）
             config = Config(
                 region_name=region,
                 retries={
-                    'max_attempts': 3,
+                    'total_max_attempts': self.config.get('retry', {}).get('sdk_max_attempts', 1),
                     'mode': 'adaptive'
                 }
             )
@@ -430,6 +857,8 @@ class ArchiveProcessor:
             # 接続テスト
             self._test_s3_connection(s3_client, bucket_name)
             
+            if self.fault_injector:
+                s3_client = FaultInjectingS3Client(s3_client, self.fault_injector)
             return s3_client
             
         except ImportError:
@@ -441,7 +870,10 @@ class ArchiveProcessor:
         """S3接続テスト"""
         try:
             # バケットの存在確認
-            response = s3_client.head_bucket(Bucket=bucket_name)
+            outcome = self.retry_policy.call(lambda: s3_client.head_bucket(Bucket=bucket_name),
+                                             'head_bucket', bucket_name)
+            if not outcome['success']:
+                raise outcome['exception']
             self.logger.info(f"S3バケット接続確認OK: '{bucket_name}'")
         except Exception as e:
             raise Exception(f"S3バケット接続失敗: '{bucket_name}' - {str(e)}")
@@ -481,7 +913,7 @@ class ArchiveProcessor:
             # 空の部分を除去
             s3_key = '/'.join(part for part in s3_key.split('/') if part)
             
-            return s3_key
+            return self._add_shard_prefix(s3_key)
             
         except Exception as e:
             self.logger.error(f"S3キー生成エラー: {file_path} - {str(e)}")
@@ -491,113 +923,209 @@ class ArchiveProcessor:
             timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
             return f"fallback/{timestamp}/{filename}"
     
+    def _add_shard_prefix(self, s3_key: str) -> str:
+        """
+        キー先頭にハッシュ由来のシャードを付加（s3_key.shard_chars が 1 以上の場合のみ）
+        
+        1共有フォルダ配下の大量ファイルが同じプレフィックスに集中すると、S3のプレフィックス単位の
+        リクエストレート上限に達するため、キーのハッシュ値でプレフィックスを分散させる。
+        例（shard_chars=2）: server/share/path/file.txt -> 3f/server/share/path/file.txt
+        実際のキーは archive_history.s3_path に記録されるため、復元処理への影響はない。
+        """
+        shard_chars = min(4, max(0, int(self.config.get('s3_key', {}).get('shard_chars', 0))))
+        if not shard_chars:
+            return s3_key
+        shard = hashlib.sha256(s3_key.encode('utf-8')).hexdigest()[:shard_chars]
+        return f"{shard}/{s3_key}"
+    
     def _upload_file_with_retry(self, s3_client, file_path: str, bucket_name: str, 
                                s3_key: str, storage_class: str, max_retries: int) -> Dict:
-        """ファイルアップロード（リトライ付き）"""
+        """
+        ファイルアップロード（共通リトライポリシーによる再試行）
         
-        for attempt in range(max_retries):
-            try:
-                self.logger.debug(f"アップロード試行 {attempt + 1}/{max_retries}: {s3_key}")
-                
-                # アップロード実行
-                s3_client.upload_file(
-                    file_path,
-                    bucket_name,
-                    s3_key,
-                    ExtraArgs={
-                        'StorageClass': storage_class
-                    }
-                )
-                
-                # 成功
-                return {'success': True, 'error': None}
-                
-            except FileNotFoundError:
-                # ファイルが見つからない場合はリトライしない
-                return {'success': False, 'error': 'ファイルが見つかりません'}
-                
-            except PermissionError:
-                # 権限エラーの場合はリトライしない
-                return {'success': False, 'error': 'ファイルアクセス権限がありません'}
-                
-            except Exception as e:
-                error_msg = str(e)
-                
-                # 最後の試行でも失敗した場合
-                if attempt == max_retries - 1:
-                    return {'success': False, 'error': f'最大リトライ回数到達: {error_msg}'}
-                
-                # リトライ可能なエラーの場合は次の試行へ
-                self.logger.warning(f"アップロード失敗 (試行 {attempt + 1}/{max_retries}): {error_msg}")
-                
-                # 少し待機してからリトライ
-                import time
-                time.sleep(2 ** attempt)  # 指数バックオフ
+        成功時の latency は同時実行数制御用の所要時間（成功した試行のみ、帯域制御で待機した場合は None）
+        """
+        throttle = None
+        
+        def upload():
+            nonlocal throttle
+            self.metrics.increment('s3_upload_file_calls')
+            throttle = self.bandwidth_limiter.tracker() if self.bandwidth_limiter else None
+            s3_client.upload_file(
+                file_path,
+                bucket_name,
+                s3_key,
+                ExtraArgs={
+                    'StorageClass': storage_class
+                },
+                Callback=throttle
+            )
+        
+        outcome = self.retry_policy.call(upload, 'upload', s3_key, max_attempts=max_retries,
+                                         on_error=self._record_transfer_error)
+        if outcome['success']:
+            latency = None if throttle and throttle.waited_seconds > 0 else outcome['attempt_seconds']
+            return {'success': True, 'error': None, 'retry_count': outcome['retries'], 'latency': latency}
         
-        return {'success': False, 'error': '不明なエラー'}
+        # ファイルが見つからない・権限エラーはリトライせず終了
+        error = outcome['exception']
+        if isinstance(error, FileNotFoundError):
+            message = 'ファイルが見つかりません'
+        elif isinstance(error, PermissionError):
+            message = 'ファイルアクセス権限がありません'
+        else:
+            message = RetryPolicy.failure_message(outcome)
+        return {'success': False, 'error': message, 'retry_count': outcome['retries']}
+    
+    def _record_transfer_error(self, error: Exception) -> None:
+        """転送エラーの計上（混雑シグナル（SlowDown等）は同時実行数制御へ通知）"""
+        self.metrics.count_error(error)
+        if self.concurrency_controller:
+            self.concurrency_controller.record_error(error)
         
-    def create_archived_files(self, results: List[Dict]) -> List[Dict]:
+    def create_archived_files(self, results: FileRecordStore) -> FileRecordStore:
         """アーカイブ後処理（元ファイル削除のみ）"""
         self.logger.info("アーカイブ後処理開始（元ファイル削除）")
         
+        # 処理結果ファイルへ逐次記録する場合、削除はアップロード完了時に実行・投入済み（完了待ちのみ）
+        if self.results_log is not None:
+            self._shutdown_deletion_stage()
+            self.logger.info("アーカイブ後処理完了")
+            self.logger.info(f"  - 完了: {self.results_log.count_completed()}件")
+            return results
+        
         # 成功したファイルのみ処理
-        successful_results = [r for r in results if r.get('success', False)]
+        successful_results = results.successful()
         
         if not successful_results:
             self.logger.info("S3アップロード成功ファイルがないため、アーカイブ後処理をスキップ")
+            self._shutdown_deletion_stage()
             return results
         
         self.logger.info(f"アーカイブ後処理対象: {len(successful_results)}件")
         
-        processed_results = []
+        if self._deletion_executor:
+            self.logger.info(f"並列削除の完了待ち: {len(self._pending_deletions)}件")
         
-        for result in results:
-            if not result.get('success', False):
-                # 失敗したファイルはそのまま
-                processed_results.append(result)
-                continue
+        log_config = self.config.get('logging', {})
+        progress = ProgressReporter(
+            self.logger, '元ファイル削除', len(successful_results),
+            log_config.get('progress_every_files', 100), log_config.get('progress_every_seconds', 10)
+        )
+        for result in successful_results:
+            # 並列削除ステージ投入済みのものは完了を待つだけ
+            future = self._pending_deletions.pop(result.path, None)
+            if future:
+                future.result()
+            else:
+                self._delete_source_file(result)
+            progress.update(result.archive_completed, result.size)
+        
+        self._shutdown_deletion_stage()
+        
+        # 処理結果のサマリー
+        completed_count = sum(1 for r in successful_results if r.archive_completed)
+        failed_count = len(successful_results) - completed_count
+        
+        self.logger.info("アーカイブ後処理完了")
+        self.logger.info(f"  - 完了: {completed_count}件")
+        self.logger.info(f"  - 失敗: {failed_count}件")
+        
+        return results
+    
+    def _start_deletion_stage(self) -> None:
+        """並列削除ステージの開始（delete_workers > 1 の場合のみ）"""
+        delete_workers = max(1, int(self.config.get('processing', {}).get('delete_workers', 1)))
+        if delete_workers > 1 and self._deletion_executor is None:
+            self.logger.info(f"並列削除ステージ開始: {delete_workers}並列")
+            self._deletion_executor = ThreadPoolExecutor(max_workers=delete_workers)
+            self._deletion_slots = threading.BoundedSemaphore(delete_workers * 4)
+            self._pending_deletions = {}
+    
+    def _shutdown_deletion_stage(self) -> None:
+        """並列削除ステージの終了（投入済みの削除は完了まで待機）"""
+        if self._deletion_executor:
+            self._deletion_executor.shutdown(wait=True)
+            self._deletion_executor = None
+            self._pending_deletions = {}
+    
+    def _delete_source_file(self, result: FileRecord) -> None:
+        """元ファイルの削除（必要に応じてS3上のサイズを照合してから削除）"""
+        file_path = result.path
+        processing_config = self.config.get('processing', {})
+        
+        try:
+            # 処理中断の指示があれば元ファイルは削除しない（再取得したワーカーが処理する）
+            if self.stop_event is not None and self.stop_event.is_set():
+                raise Exception("処理中断のため元ファイルを削除していません")
             
-            file_path = result['file_path']
+            # アップロード検証（S3オブジェクトサイズとローカルサイズの照合）
+            if processing_config.get('verify_upload_size', False):
+                self._verify_uploaded_size(result)
             
-            try:
-                # 元ファイル削除
-                self.logger.info(f"元ファイル削除: {file_path}")
-                
+            # 元ファイル削除
+            self.logger.info(f"元ファイル削除: {file_path}", extra=DETAIL)
+            
+            with self.host_limiter.slot(file_path), self.metrics.timer('delete'):
+                if self.fault_injector:
+                    self.fault_injector.inject('fs_delete', file_path)
                 os.remove(file_path)
                 
-                # 元ファイル削除確認
-                if os.path.exists(file_path):
+                # 元ファイル削除確認（os.removeの例外で失敗は検知できるため省略可能）
+                if processing_config.get('confirm_deletion', True) and os.path.exists(file_path):
                     raise Exception("元ファイルの削除に失敗しました")
-                
-                # 成功
-                result['file_deleted'] = True
-                result['archive_completed'] = True
-                self.logger.info(f"✓ アーカイブ後処理完了: {file_path}")
-                
-            except Exception as e:
-                # アーカイブ後処理失敗
-                error_msg = f"アーカイブ後処理失敗: {str(e)}"
-                self.logger.error(f"✗ {error_msg}: {file_path}")
-                
-                # 結果を失敗に変更
-                result['success'] = False
-                result['error'] = error_msg
-                result['file_deleted'] = False
-                result['archive_completed'] = False
             
-            processed_results.append(result)
+            # 成功
+            result.file_deleted = True
+            result.archive_completed = True
+            self.logger.info(f"✓ アーカイブ後処理完了: {file_path}", extra=DETAIL)
+            
+        except Exception as e:
+            # アーカイブ後処理失敗
+            error_msg = f"アーカイブ後処理失敗: {str(e)}"
+            self.logger.error(f"✗ {error_msg}: {file_path}")
+            
+            # 結果を失敗に変更
+            result.success = False
+            result.error = error_msg
+            result.file_deleted = False
+            result.archive_completed = False
         
-        # 処理結果のサマリー
-        completed_count = len([r for r in processed_results if r.get('archive_completed', False)])
-        failed_count = len([r for r in processed_results if r.get('success', False) and not r.get('archive_completed', False)])
+        self._record_result(result)
+    
+    def _record_result(self, result: FileRecord) -> None:
+        """最終結果の確定（run実行中は処理結果ファイルへ追記、1ファイルにつき1回のみ）"""
+        if result.recorded:
+            return
+        result.recorded = True
+        if self.results_log is not None:
+            self.results_log.append(result)
+    
+    def _verify_uploaded_size(self, result: FileRecord) -> None:
+        """S3オブジェクトのサイズと元ファイルのサイズを照合（不一致時は例外）"""
+        if self._s3_client is None:
+            self._s3_client = self._initialize_s3_client()
         
-        self.logger.info("アーカイブ後処理完了")
-        self.logger.info(f"  - 完了: {completed_count}件")
-        self.logger.info(f"  - 失敗: {failed_count}件")
+        bucket_name = self.config['aws']['s3_bucket']
+        self.metrics.increment('s3_head_object_calls')
+        with self.metrics.timer('verify_head_object'):
+            outcome = self.retry_policy.call(
+                lambda: self._s3_client.head_object(Bucket=bucket_name, Key=result.s3_key),
+                'head_object', result.s3_key
+            )
+            if not outcome['success']:
+                raise outcome['exception']
+        response = outcome['result']
+        remote_size = response.get('ContentLength')
+        
+        file_path = result.path
+        with self.host_limiter.slot(file_path):
+            local_size = os.path.getsize(file_path)
         
-        return processed_results
+        if remote_size != local_size:
+            raise Exception(f"アップロードサイズ不一致 (ローカル: {local_size:,} bytes / S3: {remote_size} bytes)")
 
-    def rename_archived_directories(self, results: List[Dict]) -> None:
+    def rename_archived_directories(self, results) -> None:
         """各ディレクトリ処理完了後の個別リネーム"""
         self.logger.info("ディレクトリリネーム処理開始")
         
@@ -616,7 +1144,8 @@ class ArchiveProcessor:
         archived_path = f"{directory_path}{archived_suffix}"
         
         try:
-            os.rename(directory_path, archived_path)
+            with self.metrics.timer('rename'):
+                os.rename(directory_path, archived_path)
             self.logger.info(f"✓ ディレクトリリネーム成功: {directory_path} → {archived_path}")
             
         except PermissionError as e:
@@ -634,34 +1163,47 @@ class ArchiveProcessor:
             self.logger.error(f"  エラー詳細: {str(e)}")
             self.logger.error(f"  手動対応: システム管理者にご連絡ください")
 
-    def _calculate_directory_completion(self, results: List[Dict]) -> Dict:
-        """ディレクトリごとの処理完了状況を計算"""
-        directory_stats = {}
-        
-        for result in results:
-            directory = result.get('directory')
-            if directory:
-                if directory not in directory_stats:
-                    directory_stats[directory] = {'total': 0, 'processed': 0}
-                
-                directory_stats[directory]['total'] += 1
-                # 成功・失敗問わず処理済みとしてカウント
-                directory_stats[directory]['processed'] += 1
+    def _calculate_directory_completion(self, results) -> Dict:
+        """ディレクトリごとの処理完了状況を計算（results: FileRecordStore または ResultsLog）"""
+        # 成功・失敗問わず処理済みとしてカウント
+        return {
+            directory: {'total': count, 'processed': count}
+            for directory, count in results.directory_counts().items()
+            if directory
+        }
         
-        return directory_stats
+    def save_to_database(self, results) -> None:
+        """
+        データベース登録処理
         
-    def save_to_database(self, results: List[Dict]) -> None:
-        """データベース登録処理"""
+        Args:
+            results: 処理結果（FileRecordStore または ResultsLog）
+        """
         self.logger.info("データベース登録開始")
         
         # アーカイブ後処理完了ファイルのみ登録
-        completed_results = [r for r in results if r.get('archive_completed', False)]
+        completed_count = results.count_completed()
         
-        if not completed_results:
+        if not completed_count:
             self.logger.info("データベース登録対象ファイルがありません")
             return
         
-        self.logger.info(f"データベース登録対象: {len(completed_results)}件")
+        self.logger.info(f"データベース登録対象: {completed_count}件")
+        
+        # 設定から依頼情報を取得（コマンドライン引数を優先）
+        request_config = self.config.get('request', {})
+        request_id = self.request_id  # コマンドライン引数を使用
+        requester = self.requester or request_config.get('requester', '00000000')
+        
+        # 現在時刻
+        current_time = datetime.datetime.now()
+        
+        # バケット名を取得（S3 URL生成用）
+        bucket_name = self.config.get('aws', {}).get('s3_bucket', '')
+        
+        # マニフェストのアップロード（DB登録に失敗しても対応関係を残すため先に実行）
+        if self.manifest_writer:
+            self._upload_manifest(results, bucket_name, request_id, requester, current_time)
         
         try:
             # データベース接続
@@ -670,51 +1212,50 @@ class ArchiveProcessor:
             # トランザクション開始
             with conn:
                 with conn.cursor() as cursor:
-                    # 設定から依頼情報を取得（コマンドライン引数を優先）
-                    request_config = self.config.get('request', {})
-                    request_id = self.request_id  # コマンドライン引数を使用
-                    requester = request_config.get('requester', '00000000')
-                    
                     # デバッグ用ログ追加
                     self.logger.info(f"デバッグ: request_id='{request_id}' (長さ:{len(request_id)})")
                     self.logger.info(f"デバッグ: requester='{requester}' (長さ:{len(requester)})")
                     
-                    # 現在時刻
-                    current_time = datetime.datetime.now()
-                    
-                    # バケット名を取得（S3 URL生成用）
-                    bucket_name = self.config.get('aws', {}).get('s3_bucket', '')
-                    
-                    # バッチ挿入用のデータ準備
-                    insert_data = []
-                    for result in completed_results:
-                        # S3完全URLの生成
-                        s3_key = result.get('s3_key', '')
-                        s3_url = f"s3://{bucket_name}/{s3_key}" if s3_key else ''
-                        
-                        record = (
-                            request_id,
-                            requester,
-                            current_time,  # request_date
-                            result['file_path'],  # original_file_path
-                            s3_url,  # s3_path
-                            current_time,  # archive_date
-                            result['file_size']
-                        )
-                        insert_data.append(record)
-                    
-                    # バッチ挿入実行
-                    insert_query = """
+                    # バッチ挿入（処理結果を一定件数ずつ読み出して挿入し、全件をメモリに載せない）
+                    # file_mtime・checksum は列追加済みのDBのみ登録（アーカイブ済み判定に使用）
+                    with_identity = has_identity_columns(cursor)
+                    insert_query = f"""
                         INSERT INTO archive_history (
                             request_id, requester, request_date,
                             original_file_path, s3_path, archive_date, file_size
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s)
+                            {', file_mtime, checksum' if with_identity else ''}
+                        ) VALUES (%s, %s, %s, %s, %s, %s, %s{', %s, %s' if with_identity else ''})
                     """
                     
-                    cursor.executemany(insert_query, insert_data)
+                    inserted_count = 0
+                    completed_results = iter(results.completed())
+                    while True:
+                        insert_data = []
+                        for result in islice(completed_results, DB_INSERT_BATCH_SIZE):
+                            # S3完全URLの生成
+                            s3_key = result.s3_key
+                            s3_url = f"s3://{bucket_name}/{s3_key}" if s3_key else ''
+                            
+                            row = (
+                                request_id,
+                                requester,
+                                current_time,  # request_date
+                                result.path,  # original_file_path
+                                s3_url,  # s3_path
+                                current_time,  # archive_date
+                                result.size
+                            )
+                            if with_identity:
+                                row += (result.mtime, result.checksum)
+                            insert_data.append(row)
+                        if not insert_data:
+                            break
+                        
+                        with self.metrics.timer('db_insert'):
+                            cursor.executemany(insert_query, insert_data)
+                        inserted_count += len(insert_data)
+                        self.metrics.increment('db_rows_inserted', len(insert_data))
                     
-                    # 挿入件数確認
-                    inserted_count = cursor.rowcount
                     self.logger.info(f"データベース挿入完了: {inserted_count}件")
                     
                     # コミットは with文で自動実行
@@ -733,6 +1274,20 @@ class ArchiveProcessor:
             except Exception:
                 pass
     
+    def _upload_manifest(self, results, bucket_name: str, request_id: str, requester: str,
+                         current_time: datetime.datetime) -> None:
+        """依頼単位のマニフェストをS3へアップロード（失敗してもDB登録は継続）"""
+        try:
+            if self._s3_client is None:
+                self._s3_client = self._initialize_s3_client()
+            with self.metrics.timer('manifest_upload'):
+                self.manifest_writer.upload(
+                    self._s3_client, self.retry_policy, results, bucket_name.strip(),
+                    request_id, requester, current_time, current_time
+                )
+        except Exception as e:
+            self.logger.error(f"マニフェスト作成エラー: {str(e)}")
+    
     def _connect_database(self):
         """データベース接続"""
         try:
@@ -815,9 +1370,16 @@ class ArchiveProcessor:
             self.logger.error(f"CSV検証エラーファイル生成失敗: {str(e)}")
             return None
     
-    def generate_error_csv(self, failed_items: List[Dict], original_csv_path: str) -> Optional[str]:
-        """アーカイブ処理失敗ファイル用の再試行CSVファイル生成"""
-        if not failed_items:
+    def generate_error_csv(self, results, original_csv_path: str) -> Optional[str]:
+        """
+        アーカイブ処理失敗ファイル用の再試行CSVファイル生成
+        
+        Args:
+            results: 処理結果（FileRecordStore または ResultsLog、失敗分を検索して使用）
+            original_csv_path: 元の依頼CSVのパス
+        """
+        failed_count = results.count_failed()
+        if not failed_count:
             return None
             
         self.logger.info("アーカイブエラー（再試行用）ファイル生成開始")
@@ -837,11 +1399,7 @@ class ArchiveProcessor:
             original_header = self._get_original_csv_header(original_csv_path)
             
             # 失敗したファイルのディレクトリを収集（重複除去）
-            failed_directories = set()
-            for item in failed_items:
-                directory = item.get('directory')
-                if directory:
-                    failed_directories.add(directory)
+            failed_directories = results.failed_directories()
             
             # 再試行用CSVの生成（元のフォーマットと同じ）
             with open(error_csv_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
@@ -852,19 +1410,16 @@ class ArchiveProcessor:
                     writer.writerow([original_header])
                 
                 # 失敗したディレクトリのみを書き込み
-                for directory in sorted(failed_directories):
+                for directory in failed_directories:
                     writer.writerow([directory])
                     # 詳細なエラー理由はログに出力済み
             
             self.logger.info(f"アーカイブエラー（再試行用）ファイル生成完了: {error_csv_path}")
             self.logger.info(f"再試行対象ディレクトリ数: {len(failed_directories)}")
-            self.logger.info(f"失敗ファイル数: {len(failed_items)}")
+            self.logger.info(f"失敗ファイル数: {failed_count}")
             
             # エラー理由の統計をログに出力
-            error_summary = {}
-            for item in failed_items:
-                error_type = item.get('error', '不明なエラー')
-                error_summary[error_type] = error_summary.get(error_type, 0) + 1
+            error_summary = results.error_counts()
             
             self.logger.info("エラー理由の内訳:")
             for error_type, count in error_summary.items():
@@ -898,7 +1453,17 @@ class ArchiveProcessor:
         self.logger.info(f"総ファイル数: {self.stats['total_files']}")
         self.logger.info(f"成功ファイル数: {self.stats['processed_files']}")
         self.logger.info(f"失敗ファイル数: {self.stats['failed_files']}")
+        if self.stats['skipped_files']:
+            self.logger.info(f"スキップファイル数（アーカイブ済み）: {self.stats['skipped_files']}")
         self.logger.info(f"総ファイルサイズ: {self.stats['total_size']:,} bytes")
+        if elapsed_time.total_seconds() > 0:
+            self.logger.info(f"平均スループット: {self.stats['total_size'] / elapsed_time.total_seconds() / 1048576:.2f} MB/s")
+        self.metrics.log_summary()
+        retry_summary = self.retry_policy.summary()
+        self.logger.info(f"リトライ: {retry_summary['retries']}回 (対象 {retry_summary['retried_calls']}件, "
+                         f"予算超過 {retry_summary['budget_exhausted']}回)")
+        if self.fault_injector:
+            self.fault_injector.log_summary()
         
     def run(self, csv_path: str, request_id: str) -> int:
         """メイン処理の実行"""
@@ -906,47 +1471,73 @@ class ArchiveProcessor:
         
         # request_idをインスタンス変数として保存
         self.request_id = request_id
+        exit_code = 1
+        exporter = PrometheusTextfileExporter.from_config(
+            self.config.get('metrics', {}).get('prometheus_textfile', {}),
+            self.metrics, 'archive', 'put', {'request_id': request_id}, request_id, self.logger
+        )
+        if exporter:
+            exporter.start()
         
         try:
             self.logger.info(f"アーカイブ処理開始 - Request ID: {request_id}")
+            self.results_log = ResultsLog.from_config(
+                self.config.get('results_log', {}), self.log_file,
+                self.config.get('logging', {}).get('log_directory', 'logs'), self.logger
+            )
             
             # 1. CSVファイル読み込み・検証
-            directories, csv_errors = self.validate_csv_input(csv_path)
-            
-            # CSV検証エラーがあった場合はエラーファイルを生成
-            if csv_errors:
-                error_csv_path = self.generate_csv_error_file(csv_path)
-                self.logger.warning(f"CSV検証エラーが発生しました: {error_csv_path}")
+            with self.metrics.stage('csv_validation'):
+                directories, csv_errors = self.validate_csv_input(csv_path)
+                
+                # CSV検証エラーがあった場合はエラーファイルを生成
+                if csv_errors:
+                    error_csv_path = self.generate_csv_error_file(csv_path)
+                    self.logger.warning(f"CSV検証エラーが発生しました: {error_csv_path}")
             
             if not directories:
                 self.logger.error("処理対象のディレクトリが見つかりません")
                 return 1
                 
             # 2. ファイル収集
-            files = self.collect_files(directories)
+            with self.metrics.stage('enumeration'):
+                files = self.collect_files(directories)
             if not files:
                 self.logger.warning("処理対象のファイルが見つかりません")
+                exit_code = 0
                 return 0
                 
             self.stats['total_files'] = len(files)
-            self.stats['total_size'] = sum(f['size'] for f in files)
+            self.stats['total_size'] = files.total_size()
             
             # 3. S3アップロード
-            upload_results = self.archive_to_s3(files)
+            with self.metrics.stage('upload'):
+                upload_results = self.archive_to_s3(files)
             
             # 4. アーカイブ後処理（元ファイル削除のみ）
-            processed_results = self.create_archived_files(upload_results)
+            with self.metrics.stage('delete'):
+                processed_results = self.create_archived_files(upload_results)
+            
+            # 以降の後処理は処理結果ファイルを検索（無効時はメモリ上の結果を使用）
+            if self.results_log is not None:
+                results = self.results_log
+                files = upload_results = processed_results = None
+            else:
+                results = processed_results
             
             # 5. データベース登録
-            self.save_to_database(processed_results)
+            with self.metrics.stage('database'):
+                self.save_to_database(results)
             
             # 6. ディレクトリリネーム処理（新機能）
-            self.rename_archived_directories(processed_results)
+            with self.metrics.stage('rename'):
+                self.rename_archived_directories(results)
             
             # 7. アーカイブ処理エラー処理
-            failed_items = [r for r in processed_results if not r.get('success', False)]
-            if failed_items:
-                archive_error_csv = self.generate_error_csv(failed_items, csv_path)
+            failed_count = results.count_failed()
+            if failed_count:
+                with self.metrics.stage('error_report'):
+                    archive_error_csv = self.generate_error_csv(results, csv_path)
                 if archive_error_csv:
                     self.logger.warning(f"アーカイブエラーが発生したファイルがあります: {archive_error_csv}")
                 else:
@@ -954,10 +1545,12 @@ class ArchiveProcessor:
             else:
                 self.logger.info("全てのファイルが正常にアーカイブされました")
                 
-            self.stats['processed_files'] = len([r for r in processed_results if r.get('success', False)])
-            self.stats['failed_files'] = len(failed_items)
+            self.stats['processed_files'] = results.count_successful()
+            self.stats['failed_files'] = failed_count
+            self.stats['skipped_files'] = results.count_skipped()
             
             self.logger.info("アーカイブ処理完了")
+            exit_code = 0
             return 0
             
         except Exception as e:
@@ -965,31 +1558,107 @@ class ArchiveProcessor:
             return 1
             
         finally:
+            self._shutdown_deletion_stage()
             self.stats['end_time'] = datetime.datetime.now()
             self.print_statistics()
+            self.write_run_report(exit_code)
+            if exporter:
+                exporter.stop(exit_code)
+            if self.results_log is not None:
+                self.results_log.close()
+                self.results_log = None
+
+    def write_run_report(self, exit_code: int) -> None:
+        """実行レポート（JSON）の出力"""
+        log_config = self.config.get('logging', {})
+        if not log_config.get('metrics_report', True):
+            return
+        
+        report_path = RunMetrics.report_path_for(
+            self.log_file, log_config.get('log_directory', 'logs'), 'archive'
+        )
+        stats = dict(self.stats)
+        elapsed = (stats['end_time'] - stats['start_time']).total_seconds() if stats['start_time'] and stats['end_time'] else 0
+        stats['bytes_per_sec'] = round(stats['total_size'] / elapsed, 1) if elapsed > 0 else None
+        stats['csv_errors'] = len(self.csv_errors)
+        self.metrics.write_report(report_path, {
+            'request_id': getattr(self, 'request_id', None),
+            'exit_code': exit_code,
+            'stats': stats,
+            'retry': self.retry_policy.summary(),
+            'fault_injection': self.fault_injector.summary() if self.fault_injector else None,
+            'results_log': str(self.results_log.path) if self.results_log is not None and self.results_log.keep else None,
+        })
 
 
 def main():
     """メイン関数"""
     parser = argparse.ArgumentParser(description='ファイルアーカイブ処理')
-    parser.add_argument('csv_path', help='対象ディレクトリを記載したCSVファイルのパス')
-    parser.add_argument('request_id', help='アーカイブ依頼ID')
+    parser.add_argument('csv_path', nargs='?', help='対象ディレクトリを記載したCSVファイルのパス')
+    parser.add_argument('request_id', nargs='?', help='アーカイブ依頼ID')
     parser.add_argument('--config', default=DEFAULT_CONFIG_PATH, 
                        help=f'設定ファイルのパス (デフォルト: {DEFAULT_CONFIG_PATH})')
     
+    # 作業キューモード（sql/archive_queue_schema.sql のテーブルが必要）
+    queue_group = parser.add_mutually_exclusive_group()
+    queue_group.add_argument('--enqueue', action='store_true',
+                            help='依頼を作業キューに登録のみ行う（処理はワーカーが実行）')
+    queue_group.add_argument('--worker', action='store_true',
+                            help='ワーカーモード（作業キューからタスクを取得して処理）')
+    queue_group.add_argument('--multi-request', metavar='LIST_CSV',
+                            help='複数依頼を重み付きラウンドロビンで同時処理（CSV Path,Request ID,Weight の一覧）')
+    parser.add_argument('--worker-id', help='ワーカー識別子 (デフォルト: ホスト名-PID)')
+    parser.add_argument('--only-request', metavar='REQUEST_ID',
+                       help='ワーカーモードで処理する依頼IDを限定')
+    parser.add_argument('--plan', action='store_true',
+                       help='列挙と所要時間の見積もりのみ行う（S3・データベースにはアクセスしない）')
+    parser.add_argument('--refresh-inventory', action='store_true',
+                       help='対象ディレクトリ配下の列挙キャッシュを破棄して再列挙する')
+    
     args = parser.parse_args()
     
+    # ワーカーモード
+    if args.worker:
+        processor = ArchiveProcessor(args.config)
+        queue = ArchiveQueue(processor, args.worker_id)
+        sys.exit(queue.run_worker(args.only_request))
+    
+    # 複数依頼の同時処理モード
+    if args.multi_request:
+        if not os.path.exists(args.multi_request):
+            print(f"依頼一覧ファイルが見つかりません: {args.multi_request}")
+            sys.exit(1)
+        processor = ArchiveProcessor(args.config)
+        processor.refresh_inventory = args.refresh_inventory
+        scheduler = FairShareScheduler(processor)
+        for item in FairShareScheduler.load_request_list(args.multi_request):
+            scheduler.add_request(item['csv_path'], item['request_id'], item['weight'])
+        sys.exit(scheduler.run())
+    
+    if not args.csv_path or (not args.request_id and not args.plan):
+        parser.error('csv_path と request_id を指定してください')
+    
     # CSVファイルの存在チェック
     if not os.path.exists(args.csv_path):
         print(f"CSVファイルが見つかりません: {args.csv_path}")
         sys.exit(1)
+    
+    processor = ArchiveProcessor(args.config)
+    processor.refresh_inventory = args.refresh_inventory
+    
+    # 実行計画モード
+    if args.plan:
+        sys.exit(ArchivePlanner(processor).create_plan(args.csv_path, args.request_id))
+    
+    # キュー登録モード
+    if args.enqueue:
+        sys.exit(ArchiveQueue(processor).enqueue(args.csv_path, args.request_id))
         
     # アーカイブ処理の実行
-    processor = ArchiveProcessor(args.config)
     exit_code = processor.run(args.csv_path, args.request_id)
     
     sys.exit(exit_code)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+アーカイブ済みパスの Bloom フィルタ（archive_history.original_file_path のスナップショット）
+- 「このパスはアーカイブ済みか」を大量のパスについて問い合わせる処理（アーカイブ前の重複除外）で、
+  フィルタに含まれないパスはDBに問い合わせずに「未アーカイブ」と判定する
+- フィルタに含まれるパス（偽陽性を含む）のみ呼び出し側がDB（または履歴ミラー）で確認する
+- スナップショットは本スクリプトで作成し（夜間バッチ等）、各スクリプトは起動時に読み込む
+- 読み込み後の初回判定時に、スナップショット作成以降に登録された行（id で判定）をDBから追加する
+  （DBに接続できない場合はスナップショットのみで判定するため、以降の登録分は「未アーカイブ」となる。
+   重複除外では再アップロードとなり安全側）
+
+目安: 偽陽性率 0.1% で1パスあたり約 14.4 bit（1億パスで約 180MB）
+
+使用方法:
+    python archived_index.py                       # スナップショット作成（archived_index.path）
+    python archived_index.py --false-positive-rate 0.0001
+"""
+
+import argparse
+import datetime
+import hashlib
+import logging
+import math
+import os
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+# ファイル形式: ヘッダ（識別子, 版, ビット数, ハッシュ数, 件数, 差分取り込みの起点id, 作成時刻）+ ビット列
+FILE_MAGIC = b'ARCBLOOM'
+FILE_VERSION = 1
+HEADER = struct.Struct('<8sIQIQQd')
+
+
+class BloomFilter:
+    """Bloom フィルタ（ダブルハッシングで k 個の位置を算出）"""
+
+    def __init__(self, bit_count: int, hash_count: int, bits: Optional[bytearray] = None):
+        self.bit_count = max(8, bit_count)
+        self.hash_count = max(1, hash_count)
+        self.bits = bits if bits is not None else bytearray((self.bit_count + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, items: int, false_positive_rate: float) -> 'BloomFilter':
+        """想定件数と偽陽性率から最適なビット数・ハッシュ数で生成"""
+        items = max(1, items)
+        bit_count = math.ceil(-items * math.log(false_positive_rate) / (math.log(2) ** 2))
+        hash_count = max(1, round(bit_count / items * math.log(2)))
+        return cls(bit_count, hash_count)
+
+    def _positions(self, key: str) -> Iterable[int]:
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        m = self.bit_count
+        return ((h1 + i * h2) % m for i in range(self.hash_count))
+
+    def add(self, key: str) -> None:
+        bits = self.bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class ArchivedIndex:
+    """アーカイブ済みパスのスナップショット（判定はスレッドセーフ）"""
+
+    def __init__(self, path: str, logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            path: スナップショットファイルのパス
+            logger: ログ出力先
+        """
+        self.path = Path(path)
+        self.logger = logger or logging.getLogger(__name__)
+        with open(self.path, 'rb') as f:
+            header = f.read(HEADER.size)
+            if len(header) != HEADER.size:
+                raise ValueError(f"スナップショットのヘッダが不完全です（再作成してください）: {self.path}")
+            magic, version, bit_count, hash_count, items, resume_id, created_at = HEADER.unpack(header)
+            if magic != FILE_MAGIC or version != FILE_VERSION:
+                raise ValueError(f"スナップショットの形式が正しくありません: {self.path}")
+            bits = bytearray(f.read())
+        # 途中で切れた・壊れたファイルは、ビット列の範囲外参照や誤った「未アーカイブ」判定になるため使用しない
+        if bit_count < 8 or hash_count < 1 or len(bits) != (bit_count + 7) // 8:
+            raise ValueError(f"スナップショットのビット列がヘッダと一致しません（再作成してください）: {self.path} "
+                             f"（ビット数 {bit_count:,} に対して {len(bits):,} bytes）")
+        self.bloom = BloomFilter(bit_count, hash_count, bits)
+        self.items = items
+        self.resume_id = resume_id
+        self.created_at = created_at
+        self._lock = threading.Lock()
+        self._caught_up = False
+
+    @classmethod
+    def from_config(cls, config: Dict, logger: Optional[logging.Logger] = None) -> Optional['ArchivedIndex']:
+        """設定辞書（archived_indexセクション）から読み込み（無効時・スナップショットがない場合はNone）"""
+        if not config.get('enabled', False):
+            return None
+        logger = logger or logging.getLogger(__name__)
+        path = config.get('path', 'cache/archived_paths.bloom')
+        try:
+            index = cls(path, logger)
+        except (OSError, ValueError) as e:
+            logger.warning(f"アーカイブ済みパスのスナップショットを使用しません: {e}")
+            return None
+        created_at = datetime.datetime.fromtimestamp(index.created_at).strftime('%Y-%m-%d %H:%M:%S')
+        logger.info(f"アーカイブ済みパスのスナップショット: {index.path} ({index.items:,}件, 作成: {created_at})")
+        return index
+
+    def catch_up(self, connect: Callable) -> int:
+        """
+        スナップショット作成以降に登録された行の取り込み（失敗時はスナップショットのみで判定）
+
+        Returns:
+            int: 取り込んだ行数
+        """
+        added = 0
+        started = time.monotonic()
+        try:
+            conn = connect()
+            try:
+                with conn.cursor(name='archived_index_catch_up') as cursor:
+                    cursor.itersize = 50000
+                    cursor.execute("SELECT original_file_path FROM archive_history WHERE id > %s", (self.resume_id,))
+                    for (path,) in cursor:
+                        self.bloom.add(path)
+                        added += 1
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception as e:
+            self.logger.warning(f"スナップショット作成以降の登録分を取り込めません（スナップショットのみで判定）: {e}")
+            return 0
+        self.logger.info(f"スナップショット作成以降の登録分を取り込み: {added:,}件 ({time.monotonic() - started:,.1f}秒)")
+        return added
+
+    def candidates(self, paths: Iterable[str], connect: Optional[Callable] = None) -> List[str]:
+        """
+        アーカイブ済みの可能性があるパス（フィルタに含まれないパスは確実に未アーカイブ）
+
+        Args:
+            paths: 判定するパス
+            connect: psycopg2接続を返す処理（指定時は初回のみ作成以降の登録分を取り込む）
+        """
+        with self._lock:
+            if connect and not self._caught_up:
+                self._caught_up = True
+                self.catch_up(connect)
+            return [path for path in paths if path in self.bloom]
+
+
+def build_snapshot(conn, path: str, false_positive_rate: float = 0.001, overlap_minutes: float = 60.0,
+                   logger: Optional[logging.Logger] = None) -> Dict:
+    """
+    archive_history からスナップショットを作成（一時ファイルに書き込んで置き換え）
+
+    差分取り込みの起点は、作成時点（DBサーバ時刻）から overlap_minutes 遡った時刻より前に作成された行の最大 id
+    （作成時に実行中だったトランザクションの行を次回の取り込みで拾う）。
+
+    Returns:
+        Dict: 作成結果（件数・ビット数・ハッシュ数・所要時間等）
+    """
+    logger = logger or logging.getLogger(__name__)
+    started = time.monotonic()
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*), LOCALTIMESTAMP FROM archive_history")
+        row_count, db_now = cursor.fetchone()
+    cutoff = db_now - datetime.timedelta(minutes=overlap_minutes)
+
+    bloom = BloomFilter.for_capacity(row_count, false_positive_rate)
+    logger.info(f"スナップショット作成開始: 想定 {row_count:,}件 / {bloom.bit_count:,} bit / ハッシュ数 {bloom.hash_count}")
+    items = 0
+    resume_id = 0
+    with conn.cursor(name='archived_index_build') as cursor:
+        cursor.itersize = 50000
+        cursor.execute("SELECT id, original_file_path, created_at FROM archive_history")
+        for row_id, original_file_path, created_at in cursor:
+            bloom.add(original_file_path)
+            items += 1
+            if created_at < cutoff and row_id > resume_id:
+                resume_id = row_id
+            if items % 1000000 == 0:
+                logger.info(f"スナップショット作成中: {items:,}件")
+    conn.commit()
+
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = target.with_name(target.name + '.tmp')
+    with open(temp_path, 'wb') as f:
+        f.write(HEADER.pack(FILE_MAGIC, FILE_VERSION, bloom.bit_count, bloom.hash_count,
+                            items, resume_id, time.time()))
+        f.write(bloom.bits)
+    os.replace(temp_path, target)
+
+    summary = {
+        'path': str(target),
+        'items': items,
+        'bit_count': bloom.bit_count,
+        'hash_count': bloom.hash_count,
+        'bytes': target.stat().st_size,
+        'resume_id': resume_id,
+        'seconds': round(time.monotonic() - started, 1),
+    }
+    logger.info(f"スナップショット作成完了: {target} ({items:,}件 / {summary['bytes']:,} bytes / "
+                f"{summary['seconds']:,.1f}秒)")
+    return summary
+
+
+def main():
+    """メイン関数（スナップショット作成）"""
+    from archive_script_main import DEFAULT_CONFIG_PATH, ArchiveProcessor
+
+    parser = argparse.ArgumentParser(description='アーカイブ済みパスのスナップショット（Bloom フィルタ）作成')
+    parser.add_argument('--config', default=DEFAULT_CONFIG_PATH,
+                        help=f'設定ファイルパス (デフォルト: {DEFAULT_CONFIG_PATH})')
+    parser.add_argument('--output', help='出力先 (デフォルト: 設定の archived_index.path)')
+    parser.add_argument('--false-positive-rate', type=float,
+                        help='偽陽性率 (デフォルト: 設定の archived_index.false_positive_rate)')
+
+    args = parser.parse_args()
+
+    try:
+        processor = ArchiveProcessor(args.config)
+        index_config = processor.config.get('archived_index', {})
+        conn = processor._connect_database()
+        try:
+            build_snapshot(
+                conn,
+                args.output or index_config.get('path', 'cache/archived_paths.bloom'),
+                args.false_positive_rate or index_config.get('false_positive_rate', 0.001),
+                index_config.get('overlap_minutes', 60),
+                processor.logger
+            )
+        finally:
+            conn.close()
+        return 0
+    except Exception as e:
+        print(f"❌ スナップショット作成エラー: {str(e)}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
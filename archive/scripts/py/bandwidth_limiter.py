@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+転送帯域制御（トークンバケット方式）
+- 全転送ワーカーで1つのバケットを共有
+- 時間帯別の帯域上限スケジュール（例: 08:00～20:00は200Mbps、それ以外は無制限）
+- 実行中に時間帯が変わると上限を自動で切り替え
+- boto3のupload_file / download_fileのCallbackとして使用する
+"""
+
+import datetime
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class BandwidthLimiter:
+    """時間帯スケジュール付きトークンバケット帯域制御クラス"""
+
+    def __init__(self, schedule: Optional[List[Dict]] = None, default_mbps: float = 0,
+                 burst_seconds: float = 1.0, logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            schedule: 時間帯別の上限 [{"start": "08:00", "end": "20:00", "mbps": 200}, ...]
+                      start > end の場合は日付をまたぐ時間帯として扱う
+            default_mbps: スケジュール外の上限（0以下は無制限）
+            burst_seconds: バケット容量（上限速度で何秒分の転送を貯められるか）
+            logger: ログ出力先
+        """
+        self.schedule = [self._parse_window(window) for window in (schedule or [])]
+        self.default_mbps = default_mbps
+        self.burst_seconds = burst_seconds
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._rate = None  # bytes/sec（Noneは無制限）
+        self._tokens = 0.0
+        self._last_refill = time.monotonic()
+        self._last_rate_check = 0.0
+        self.throttled_seconds = 0.0
+        self._update_rate(force=True)
+
+    @classmethod
+    def from_config(cls, config: Dict, logger: Optional[logging.Logger] = None) -> Optional['BandwidthLimiter']:
+        """設定辞書（bandwidthセクション）から生成（無効時はNone）"""
+        if not config.get('enabled', False):
+            return None
+        return cls(
+            schedule=config.get('schedule', []),
+            default_mbps=config.get('default_mbps', 0),
+            burst_seconds=config.get('burst_seconds', 1.0),
+            logger=logger
+        )
+
+    @staticmethod
+    def _parse_window(window: Dict) -> Dict:
+        """時間帯設定の解析"""
+        start = datetime.datetime.strptime(window['start'], '%H:%M').time()
+        end = datetime.datetime.strptime(window['end'], '%H:%M').time()
+        return {'start': start, 'end': end, 'mbps': float(window.get('mbps', 0))}
+
+    def current_mbps(self, now: Optional[datetime.datetime] = None) -> float:
+        """現在時刻に適用される上限（Mbps、0以下は無制限）"""
+        current = (now or datetime.datetime.now()).time()
+        for window in self.schedule:
+            start, end = window['start'], window['end']
+            if start <= end:
+                in_window = start <= current < end
+            else:
+                in_window = current >= start or current < end
+            if in_window:
+                return window['mbps']
+        return self.default_mbps
+
+    def _update_rate(self, force: bool = False) -> None:
+        """スケジュールに従い上限を更新（ロック保持中に呼び出すこと、判定は1秒に1回）"""
+        now = time.monotonic()
+        if not force and now - self._last_rate_check < 1.0:
+            return
+        self._last_rate_check = now
+
+        mbps = self.current_mbps()
+        rate = mbps * 1000 * 1000 / 8 if mbps > 0 else None
+        if rate != self._rate:
+            if rate is None:
+                self.logger.info("帯域上限変更: 無制限")
+            else:
+                self.logger.info(f"帯域上限変更: {mbps:g} Mbps ({rate / 1048576:.1f} MB/s)")
+            self._rate = rate
+            self._tokens = min(self._tokens, rate * self.burst_seconds) if rate else 0.0
+            self._last_refill = now
+
+    def consume(self, bytes_amount: int) -> float:
+        """
+        転送量を消費（上限超過時は呼び出しスレッドを待機させる）
+
+        boto3のCallbackから転送済みバイト数ごとに呼び出される。
+
+        Returns:
+            float: 上限超過で待機した秒数
+        """
+        with self._lock:
+            self._update_rate()
+            if self._rate is None:
+                return 0.0
+
+            now = time.monotonic()
+            capacity = self._rate * self.burst_seconds
+            self._tokens = min(capacity, self._tokens + (now - self._last_refill) * self._rate)
+            self._last_refill = now
+
+            # 先に予約して不足分だけ待機（待機はロック外で行う）
+            self._tokens -= bytes_amount
+            wait_seconds = -self._tokens / self._rate if self._tokens < 0 else 0.0
+            self.throttled_seconds += wait_seconds
+
+        if wait_seconds > 0:
+            time.sleep(wait_seconds)
+        return wait_seconds
+
+    def tracker(self) -> 'TransferThrottle':
+        """1転送分の待機時間を集計するCallbackを生成"""
+        return TransferThrottle(self)
+
+
+class TransferThrottle:
+    """1転送分の帯域制御（boto3のCallbackとして渡し、待機の有無を記録）"""
+
+    def __init__(self, limiter: BandwidthLimiter):
+        self.limiter = limiter
+        self.waited_seconds = 0.0
+
+    def __call__(self, bytes_amount: int) -> None:
+        # マルチパート転送では複数スレッドから呼ばれるため合計は概算（待機の有無の判定に使用）
+        self.waited_seconds += self.limiter.consume(bytes_amount)
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+アーカイブ・復元処理のベンチマーク
+- test_data_generator.py でサイズ分布を制御したテストデータを生成
+- ローカルのS3互換サーバ（MinIO、moto server等）とローカルPostgreSQLに対して
+  ArchiveProcessor / RestoreProcessor を実行
+- files/sec、MB/sec、ステージ別所要時間を結果ファイル（JSON Lines）に追記し、
+  コミット間で比較できるようにする
+
+復元はS3互換サーバ上でGlacier復元を待てないため、復元リクエスト送信後に
+全ファイルを復元完了扱いにしてダウンロード・配置を計測する。
+"""
+
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from archive_script_main import ArchiveProcessor
+from restore_script_main import RestoreProcessor
+from test_data_generator import TestDataGenerator
+
+# 設定ファイルのデフォルトパス
+DEFAULT_CONFIG_PATH = "config/archive_config.json"
+
+
+class ArchiveBenchmark:
+    """アーカイブ・復元ベンチマーククラス"""
+
+    def __init__(self, config_path: str, work_dir: str, s3_endpoint: Optional[str] = None,
+                 bucket: Optional[str] = None, label: str = ''):
+        self.work_dir = Path(work_dir)
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self.s3_endpoint = s3_endpoint
+        self.bucket = bucket
+        self.label = label
+        self.config_path = self._write_benchmark_config(config_path)
+        self._moto_server = None
+
+    def _write_benchmark_config(self, config_path: str) -> str:
+        """ベンチマーク用設定ファイルの生成（ログ出力先・S3接続先を上書き）"""
+        config = {}
+        if os.path.exists(config_path):
+            with open(config_path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+
+        config.setdefault('logging', {})['log_directory'] = str(self.work_dir / 'logs')
+        aws_config = config.setdefault('aws', {})
+        if self.s3_endpoint:
+            aws_config['vpc_endpoint_url'] = self.s3_endpoint
+        if self.bucket:
+            aws_config['s3_bucket'] = self.bucket
+        aws_config.setdefault('s3_bucket', 'archive-benchmark')
+        # S3互換サーバではGlacier系ストレージクラスを扱えないため STANDARD で計測
+        aws_config['storage_class'] = 'STANDARD'
+        restore_config = config.setdefault('restore', {})
+        restore_config['temp_download_directory'] = str(self.work_dir / 'temp_downloads')
+        restore_config['skip_existing_files'] = False
+
+        benchmark_config_path = self.work_dir / 'benchmark_config.json'
+        with open(benchmark_config_path, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False, indent=2)
+        self.config = config
+        return str(benchmark_config_path)
+
+    def start_moto_server(self, port: int = 5000) -> None:
+        """moto server（S3互換スタブ）をプロセス内で起動"""
+        try:
+            from moto.server import ThreadedMotoServer
+        except ImportError:
+            raise Exception("motoがインストールされていません。pip install \"moto[server]\" を実行してください。")
+
+        os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+        os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+        self._moto_server = ThreadedMotoServer(ip_address='127.0.0.1', port=port)
+        self._moto_server.start()
+        self.s3_endpoint = f"http://127.0.0.1:{port}"
+        self.config_path = self._write_benchmark_config(self.config_path)
+        print(f"moto server起動: {self.s3_endpoint}")
+
+    def stop_moto_server(self) -> None:
+        if self._moto_server:
+            self._moto_server.stop()
+            self._moto_server = None
+
+    def ensure_bucket(self) -> None:
+        """ベンチマーク用バケットの作成（存在しない場合のみ）"""
+        try:
+            import boto3
+        except ImportError:
+            raise Exception("boto3がインストールされていません。pip install boto3 を実行してください。")
+
+        aws_config = self.config['aws']
+        region = aws_config.get('region', 'ap-northeast-1').strip()
+        bucket = aws_config['s3_bucket']
+        s3_client = boto3.client('s3', endpoint_url=aws_config.get('vpc_endpoint_url') or None,
+                                 region_name=region)
+        try:
+            s3_client.head_bucket(Bucket=bucket)
+        except Exception:
+            s3_client.create_bucket(Bucket=bucket,
+                                    CreateBucketConfiguration={'LocationConstraint': region})
+            print(f"バケット作成: {bucket}")
+
+    def prepare_data(self, file_count: int, dir_count: int) -> Dict:
+        """テストデータとアーカイブ依頼CSVの生成"""
+        data_dir = self.work_dir / f"data_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        generator = TestDataGenerator()
+        directories = generator.create_directory_structure(str(data_dir), dir_count)
+
+        files_per_dir = file_count // dir_count
+        remaining_files = file_count % dir_count
+        generated = {}
+        for i, directory in enumerate(directories):
+            count = files_per_dir + (1 if i < remaining_files else 0)
+            dir_generator = TestDataGenerator()
+            if count > 0:
+                dir_generator.create_mixed_size_test_files(directory, count)
+            generated[directory] = list(dir_generator.generated_files)
+
+        csv_path = self.work_dir / 'benchmark_archive_request.csv'
+        generator.generate_csv_file(directories, str(csv_path))
+        return {'csv_path': str(csv_path), 'directories': directories, 'files': generated}
+
+    @staticmethod
+    def _summarize(metrics_summary: Dict, files: int, size_bytes: int, exit_code: int) -> Dict:
+        """ベンチマーク結果の集計"""
+        elapsed = metrics_summary['elapsed_seconds']
+        return {
+            'exit_code': exit_code,
+            'files': files,
+            'bytes': size_bytes,
+            'elapsed_seconds': elapsed,
+            'files_per_sec': round(files / elapsed, 2) if elapsed > 0 else None,
+            'mb_per_sec': round(size_bytes / elapsed / 1048576, 2) if elapsed > 0 else None,
+            'stages': metrics_summary['stages'],
+            'operations': metrics_summary['operations'],
+            'counters': metrics_summary['counters'],
+            'errors': metrics_summary['errors'],
+        }
+
+    def run_archive(self, csv_path: str, request_id: str) -> Dict:
+        """アーカイブ処理の計測"""
+        print(f"\n=== アーカイブ計測: {request_id} ===")
+        processor = ArchiveProcessor(self.config_path)
+        exit_code = processor.run(csv_path, request_id)
+        return self._summarize(processor.metrics.summary(), processor.stats['processed_files'],
+                               processor.stats['total_size'], exit_code)
+
+    def write_restore_csv(self, generated_files: Dict[str, List[str]]) -> str:
+        """
+        復元依頼CSVの生成
+
+        Windows環境ではディレクトリ復元、それ以外ではファイル復元で依頼する
+        （ディレクトリ検索パターンは \\ 区切りのUNCパスを前提としているため）。
+        """
+        restore_root = self.work_dir / 'restored'
+        csv_path = self.work_dir / 'benchmark_restore_request.csv'
+        with open(csv_path, 'w', encoding='utf-8-sig', newline='') as f:
+            f.write("restore path,restore directory,mode\n")
+            for directory, files in generated_files.items():
+                restore_dir = restore_root / os.path.basename(directory)
+                restore_dir.mkdir(parents=True, exist_ok=True)
+                if os.sep == '\\':
+                    f.write(f"{directory}\\,{restore_dir},directory\n")
+                else:
+                    for file_path in files:
+                        f.write(f"{file_path},{restore_dir},file\n")
+        return str(csv_path)
+
+    def run_restore(self, restore_csv_path: str, request_id: str) -> Dict:
+        """復元処理（DB検索・復元リクエスト・ダウンロード・配置）の計測"""
+        print(f"\n=== 復元計測: {request_id} ===")
+        processor = RestoreProcessor(self.config_path)
+        processor.request_id = request_id
+        processor.metrics.run_type = 'restore_benchmark'
+        processor.stats['start_time'] = datetime.datetime.now()
+        exit_code = 1
+
+        try:
+            with processor.metrics.stage('csv_validation'):
+                restore_requests, _ = processor.validate_csv_input(restore_csv_path)
+            with processor.metrics.stage('db_lookup'):
+                restore_requests = processor.lookup_files_from_database(restore_requests)
+            with processor.metrics.stage('restore_request'):
+                restore_requests = processor.request_restore(restore_requests)
+
+            # S3互換サーバでは復元待ちが発生しないため、全ファイルを復元完了として扱う
+            for request in restore_requests:
+                for file_info in request.get('files_found', []):
+                    file_info['restore_status'] = 'completed'
+
+            with processor.metrics.stage('download'):
+                restore_requests = processor.download_and_place_files(restore_requests)
+            exit_code = 0
+        finally:
+            processor.stats['end_time'] = datetime.datetime.now()
+            processor.print_statistics()
+
+        downloaded = [file_info for request in restore_requests for file_info in request.get('files_found', [])
+                      if file_info.get('download_status') == 'completed']
+        return self._summarize(processor.metrics.summary(), len(downloaded),
+                               sum(file_info.get('downloaded_size', 0) for file_info in downloaded), exit_code)
+
+    def cleanup_database(self, request_id: str) -> None:
+        """ベンチマークで登録したアーカイブ履歴の削除"""
+        processor = ArchiveProcessor(self.config_path)
+        conn = processor._connect_database()
+        try:
+            with conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("DELETE FROM archive_history WHERE request_id = %s", (request_id,))
+                    print(f"ベンチマーク履歴削除: {cursor.rowcount}件")
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _git_commit() -> Optional[str]:
+        """計測対象のコミットID"""
+        try:
+            result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                    text=True, cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+            return result.stdout.strip() or None
+        except Exception:
+            return None
+
+    def append_result(self, results_path: str, params: Dict, archive_result: Dict,
+                      restore_result: Optional[Dict]) -> None:
+        """結果ファイル（JSON Lines）への追記"""
+        record = {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'label': self.label,
+            'commit': self._git_commit(),
+            'params': params,
+            'archive': archive_result,
+            'restore': restore_result,
+        }
+        with open(results_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+        print(f"\n結果ファイルに追記: {results_path}")
+
+
+def print_result(name: str, result: Dict) -> None:
+    """計測結果の表示"""
+    print(f"\n--- {name} ---")
+    print(f"  ファイル数: {result['files']}  サイズ: {result['bytes']:,} bytes  所要時間: {result['elapsed_seconds']:.2f}秒")
+    print(f"  files/sec: {result['files_per_sec']}  MB/sec: {result['mb_per_sec']}")
+    for stage, timing in result['stages'].items():
+        print(f"  {stage}: {timing['seconds']:.3f}秒")
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description='アーカイブ・復元処理ベンチマーク')
+    parser.add_argument('work_dir', help='作業ディレクトリ（テストデータ・ログ・復元先）')
+    parser.add_argument('--config', default=DEFAULT_CONFIG_PATH,
+                        help=f'ベースにする設定ファイル (デフォルト: {DEFAULT_CONFIG_PATH})')
+    parser.add_argument('--file-count', type=int, default=100, help='生成するファイル数 (デフォルト: 100)')
+    parser.add_argument('--dir-count', type=int, default=5, help='生成するディレクトリ数 (デフォルト: 5)')
+    parser.add_argument('--s3-endpoint', help='S3互換サーバのURL（例: http://localhost:9000）')
+    parser.add_argument('--start-moto', action='store_true', help='moto serverをプロセス内で起動して使用')
+    parser.add_argument('--moto-port', type=int, default=5000, help='moto serverのポート (デフォルト: 5000)')
+    parser.add_argument('--bucket', help='ベンチマーク用バケット名 (デフォルト: 設定ファイルの値)')
+    parser.add_argument('--skip-restore', action='store_true', help='復元の計測を行わない')
+    parser.add_argument('--keep-history', action='store_true', help='登録したアーカイブ履歴を削除しない')
+    parser.add_argument('--label', default='', help='結果に記録するラベル（比較用）')
+    parser.add_argument('--results', default='benchmark_results.jsonl',
+                        help='結果ファイル (デフォルト: benchmark_results.jsonl)')
+
+    args = parser.parse_args()
+
+    benchmark = ArchiveBenchmark(args.config, args.work_dir, args.s3_endpoint, args.bucket, args.label)
+    request_id = f"BENCH-{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}"
+
+    try:
+        if args.start_moto:
+            benchmark.start_moto_server(args.moto_port)
+        benchmark.ensure_bucket()
+
+        data = benchmark.prepare_data(args.file_count, args.dir_count)
+        archive_result = benchmark.run_archive(data['csv_path'], request_id)
+        print_result('アーカイブ', archive_result)
+
+        restore_result = None
+        if not args.skip_restore:
+            restore_csv_path = benchmark.write_restore_csv(data['files'])
+            restore_result = benchmark.run_restore(restore_csv_path, request_id)
+            print_result('復元', restore_result)
+
+        params = {
+            'file_count': args.file_count,
+            'dir_count': args.dir_count,
+            's3_endpoint': benchmark.s3_endpoint,
+            'processing': benchmark.config.get('processing', {}),
+            'restore': benchmark.config.get('restore', {}),
+        }
+        benchmark.append_result(args.results, params, archive_result, restore_result)
+
+        if not args.keep_history:
+            benchmark.cleanup_database(request_id)
+        return 0
+
+    except Exception as e:
+        print(f"❌ ベンチマーク実行エラー: {str(e)}")
+        return 1
+
+    finally:
+        benchmark.stop_moto_server()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+並列転送の同時実行数制御
+- AIMD方式（加算増加・乗算減少）の適応的な同時実行数コントローラ
+- スループット改善中は同時実行数を増やし、S3スロットリング・SMBタイムアウト・
+  レイテンシ悪化を検知したら減らす
+  （レイテンシは 1MB あたりの秒数に換算し、小ファイル・大ファイルの区分ごとに基準と比較する）
+- ファイルサーバ（UNCパスのサーバ名）単位の同時アクセス数制限
+"""
+
+import errno
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# スロットリングと判定するS3エラーコード・メッセージ
+THROTTLE_ERROR_MARKERS = [
+    'SlowDown', 'Throttling', 'ThrottlingException', 'RequestLimitExceeded',
+    'TooManyRequests', 'ServiceUnavailable'
+]
+
+# タイムアウトと判定するメッセージ（SMBのセマフォタイムアウト等）
+TIMEOUT_ERROR_MARKERS = [
+    'timed out', 'timeout', 'Timeout', 'セマフォがタイムアウト'
+]
+
+
+def classify_transfer_error(error) -> Optional[str]:
+    """
+    転送エラーを混雑シグナルとして分類
+
+    Returns:
+        Optional[str]: 'throttle' / 'timeout' / None（混雑シグナルではない）
+    """
+    if isinstance(error, TimeoutError):
+        return 'timeout'
+    if isinstance(error, OSError):
+        # WinError 121: セマフォタイムアウト（SMB共有で多発）
+        if error.errno == errno.ETIMEDOUT or getattr(error, 'winerror', None) == 121:
+            return 'timeout'
+
+    message = str(error)
+    if any(marker in message for marker in THROTTLE_ERROR_MARKERS):
+        return 'throttle'
+    if any(marker in message for marker in TIMEOUT_ERROR_MARKERS):
+        return 'timeout'
+    return None
+
+
+class AdaptiveConcurrencyController:
+    """観測スループットと混雑シグナルに基づくAIMD同時実行数コントローラ"""
+
+    def __init__(self, name: str, initial: int = 4, min_workers: int = 1,
+                 max_workers: int = 16, adjust_interval: float = 10.0,
+                 increase_step: int = 1, decrease_factor: float = 0.5,
+                 latency_threshold: float = 1.5, small_file_threshold: int = 8388608,
+                 per_file_overhead_bytes: int = 262144,
+                 logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            name: ログ出力用の名称（例: 'upload', 'download'）
+            initial: 初期同時実行数
+            min_workers: 同時実行数の下限
+            max_workers: 同時実行数の上限（スレッドプールのサイズ）
+            adjust_interval: 調整判定の間隔（秒）
+            increase_step: スループット改善時の加算量
+            decrease_factor: 混雑検知時の乗算係数
+            latency_threshold: 基準レイテンシに対する悪化判定倍率
+            small_file_threshold: この値未満のファイルを小ファイル区分としてレイテンシを比較する（バイト）
+            per_file_overhead_bytes: 1ファイルあたりの固定コスト（リクエスト往復分をバイト換算、UploadScheduler と同じ）
+            logger: 調整内容の出力先ロガー
+        """
+        self.name = name
+        self.min_workers = max(1, int(min_workers))
+        self.max_workers = max(self.min_workers, int(max_workers))
+        self.limit = min(max(int(initial), self.min_workers), self.max_workers)
+        self.adjust_interval = adjust_interval
+        self.increase_step = max(1, int(increase_step))
+        self.decrease_factor = decrease_factor
+        self.latency_threshold = latency_threshold
+        self.small_file_threshold = small_file_threshold
+        self.per_file_overhead_bytes = per_file_overhead_bytes
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._condition = threading.Condition()
+        self._in_flight = 0
+
+        # 観測ウィンドウ
+        self._window_start = time.monotonic()
+        self._window_bytes = 0
+        self._window_files = 0
+        self._window_latency = self._empty_latency_window()
+        self._window_signals = {'throttle': 0, 'timeout': 0}
+        self._last_throughput = None
+        self._baseline_latency = {}  # 区分 -> 基準レイテンシ（秒/MB）
+        self._last_decrease = None
+
+        self.adjustments = []
+
+    @classmethod
+    def from_config(cls, name: str, config: Dict, initial: int,
+                    logger: Optional[logging.Logger] = None) -> 'AdaptiveConcurrencyController':
+        """設定辞書（adaptive_concurrencyセクション）から生成"""
+        return cls(
+            name=name,
+            initial=initial,
+            min_workers=config.get('min_workers', 1),
+            max_workers=config.get('max_workers', max(initial, 16)),
+            adjust_interval=config.get('adjust_interval', 10.0),
+            increase_step=config.get('increase_step', 1),
+            decrease_factor=config.get('decrease_factor', 0.5),
+            latency_threshold=config.get('latency_threshold', 1.5),
+            small_file_threshold=config.get('small_file_threshold', 8388608),
+            per_file_overhead_bytes=config.get('per_file_overhead_bytes', 262144),
+            logger=logger
+        )
+
+    @staticmethod
+    def _empty_latency_window() -> Dict[str, list]:
+        """区分ごとの [所要時間の合計（秒）, 推定コストの合計（バイト）]"""
+        return {'small': [0.0, 0], 'large': [0.0, 0]}
+
+    def acquire(self) -> None:
+        """実行枠を取得（現在の上限に達している場合は待機）"""
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self) -> None:
+        """実行枠を返却"""
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+
+    @property
+    def in_flight(self) -> int:
+        """実行中の転送数"""
+        return self._in_flight
+
+    def record_success(self, size_bytes: int, latency: Optional[float]) -> None:
+        """
+        転送成功を記録
+
+        Args:
+            size_bytes: 転送量（バイト）
+            latency: 成功した試行の所要時間（秒）。リトライの待機を含めないこと。
+                     帯域制御で待機した転送は混雑の判断材料にならないため None を渡す
+                     （スループットのみ計上）
+        """
+        with self._condition:
+            self._window_bytes += size_bytes
+            self._window_files += 1
+            if latency is not None:
+                size_class = 'small' if size_bytes < self.small_file_threshold else 'large'
+                window = self._window_latency[size_class]
+                window[0] += latency
+                window[1] += size_bytes + self.per_file_overhead_bytes
+            self._maybe_adjust()
+
+    def record_error(self, error) -> Optional[str]:
+        """
+        転送エラーを記録（混雑シグナルの場合は即座に減少判定）
+
+        Returns:
+            Optional[str]: エラー分類結果
+        """
+        signal = classify_transfer_error(error)
+        if signal:
+            with self._condition:
+                self._window_signals[signal] += 1
+                # 連続したエラーで何度も半減させないよう、減少は調整間隔に1回まで
+                cooled_down = (self._last_decrease is None or
+                               time.monotonic() - self._last_decrease >= self.adjust_interval)
+                self._maybe_adjust(force=cooled_down)
+        return signal
+
+    def _maybe_adjust(self, force: bool = False) -> None:
+        """調整間隔ごとに同時実行数を見直す（ロック保持中に呼び出すこと）"""
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if not force and elapsed < self.adjust_interval:
+            return
+
+        throughput = self._window_bytes / elapsed if elapsed > 0 else 0.0
+        # 区分ごとの 1MB あたりの所要時間（ファイルサイズの偏りで悪化と誤判定しない）
+        latencies = {size_class: seconds / cost * 1048576
+                     for size_class, (seconds, cost) in self._window_latency.items() if cost}
+        degraded = [(size_class, latency) for size_class, latency in latencies.items()
+                    if size_class in self._baseline_latency
+                    and latency > self._baseline_latency[size_class] * self.latency_threshold]
+        signals = dict(self._window_signals)
+        old_limit = self.limit
+        reason = None
+
+        if signals['throttle'] or signals['timeout']:
+            self.limit = max(self.min_workers, int(self.limit * self.decrease_factor))
+            reason = f"混雑検知 (スロットリング: {signals['throttle']}件, タイムアウト: {signals['timeout']}件)"
+        elif degraded:
+            size_class, latency = degraded[0]
+            label = '小ファイル' if size_class == 'small' else '大ファイル'
+            self.limit = max(self.min_workers, int(self.limit * self.decrease_factor))
+            reason = (f"レイテンシ悪化 ({label}: {latency:.3f}秒/MB > "
+                      f"基準 {self._baseline_latency[size_class]:.3f}秒/MB x {self.latency_threshold})")
+        elif self._window_files and (self._last_throughput is None or throughput > self._last_throughput):
+            self.limit = min(self.max_workers, self.limit + self.increase_step)
+            reason = f"スループット改善 ({throughput / 1048576:.2f} MB/s)"
+
+        # 基準レイテンシは区分ごとの最小値を採用（負荷が低い状態の値）
+        for size_class, latency in latencies.items():
+            if latency < self._baseline_latency.get(size_class, float('inf')):
+                self._baseline_latency[size_class] = latency
+        if self._window_files:
+            self._last_throughput = throughput
+
+        if self.limit < old_limit:
+            self._last_decrease = now
+
+        if self.limit != old_limit:
+            self.adjustments.append({
+                'time': time.time(),
+                'from': old_limit,
+                'to': self.limit,
+                'reason': reason,
+                'throughput': throughput
+            })
+            self.logger.info(f"同時実行数調整 [{self.name}]: {old_limit} → {self.limit} - {reason}")
+            self._condition.notify_all()
+
+        self._window_start = now
+        self._window_bytes = 0
+        self._window_files = 0
+        self._window_latency = self._empty_latency_window()
+        self._window_signals = {'throttle': 0, 'timeout': 0}
+
+
+def extract_file_server(path: str) -> str:
+    """
+    パスからファイルサーバ名を抽出（S3キー生成と同じ規則）
+
+    例: \\\\server\\share\\dir\\file.txt -> server
+        C:\\data\\file.txt           -> local_c
+    """
+    normalized_path = path.replace('\\', '/')
+    if normalized_path.startswith('//'):
+        parts = [part for part in normalized_path[2:].split('/') if part]
+        return parts[0].lower() if parts else 'unknown_server'
+    if len(normalized_path) > 1 and normalized_path[1] == ':':
+        return f"local_{normalized_path[0].lower()}"
+    return 'other'
+
+
+class HostConcurrencyLimiter:
+    """ファイルサーバ単位の同時アクセス数制限（サーバ毎のセマフォ）"""
+
+    def __init__(self, default_limit: int = 0, host_limits: Optional[Dict[str, int]] = None,
+                 logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            default_limit: サーバ毎の既定の同時アクセス上限（0以下は無制限）
+            host_limits: サーバ名 -> 同時アクセス上限 の個別設定
+            logger: ログ出力先
+        """
+        self.default_limit = int(default_limit)
+        self.host_limits = {host.lower(): int(limit) for host, limit in (host_limits or {}).items()}
+        self.logger = logger or logging.getLogger(__name__)
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict, logger: Optional[logging.Logger] = None) -> 'HostConcurrencyLimiter':
+        """設定辞書（host_concurrencyセクション）から生成"""
+        return cls(
+            default_limit=config.get('default_limit', 0),
+            host_limits=config.get('hosts', {}),
+            logger=logger
+        )
+
+    def limit_for(self, host: str) -> int:
+        """サーバの同時アクセス上限（0以下は無制限）"""
+        return self.host_limits.get(host, self.default_limit)
+
+    def _get_semaphore(self, host: str) -> Optional[threading.BoundedSemaphore]:
+        """サーバ用セマフォを取得（初回アクセス時に生成）"""
+        limit = self.limit_for(host)
+        if limit <= 0:
+            return None
+        with self._lock:
+            semaphore = self._semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(limit)
+                self._semaphores[host] = semaphore
+                self.logger.debug(f"ファイルサーバ同時アクセス上限: {host} = {limit}")
+            return semaphore
+
+    @contextmanager
+    def slot(self, path: str):
+        """パスが属するファイルサーバの実行枠を確保するコンテキスト"""
+        semaphore = self._get_semaphore(extract_file_server(path))
+        if semaphore is None:
+            yield
+            return
+        semaphore.acquire()
+        try:
+            yield
+        finally:
+            semaphore.release()
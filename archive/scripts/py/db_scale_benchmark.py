@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+アーカイブ履歴テーブルの規模別ベンチマーク
+- 実運用に近い合成データ（UNCパス階層、依頼者・依頼日の偏り）を COPY で archive_history に一括投入
+- 指定した行数（例: 100万/1000万/5000万行）に達するまで追加投入しながら、各規模で
+  復元処理の lookup_files_from_database と Streamlit アプリの検索・統計クエリを計測
+- 各クエリの EXPLAIN (ANALYZE, BUFFERS) を結果ファイル（JSON）に保存
+
+合成データの request_id は "SYN-" で始まり、--purge で削除できる。
+Streamlit アプリ（app/streamlit_app.py）はインポート時に画面描画を行うため、
+search_archive_history / get_statistics と同じSQLを本スクリプト内で組み立てて計測する。
+"""
+
+import argparse
+import bisect
+import csv
+import datetime
+import io
+import itertools
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+from restore_script_main import RestoreProcessor
+from run_metrics import percentile
+from test_data_generator import ScaleTestDataGenerator
+
+# 設定ファイルのデフォルトパス
+DEFAULT_CONFIG_PATH = "config/archive_config.json"
+
+# 合成データの request_id 接頭辞
+SYNTHETIC_PREFIX = 'SYN-'
+
+COPY_SQL = (
+    "COPY archive_history (request_id, requester, request_date, original_file_path, "
+    "s3_path, archive_date, file_size) FROM STDIN WITH (FORMAT csv)"
+)
+
+
+class SyntheticHistoryLoader:
+    """archive_history への合成データ一括投入クラス"""
+
+    SERVERS = ['fs01', 'fs02', 'fs03', 'nas-main', 'nas-backup']
+    SHARES = ['share', 'projects', 'dept', 'archive']
+
+    def __init__(self, conn, bucket: str, seed: int = 0, requester_count: int = 500,
+                 years: int = 10, batch_rows: int = 200000):
+        """
+        Args:
+            conn: psycopg2接続
+            bucket: s3_path に使用するバケット名
+            seed: 乱数シード
+            requester_count: 依頼者（社員番号）の数
+            years: 依頼日を分布させる年数（現在から遡る）
+            batch_rows: 1回の COPY で投入する行数
+        """
+        self.conn = conn
+        self.bucket = bucket
+        self.rng = random.Random(seed)
+        self.years = years
+        self.batch_rows = batch_rows
+
+        # 依頼者ごとの依頼頻度の偏り（一部の依頼者に集中）
+        self.requesters = [f"{self.rng.randrange(10000000, 100000000):08d}" for _ in range(requester_count)]
+        self._requester_cum_weights = list(itertools.accumulate(
+            self.rng.paretovariate(1.0) for _ in self.requesters
+        ))
+        profiles = ScaleTestDataGenerator.EXTENSION_PROFILES
+        self._extension_cum_weights = list(itertools.accumulate(profile[1] for profile in profiles))
+
+    def count_rows(self) -> int:
+        """合成データの行数"""
+        with self.conn.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM archive_history WHERE request_id LIKE %s",
+                           (f"{SYNTHETIC_PREFIX}%",))
+            return cursor.fetchone()[0]
+
+    def _request_date(self) -> datetime.datetime:
+        """依頼日（直近ほど多い分布: 年々アーカイブ量が増える想定）"""
+        days = self.years * 365
+        offset = int(days * (1 - self.rng.random() ** 0.5))
+        date = datetime.datetime.now() - datetime.timedelta(days=offset)
+        return date.replace(hour=self.rng.randrange(8, 20), minute=self.rng.randrange(60),
+                            second=self.rng.randrange(60), microsecond=0)
+
+    def _generate_rows(self, row_count: int, start_number: int) -> Iterator[Tuple]:
+        """依頼単位にまとまった合成行を順に返す"""
+        generated = 0
+        request_number = start_number
+        profiles = ScaleTestDataGenerator.EXTENSION_PROFILES
+        departments = ScaleTestDataGenerator.DEPARTMENTS
+        words = ScaleTestDataGenerator.NAME_WORDS
+
+        while generated < row_count:
+            request_number += 1
+            request_date = self._request_date()
+            request_id = f"{SYNTHETIC_PREFIX}{request_date:%Y}-{request_number:08d}"
+            requester = self.requesters[bisect.bisect_left(
+                self._requester_cum_weights, self.rng.random() * self._requester_cum_weights[-1]
+            )]
+
+            # 依頼対象ディレクトリ: \\server\share\部署\年度\案件
+            server = self.rng.choice(self.SERVERS)
+            share = self.rng.choice(self.SHARES)
+            root = (f"\\\\{server}\\{share}\\{self.rng.choice(departments)}\\"
+                    f"{request_date.year - self.rng.randrange(3)}年度\\案件_{request_number:08d}")
+
+            # 1依頼あたりのファイル数（中央値200件、最大2万件）
+            file_count = min(row_count - generated, 20000, max(1, int(self.rng.lognormvariate(0, 1.2) * 200)))
+            subdirs = [''] + [f"\\{self.rng.choice(words)}_{i:02d}" for i in range(self.rng.randrange(1, 20))]
+            archive_date = request_date + datetime.timedelta(minutes=self.rng.randrange(1, 600))
+
+            for index in range(file_count):
+                ext_index = bisect.bisect_left(self._extension_cum_weights,
+                                               self.rng.random() * self._extension_cum_weights[-1])
+                ext, _, median, sigma = profiles[ext_index]
+                path = f"{root}{self.rng.choice(subdirs)}\\{self.rng.choice(words)}_{index:06d}{ext}"
+                s3_path = f"s3://{self.bucket}/{path[2:].replace(chr(92), '/')}"
+                file_size = int(self.rng.lognormvariate(0, sigma) * median)
+                yield (request_id, requester, request_date, path, s3_path, archive_date, file_size)
+
+            generated += file_count
+
+    def _last_request_number(self) -> int:
+        """既存の合成データの最大依頼番号（追加投入時の採番用）"""
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT MAX(CAST(split_part(request_id, '-', 3) AS BIGINT)) FROM archive_history "
+                "WHERE request_id LIKE %s", (f"{SYNTHETIC_PREFIX}%",)
+            )
+            return cursor.fetchone()[0] or 0
+
+    def load(self, row_count: int) -> int:
+        """
+        合成データの投入（COPY、batch_rows行ごとにコミット）
+
+        Returns:
+            投入した行数
+        """
+        started = time.monotonic()
+        rows = self._generate_rows(row_count, self._last_request_number())
+        loaded = 0
+
+        print(f"合成データ投入開始: {row_count:,}行")
+        while True:
+            batch = list(itertools.islice(rows, self.batch_rows))
+            if not batch:
+                break
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in batch:
+                writer.writerow(row)
+            buffer.seek(0)
+
+            with self.conn.cursor() as cursor:
+                cursor.copy_expert(COPY_SQL, buffer)
+            self.conn.commit()
+
+            loaded += len(batch)
+            elapsed = time.monotonic() - started
+            print(f"  投入中... {loaded:,}/{row_count:,} ({loaded / elapsed:,.0f} rows/sec)")
+
+        with self.conn.cursor() as cursor:
+            cursor.execute("ANALYZE archive_history")
+        self.conn.commit()
+        print(f"合成データ投入完了: {loaded:,}行 ({time.monotonic() - started:.1f}秒)")
+        return loaded
+
+    def purge(self) -> int:
+        """合成データの削除"""
+        with self.conn.cursor() as cursor:
+            cursor.execute("DELETE FROM archive_history WHERE request_id LIKE %s", (f"{SYNTHETIC_PREFIX}%",))
+            deleted = cursor.rowcount
+        self.conn.commit()
+        print(f"合成データ削除: {deleted:,}行")
+        return deleted
+
+
+def build_search_query(start_date: datetime.date, end_date: datetime.date, request_id: str = "",
+                       requester: str = "", file_path: str = "", limit: int = 1000,
+                       offset: int = 0) -> Tuple[str, Dict]:
+    """ArchiveHistoryApp.search_archive_history と同じ検索SQL"""
+    query = """
+        SELECT id, request_id, requester, request_date, original_file_path,
+               s3_path, archive_date, file_size, created_at
+        FROM archive_history
+        WHERE request_date::date BETWEEN %(start_date)s AND %(end_date)s
+    """
+    params = {'start_date': start_date, 'end_date': end_date}
+    query, params = _add_filters(query, params, request_id, requester, file_path)
+    query += " ORDER BY request_date DESC LIMIT %(limit)s OFFSET %(offset)s"
+    params.update({'limit': limit, 'offset': offset})
+    return query, params
+
+
+def build_statistics_query(start_date: datetime.date, end_date: datetime.date, request_id: str = "",
+                           requester: str = "", file_path: str = "") -> Tuple[str, Dict]:
+    """ArchiveHistoryApp.get_statistics と同じ集計SQL"""
+    query = """
+        SELECT COUNT(*) as total_files, SUM(file_size) as total_size,
+               COUNT(DISTINCT request_id) as total_requests, AVG(file_size) as avg_file_size,
+               MAX(file_size) as max_file_size, MIN(request_date) as first_archive,
+               MAX(request_date) as last_archive
+        FROM archive_history
+        WHERE request_date::date BETWEEN %(start_date)s AND %(end_date)s
+    """
+    params = {'start_date': start_date, 'end_date': end_date}
+    return _add_filters(query, params, request_id, requester, file_path)
+
+
+def _add_filters(query: str, params: Dict, request_id: str, requester: str,
+                 file_path: str) -> Tuple[str, Dict]:
+    """Streamlitアプリと同じフィルター条件の追加"""
+    if request_id.strip():
+        query += " AND request_id ILIKE %(request_id)s"
+        params['request_id'] = f"%{request_id.strip()}%"
+    if requester.strip():
+        query += " AND requester LIKE %(requester)s"
+        params['requester'] = f"%{requester.strip()}%"
+    if file_path.strip():
+        query += " AND original_file_path ILIKE %(file_path)s"
+        params['file_path'] = f"%{file_path.strip()}%"
+    return query, params
+
+
+class QueryBenchmark:
+    """アーカイブ履歴検索の計測クラス"""
+
+    def __init__(self, processor: RestoreProcessor, repeat: int = 5, sample_count: int = 5, seed: int = 0):
+        """
+        Args:
+            processor: 復元処理（lookup_files_from_database の計測とDB接続に使用）
+            repeat: 1ケースあたりの計測回数
+            sample_count: 検索対象としてサンプリングするファイル・ディレクトリ数
+            seed: サンプリング用乱数シード
+        """
+        self.processor = processor
+        self.repeat = max(1, repeat)
+        self.sample_count = sample_count
+        self.rng = random.Random(seed)
+
+    def _sample_targets(self, cursor) -> Dict:
+        """検索対象のサンプリング（実在するファイルパス・依頼ID・依頼者）"""
+        cursor.execute(
+            "SELECT original_file_path, request_id, requester FROM archive_history "
+            "TABLESAMPLE SYSTEM (1) LIMIT %s", (self.sample_count * 20,)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            cursor.execute("SELECT original_file_path, request_id, requester FROM archive_history LIMIT %s",
+                           (self.sample_count,))
+            rows = cursor.fetchall()
+        self.rng.shuffle(rows)
+        rows = rows[:self.sample_count]
+        return {
+            'files': [row[0] for row in rows],
+            'directories': [row[0].rsplit('\\', 1)[0] + '\\' for row in rows],
+            'request_ids': [row[1] for row in rows],
+            'requesters': [row[2] for row in rows],
+        }
+
+    def _time(self, func) -> Dict:
+        """関数の繰り返し計測"""
+        latencies = []
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            func()
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        return {
+            'p50_seconds': round(percentile(latencies, 0.50), 6),
+            'max_seconds': round(latencies[-1], 6),
+            'min_seconds': round(latencies[0], 6),
+        }
+
+    @staticmethod
+    def _explain(cursor, query: str, params) -> str:
+        """EXPLAIN (ANALYZE, BUFFERS) の取得"""
+        cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {query}", params)
+        return '\n'.join(row[0] for row in cursor.fetchall())
+
+    def _query_case(self, cursor, name: str, query: str, params) -> Dict:
+        """SQL単体の計測とEXPLAIN"""
+        def run():
+            cursor.execute(query, params)
+            cursor.fetchall()
+        result = {'name': name, **self._time(run), 'explain': self._explain(cursor, query, params)}
+        print(f"  {name}: p50={result['p50_seconds']:.4f}s max={result['max_seconds']:.4f}s")
+        return result
+
+    def _lookup_case(self, name: str, restore_path: str, restore_mode: str) -> Dict:
+        """RestoreProcessor.lookup_files_from_database の計測"""
+        found = {}
+
+        def run():
+            requests = [{'restore_path': restore_path, 'restore_mode': restore_mode}]
+            self.processor.lookup_files_from_database(requests)
+            found['files'] = requests[0].get('total_files_found', 0)
+        result = {'name': name, 'restore_path': restore_path, **self._time(run), 'files_found': found['files']}
+        print(f"  {name}: p50={result['p50_seconds']:.4f}s max={result['max_seconds']:.4f}s "
+              f"({result['files_found']}件)")
+        return result
+
+    def run(self) -> Dict:
+        """全ケースの計測"""
+        conn = self.processor._connect_database()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT COUNT(*), pg_total_relation_size('archive_history') FROM archive_history")
+                row_count, table_bytes = cursor.fetchone()
+                targets = self._sample_targets(cursor)
+                print(f"\n=== 計測開始: {row_count:,}行 ({table_bytes / 1048576:,.1f} MB) ===")
+
+                cases = []
+                # 復元処理のDB検索（関数全体とSQL単体）
+                for path in targets['files']:
+                    cases.append(self._lookup_case('lookup_file', path, 'file'))
+                    cases.append(self._query_case(
+                        cursor, 'lookup_file_sql',
+                        "SELECT original_file_path, s3_path, archive_date, file_size FROM archive_history "
+                        "WHERE original_file_path = %s", (path,)
+                    ))
+                for directory in targets['directories']:
+                    cases.append(self._lookup_case('lookup_directory', directory, 'directory'))
+                    pattern = self.processor._generate_search_patterns(directory)[0]
+                    cases.append(self._query_case(
+                        cursor, 'lookup_directory_sql',
+                        "SELECT original_file_path, s3_path, archive_date, file_size FROM archive_history "
+                        "WHERE original_file_path LIKE %s ORDER BY original_file_path", (pattern,)
+                    ))
+
+                # Streamlitアプリの検索・統計（画面の初期表示条件と各フィルター）
+                today = datetime.date.today()
+                month_ago = today - datetime.timedelta(days=30)
+                year_ago = today - datetime.timedelta(days=365)
+                filters = [('default_30days', month_ago, {}),
+                           ('request_id', year_ago, {'request_id': targets['request_ids'][0]}),
+                           ('requester', year_ago, {'requester': targets['requesters'][0]}),
+                           ('file_path', year_ago, {'file_path': targets['files'][0].rsplit('\\', 1)[-1]})]
+                for label, start_date, filter_args in filters:
+                    query, params = build_search_query(start_date, today, **filter_args)
+                    cases.append(self._query_case(cursor, f"search_{label}", query, params))
+                    query, params = build_statistics_query(start_date, today, **filter_args)
+                    cases.append(self._query_case(cursor, f"statistics_{label}", query, params))
+                conn.rollback()
+
+            return {'rows': row_count, 'table_bytes': table_bytes, 'cases': cases}
+        finally:
+            conn.close()
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description='アーカイブ履歴テーブルの規模別ベンチマーク')
+    parser.add_argument('--config', default=DEFAULT_CONFIG_PATH,
+                        help=f'設定ファイルパス (デフォルト: {DEFAULT_CONFIG_PATH})')
+    parser.add_argument('--scales', default='1000000,10000000,50000000',
+                        help='計測する合成データ行数（カンマ区切り、デフォルト: 1000000,10000000,50000000）')
+    parser.add_argument('--repeat', type=int, default=5, help='1ケースあたりの計測回数 (デフォルト: 5)')
+    parser.add_argument('--samples', type=int, default=3, help='検索対象のサンプル数 (デフォルト: 3)')
+    parser.add_argument('--seed', type=int, default=0, help='乱数シード (デフォルト: 0)')
+    parser.add_argument('--bucket', default='archive-bucket', help='s3_path に使用するバケット名')
+    parser.add_argument('--load-only', action='store_true', help='投入のみ行い計測しない')
+    parser.add_argument('--purge', action='store_true', help='合成データを削除して終了')
+    parser.add_argument('--output', default='db_scale_benchmark.json',
+                        help='結果ファイル (デフォルト: db_scale_benchmark.json)')
+
+    args = parser.parse_args()
+
+    try:
+        processor = RestoreProcessor(args.config)
+        conn = processor._connect_database()
+        try:
+            loader = SyntheticHistoryLoader(conn, args.bucket, seed=args.seed)
+            if args.purge:
+                loader.purge()
+                return 0
+
+            results = []
+            for scale in sorted(int(value) for value in args.scales.split(',') if value.strip()):
+                existing = loader.count_rows()
+                if existing < scale:
+                    loader.load(scale - existing)
+                if args.load_only:
+                    continue
+                result = QueryBenchmark(processor, args.repeat, args.samples, args.seed).run()
+                result['synthetic_rows'] = scale
+                results.append(result)
+
+                # 規模ごとに結果を保存（長時間実行の途中経過を残す）
+                with open(args.output, 'w', encoding='utf-8') as f:
+                    json.dump({'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+                               'results': results}, f, ensure_ascii=False, indent=2, default=str)
+            if results:
+                print(f"\n結果出力: {Path(args.output).resolve()}")
+            return 0
+        finally:
+            conn.close()
+
+    except Exception as e:
+        print(f"❌ ベンチマーク実行エラー: {str(e)}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
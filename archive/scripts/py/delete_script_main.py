@@ -13,9 +13,13 @@ import logging
 import os
 import shutil
 import sys
+import time
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
+from metrics_exporter import PrometheusTextfileExporter
+from run_metrics import RunMetrics
+
 # 設定ファイルのデフォルトパス
 DEFAULT_CONFIG_PATH = "config/archive_config.json"
 
@@ -25,6 +29,7 @@ class SimpleDeletionProcessor:
     def __init__(self, config_path: str = DEFAULT_CONFIG_PATH):
         self.config = self.load_config(config_path)
         self.logger = self.setup_logger()
+        self.metrics = RunMetrics('delete', self.logger)
         
     def load_config(self, config_path: str) -> Dict:
         """設定ファイルを読み込み"""
@@ -32,6 +37,13 @@ class SimpleDeletionProcessor:
             "logging": {
                 "log_directory": "logs",
                 "log_level": "INFO"
+            },
+            "metrics": {
+                "prometheus_textfile": {
+                    "enabled": False,
+                    "textfile_directory": "",  # node_exporterの --collector.textfile.directory
+                    "interval": 15  # 出力間隔（秒）
+                }
             }
         }
         
@@ -153,7 +165,10 @@ class SimpleDeletionProcessor:
         if dry_run:
             self.logger.info("=== ドライランモード ===")
         
+        self.metrics.set_gauge('queued_files', len(paths))
+        
         for path in paths:
+            started = time.perf_counter()
             try:
                 size = self.calculate_size(path)
                 
@@ -162,16 +177,21 @@ class SimpleDeletionProcessor:
                     results['successful'] += 1
                     results['total_size'] += size
                 else:
-                    if os.path.isfile(path):
-                        os.remove(path)
-                    elif os.path.isdir(path):
-                        shutil.rmtree(path)
+                    with self.metrics.active('delete'):
+                        if os.path.isfile(path):
+                            os.remove(path)
+                        elif os.path.isdir(path):
+                            shutil.rmtree(path)
                     
                     self.logger.info(f"削除完了: {path} ({self.format_size(size)})")
                     results['successful'] += 1
                     results['total_size'] += size
+                
+                self.metrics.record('delete', time.perf_counter() - started, size)
                     
             except Exception as e:
+                self.metrics.record('delete', time.perf_counter() - started, error=True)
+                self.metrics.count_error(e)
                 error_msg = f"削除失敗: {path} - {str(e)}"
                 self.logger.error(error_msg)
                 results['failed'] += 1
@@ -181,6 +201,18 @@ class SimpleDeletionProcessor:
     
     def run(self, csv_path: str, dry_run: bool = False, skip_confirmation: bool = False) -> int:
         """メイン処理"""
+        exporter = PrometheusTextfileExporter.from_config(
+            self.config.get('metrics', {}).get('prometheus_textfile', {}),
+            self.metrics, 'delete', 'delete', {'dry_run': str(dry_run).lower()}, self.logger
+        )
+        exit_code = self._run(csv_path, dry_run, skip_confirmation, exporter)
+        if exporter:
+            exporter.stop(exit_code)
+        return exit_code
+    
+    def _run(self, csv_path: str, dry_run: bool, skip_confirmation: bool,
+             exporter: Optional[PrometheusTextfileExporter]) -> int:
+        """削除処理本体"""
         try:
             self.logger.info("削除処理開始")
             
@@ -205,7 +237,9 @@ class SimpleDeletionProcessor:
                     self.logger.info("処理をキャンセルしました")
                     return 0
             
-            # 削除実行
+            # 削除実行（確認入力の待ち時間はメトリクス出力の対象外）
+            if exporter:
+                exporter.start()
             results = self.delete_paths(paths, dry_run)
             
             # 結果表示
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+障害注入（フォールトインジェクション）
+- 本番のS3アクセス・ファイルサーバアクセス経路に遅延、スロットリング、タイムアウト、
+  読み込み途中の切断（partial read）を指定した確率で発生させる
+- リトライ・同時実行数制御の設定変更を、実運用に近い障害率のもとで事前に計測するためのもの
+- 設定ファイルの fault_injection セクション、または環境変数 ARCHIVE_FAULT_INJECTION
+  （JSON文字列またはJSONファイルのパス）で有効化する
+
+設定例:
+    "fault_injection": {
+        "enabled": true,
+        "seed": 1,
+        "operations": {
+            "*":      {"latency_ms": 20, "latency_jitter_ms": 30},
+            "s3_put": {"throttle_rate": 0.05, "timeout_rate": 0.01, "partial_read_rate": 0.01},
+            "fs_stat": {"timeout_rate": 0.001}
+        }
+    }
+
+操作名: s3_put / s3_get / s3_head / s3_restore / fs_stat / fs_delete / fs_place
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+# 環境変数（設定ファイルの fault_injection セクションより優先）
+FAULT_INJECTION_ENV = 'ARCHIVE_FAULT_INJECTION'
+
+
+class InjectedFault(Exception):
+    """注入された障害"""
+
+
+class InjectedThrottleError(InjectedFault):
+    """スロットリング（concurrency_control の混雑シグナル判定で throttle に分類される）"""
+
+
+class InjectedTimeoutError(InjectedFault, TimeoutError):
+    """タイムアウト"""
+
+
+class InjectedPartialReadError(InjectedFault):
+    """読み込み途中の切断"""
+
+
+class FaultInjector:
+    """操作単位の確率で障害を発生させるクラス（スレッドセーフ）"""
+
+    def __init__(self, operations: Dict[str, Dict], seed: Optional[int] = None,
+                 logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            operations: 操作名 -> 障害設定（"*" は全操作に適用、操作別の値で上書き）
+                latency_ms / latency_jitter_ms: 追加遅延（固定 + 0～jitterの一様乱数）
+                latency_rate: 遅延を加える確率（デフォルト1.0）
+                throttle_rate: スロットリングエラーの発生確率
+                timeout_rate / timeout_delay_ms: タイムアウトの発生確率と発生までの待機時間
+                error_rate: その他エラーの発生確率
+                partial_read_rate: 読み込み途中切断の発生確率
+            seed: 乱数シード（再現用）
+            logger: ログ出力先
+        """
+        self.operations = operations
+        self.logger = logger or logging.getLogger(__name__)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {}  # 操作名 -> {障害種別: 件数}
+
+    @classmethod
+    def from_config(cls, config: Dict, logger: Optional[logging.Logger] = None) -> Optional['FaultInjector']:
+        """設定辞書（fault_injectionセクション）または環境変数から生成（無効時はNone）"""
+        env_value = os.environ.get(FAULT_INJECTION_ENV, '').strip()
+        if env_value:
+            # 不正な値で処理全体を止めないよう、読み込めない場合は警告のみ出して障害注入を無効にする
+            try:
+                if os.path.isfile(env_value):
+                    with open(env_value, 'r', encoding='utf-8') as f:
+                        config = json.load(f)
+                else:
+                    config = json.loads(env_value)
+                if not isinstance(config, dict):
+                    raise ValueError("JSONオブジェクトではありません")
+            except (OSError, ValueError) as e:
+                (logger or logging.getLogger(__name__)).warning(
+                    f"{FAULT_INJECTION_ENV} を読み込めないため障害注入を無効にします: {e}"
+                )
+                return None
+            config.setdefault('enabled', True)
+
+        if not config.get('enabled', False) or not config.get('operations'):
+            return None
+        injector = cls(config['operations'], seed=config.get('seed'), logger=logger)
+        injector.logger.warning(f"障害注入が有効です: {json.dumps(config['operations'], ensure_ascii=False)}")
+        return injector
+
+    def _rule(self, operation: str) -> Dict:
+        """操作に適用する設定（"*" と操作別設定のマージ）"""
+        return {**self.operations.get('*', {}), **self.operations.get(operation, {})}
+
+    def _chance(self, rate: float) -> bool:
+        if rate <= 0:
+            return False
+        with self._lock:
+            return self._rng.random() < rate
+
+    def _count(self, operation: str, kind: str) -> None:
+        with self._lock:
+            counts = self.counts.setdefault(operation, {})
+            counts[kind] = counts.get(kind, 0) + 1
+
+    def inject(self, operation: str, target: str = '') -> None:
+        """
+        操作前の障害注入（遅延の付加、または例外の送出）
+
+        Args:
+            operation: 操作名
+            target: 対象（ログ出力用のファイルパス・S3キー）
+        """
+        rule = self._rule(operation)
+        if not rule:
+            return
+
+        latency_ms = rule.get('latency_ms', 0)
+        jitter_ms = rule.get('latency_jitter_ms', 0)
+        if (latency_ms or jitter_ms) and self._chance(rule.get('latency_rate', 1.0)):
+            with self._lock:
+                delay_ms = latency_ms + self._rng.uniform(0, jitter_ms)
+            self._count(operation, 'latency')
+            time.sleep(delay_ms / 1000)
+
+        if self._chance(rule.get('throttle_rate', 0)):
+            self._count(operation, 'throttle')
+            raise InjectedThrottleError(f"SlowDown: Please reduce your request rate. "
+                                        f"(障害注入: {operation} {target})")
+
+        if self._chance(rule.get('timeout_rate', 0)):
+            self._count(operation, 'timeout')
+            time.sleep(rule.get('timeout_delay_ms', 0) / 1000)
+            raise InjectedTimeoutError(f"Read timeout (障害注入: {operation} {target})")
+
+        if self._chance(rule.get('error_rate', 0)):
+            self._count(operation, 'error')
+            raise InjectedFault(f"InternalError (障害注入: {operation} {target})")
+
+    def should_partial_read(self, operation: str) -> bool:
+        """読み込み途中切断を発生させるかどうか"""
+        if self._chance(self._rule(operation).get('partial_read_rate', 0)):
+            self._count(operation, 'partial_read')
+            return True
+        return False
+
+    def summary(self) -> Dict:
+        """注入件数の集計"""
+        with self._lock:
+            return {operation: dict(counts) for operation, counts in self.counts.items()}
+
+    def log_summary(self) -> None:
+        """注入件数のログ出力"""
+        for operation, counts in sorted(self.summary().items()):
+            detail = ', '.join(f"{kind}={count}" for kind, count in sorted(counts.items()))
+            self.logger.info(f"  障害注入 [{operation}] {detail}")
+
+
+class FaultInjectingS3Client:
+    """boto3 S3クライアントのラッパー（転送・API呼び出し前に障害を注入）"""
+
+    OPERATIONS = {
+        'upload_file': 's3_put',
+        'download_file': 's3_get',
+        'head_object': 's3_head',
+        'restore_object': 's3_restore',
+    }
+
+    def __init__(self, client, injector: FaultInjector):
+        self._client = client
+        self._injector = injector
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        operation = self.OPERATIONS.get(name)
+        if operation is None or not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            target = kwargs.get('Key') or (args[2] if name == 'upload_file' and len(args) > 2
+                                           else args[1] if len(args) > 1 else '')
+            self._injector.inject(operation, target)
+            if name == 'upload_file' and self._injector.should_partial_read(operation):
+                raise InjectedPartialReadError(
+                    f"Connection was closed before we received a valid response "
+                    f"(障害注入: 送信元ファイルの読み込み途中切断 {target})"
+                )
+            result = attribute(*args, **kwargs)
+            if name == 'download_file' and self._injector.should_partial_read(operation):
+                # 途中までしか受信できなかった状態を再現（一時ファイルを切り詰めて例外）
+                local_path = args[2] if len(args) > 2 else kwargs.get('Filename')
+                if local_path and os.path.exists(local_path):
+                    with open(local_path, 'r+b') as f:
+                        f.truncate(os.path.getsize(local_path) // 2)
+                raise InjectedPartialReadError(f"IncompleteRead (障害注入: {target})")
+            return result
+
+        return call
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+アーカイブ対象ファイルのコンパクトなレコード管理
+- 1ファイル = 1レコード（__slots__）で、収集情報とアップロード・削除結果を同じオブジェクトに保持
+  （収集時の辞書を結果用の辞書へコピーしない）
+- パスは「親ディレクトリ（ストア内で共有）+ ファイル名」に分けて保持し、
+  同一フォルダのファイルで親ディレクトリ文字列を重複させない
+- 更新日時は datetime ではなく epoch 秒（float）で保持
+- 合計・絞り込みは map / filter + attrgetter（Cレベルのループ）で行う
+
+従来の辞書形式（f['path'], r.get('success') 等）での参照にも対応しているため、
+UploadScheduler・ArchiveQueue・FairShareScheduler 等の既存処理はそのまま利用できる。
+集計・絞り込みメソッドは処理結果ファイル（results_log.ResultsLog）と共通。
+
+目安: 500万ファイルでレコード本体とファイル名で 1～1.5GB 程度（パス長に依存）
+"""
+
+import datetime
+import os
+from collections import Counter
+from itertools import filterfalse
+from operator import attrgetter
+from typing import Dict, Iterable, Iterator, List, Optional
+
+_SIZE = attrgetter('size')
+_DIRECTORY = attrgetter('directory')
+_SUCCESS = attrgetter('success')
+_COMPLETED = attrgetter('archive_completed')
+_SKIPPED = attrgetter('skipped')
+
+
+class FileRecord:
+    """1ファイル分の収集情報・処理結果"""
+
+    __slots__ = ('root', 'name', 'size', 'mtime', 'directory', 'success', 'error',
+                 's3_key', 'retry_count', 'file_deleted', 'archive_completed', 'checksum', 'skipped',
+                 'recorded')
+
+    # 従来の辞書キー -> 属性名
+    KEY_ALIASES = {'file_path': 'path', 'file_size': 'size'}
+
+    def __init__(self, root: str, name: str, size: int, mtime: float, directory: str):
+        """
+        Args:
+            root: 親ディレクトリ（ストアで共有される文字列）
+            name: ファイル名
+            size: ファイルサイズ（bytes）
+            mtime: 更新日時（epoch秒）
+            directory: CSVに記載された処理対象ディレクトリ
+        """
+        self.root = root
+        self.name = name
+        self.size = size
+        self.mtime = mtime
+        self.directory = directory
+        self.success = False
+        self.error = None
+        self.s3_key = None
+        self.retry_count = 0
+        self.file_deleted = False
+        self.archive_completed = False
+        self.checksum = None  # マニフェスト用のSHA-256（manifest.checksum=sha256 の場合のみ）
+        self.skipped = False  # アーカイブ済みのため処理しなかった（成功・失敗のいずれにも数えない）
+        self.recorded = False  # 最終結果を確定済み（処理結果ファイルへの追記は1回のみ）
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.root, self.name)
+
+    @property
+    def modified_time(self) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(self.mtime)
+
+    # 辞書形式での参照（従来の file_info / result 辞書との互換）
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, self.KEY_ALIASES.get(key, key))
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value) -> None:
+        try:
+            setattr(self, self.KEY_ALIASES.get(key, key), value)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key: str) -> bool:
+        return hasattr(self, self.KEY_ALIASES.get(key, key))
+
+    def get(self, key: str, default=None):
+        try:
+            value = self[key]
+        except KeyError:
+            return default
+        return default if value is None else value
+
+    def __repr__(self) -> str:
+        return f"FileRecord({self.path!r}, size={self.size}, success={self.success})"
+
+
+class FileRecordStore:
+    """FileRecord のコンテナ（親ディレクトリ文字列の共有・一括集計）"""
+
+    def __init__(self, records: Optional[List[FileRecord]] = None):
+        self.records = records if records is not None else []
+        self._roots = {}  # 親ディレクトリ文字列の共有テーブル
+
+    @classmethod
+    def from_mappings(cls, items: Iterable) -> 'FileRecordStore':
+        """辞書形式のファイル情報（キュータスク等）から生成（FileRecordはそのまま格納）"""
+        store = cls()
+        for item in items:
+            if isinstance(item, FileRecord):
+                store.records.append(item)
+                continue
+            modified_time = item.get('modified_time')
+            if isinstance(modified_time, datetime.datetime):
+                mtime = modified_time.timestamp()
+            else:
+                mtime = modified_time or 0.0
+            root, name = os.path.split(item['path'])
+            store.add(root, name, item.get('size') or 0, mtime, item.get('directory'))
+        return store
+
+    def add(self, root: str, name: str, size: int, mtime: float, directory: str) -> FileRecord:
+        """レコード追加（親ディレクトリ文字列は既存のものを共有）"""
+        root = self._roots.setdefault(root, root)
+        record = FileRecord(root, name, size, mtime, directory)
+        self.records.append(record)
+        return record
+
+    def append(self, record: FileRecord) -> None:
+        self.records.append(record)
+
+    def clear(self) -> None:
+        """全レコードを手放す（結果を処理結果ファイルへ逐次記録する場合）"""
+        self.records = []
+        self._roots = {}
+
+    def extend(self, other: 'FileRecordStore') -> None:
+        """別ストアのレコードを結合（親ディレクトリ文字列の共有テーブルも引き継ぐ）"""
+        self.records.extend(other.records)
+        for root in other._roots:
+            self._roots.setdefault(root, root)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[FileRecord]:
+        return iter(self.records)
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+    # 一括集計・絞り込み
+    def total_size(self) -> int:
+        return sum(map(_SIZE, self.records))
+
+    def successful(self) -> List[FileRecord]:
+        return list(filter(_SUCCESS, self.records))
+
+    def failed(self) -> List[FileRecord]:
+        return [record for record in filterfalse(_SUCCESS, self.records) if not record.skipped]
+
+    def completed(self) -> List[FileRecord]:
+        return list(filter(_COMPLETED, self.records))
+
+    def count_successful(self) -> int:
+        return sum(map(_SUCCESS, self.records))
+
+    def count_failed(self) -> int:
+        return len(self.records) - self.count_successful() - self.count_skipped()
+
+    def count_skipped(self) -> int:
+        return sum(map(_SKIPPED, self.records))
+
+    def count_completed(self) -> int:
+        return sum(map(_COMPLETED, self.records))
+
+    def directory_counts(self) -> Dict[str, int]:
+        """処理対象ディレクトリごとのファイル数"""
+        return dict(Counter(map(_DIRECTORY, self.records)))
+
+    def failed_directories(self) -> List[str]:
+        """失敗ファイルを含むディレクトリ（重複除去・昇順）"""
+        return sorted({record.directory for record in self.failed() if record.directory})
+
+    def error_counts(self) -> Dict[str, int]:
+        """エラー理由ごとの失敗ファイル数"""
+        return dict(Counter(record.error or '不明なエラー' for record in self.failed()).most_common())
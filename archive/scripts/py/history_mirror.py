@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+archive_history のローカルミラー（SQLite）
+- 復元処理のファイル検索・アーカイブ処理のアーカイブ済み判定を、PostgreSQL への問い合わせではなく
+  ローカルファイルの検索で行う（original_file_path にインデックス）
+- 同期は差分のみ: 前回同期時点（DBサーバ時刻）から overlap_minutes 遡った時刻より前に作成された行の
+  最大 id を起点に、それより大きい id の行を取り込む
+  （id は挿入時に採番されコミット順とは一致しないため、実行中だったトランザクションの行を取りこぼさないよう重ねて読む）
+- 同期に失敗した場合（DB停止中等）は、最終同期から max_stale_hours 以内であればミラーのまま検索を継続
+- archive_history で削除・更新された行は反映されないため、必要に応じてミラーファイルを削除して再作成する（初回同期は全件）
+
+PostgresHistorySource は同じ検索メソッドを PostgreSQL のカーソルで実装したもので、
+ミラー無効時は history_source() がこちらを返す。
+"""
+
+import datetime
+import logging
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# 検索結果の1行: (original_file_path, s3_path, archive_date, file_size)
+HistoryRow = Tuple[str, str, object, int]
+
+# パスごとの最新のアーカイブ（アーカイブ済み判定用、file_mtime・checksum は記録がなければ None）
+ArchivedFile = namedtuple('ArchivedFile', ['s3_path', 'file_size', 'file_mtime', 'checksum'])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    request_id TEXT,
+    requester TEXT,
+    original_file_path TEXT NOT NULL,
+    s3_path TEXT NOT NULL,
+    archive_date TEXT,
+    file_size INTEGER,
+    created_at TEXT,
+    file_mtime REAL,
+    checksum TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_history_original_path ON history (original_file_path);
+CREATE INDEX IF NOT EXISTS idx_history_created_at ON history (created_at);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# 旧スキーマ（file_mtime・checksum 列なし）の archive_history では NULL を返す
+SYNC_SQL = """
+    SELECT id, request_id, requester, original_file_path, s3_path, archive_date, file_size, created_at,
+           {identity_columns}
+    FROM archive_history
+    WHERE id > %s
+    ORDER BY id
+"""
+
+# 1回の IN / ANY 検索に渡すパス数
+LOOKUP_CHUNK_SIZE = 500
+
+
+def has_identity_columns(cursor) -> bool:
+    """archive_history にファイル同一性の列（file_mtime, checksum）があるか（列追加前のDBはFalse）"""
+    cursor.execute(
+        """
+        SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_name = 'archive_history' AND column_name IN ('file_mtime', 'checksum')
+        """
+    )
+    return cursor.fetchone()[0] == 2
+
+
+def _identity_select(cursor) -> str:
+    """file_mtime・checksum の SELECT 句（列追加前のDBでは NULL、アーカイブ済み判定で一致扱いにならない）"""
+    if has_identity_columns(cursor):
+        return 'file_mtime, checksum'
+    return 'NULL::double precision AS file_mtime, NULL::text AS checksum'
+
+
+def _timestamp_text(value) -> Optional[str]:
+    """日時の文字列化（str(datetime) と同じ形式、PostgreSQL 検索結果と同じ表示になる）"""
+    return str(value) if value is not None else None
+
+
+def like_prefix(pattern: str) -> Optional[str]:
+    """
+    LIKE パターン（エスケープ文字 \\）が「固定文字列 + 末尾の %」の場合に固定文字列を返す
+
+    Returns:
+        Optional[str]: 前方一致の固定文字列（それ以外の形のパターンはNone）
+    """
+    chars = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\' and i + 1 < len(pattern):
+            chars.append(pattern[i + 1])
+            i += 2
+            continue
+        if c == '%' and i == len(pattern) - 1:
+            return ''.join(chars)
+        if c in '%_':
+            return None
+        chars.append(c)
+        i += 1
+    return None
+
+
+def like_to_glob(pattern: str) -> str:
+    """LIKE パターン（エスケープ文字 \\、大文字小文字を区別）を SQLite の GLOB パターンに変換"""
+    glob = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\' and i + 1 < len(pattern):
+            i += 1
+            c = pattern[i]
+            glob.append(f"[{c}]" if c in '*?[' else c)
+        elif c == '%':
+            glob.append('*')
+        elif c == '_':
+            glob.append('?')
+        else:
+            glob.append(f"[{c}]" if c in '*?[' else c)
+        i += 1
+    return ''.join(glob)
+
+
+class HistoryMirror:
+    """archive_history のローカルミラー（検索はスレッドセーフ）"""
+
+    def __init__(self, path: str, overlap_minutes: float = 60.0, max_stale_hours: float = 24.0,
+                 batch_rows: int = 50000, logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            path: ミラーファイル（SQLite）のパス
+            overlap_minutes: 差分同期で遡る時間（これより長いトランザクションの行は次回以降も取り込まれない）
+            max_stale_hours: 同期失敗時にミラーでの検索を継続する最終同期からの時間
+            batch_rows: 1回に取り込む行数
+            logger: ログ出力先
+        """
+        self.path = Path(path)
+        self.overlap = datetime.timedelta(minutes=overlap_minutes)
+        self.max_stale_seconds = max_stale_hours * 3600
+        self.batch_rows = max(1, batch_rows)
+        self.logger = logger or logging.getLogger(__name__)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._upgrade_schema()
+        self._lock = threading.Lock()
+
+    def _upgrade_schema(self) -> None:
+        """列追加前に作成したミラーへの列追加（既存行に値を入れるため次回は全件同期）"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(history)")}
+        missing = [column for column in ('file_mtime REAL', 'checksum TEXT') if column.split()[0] not in columns]
+        if not missing:
+            return
+        with self._conn:
+            for column in missing:
+                self._conn.execute(f"ALTER TABLE history ADD COLUMN {column}")
+            self._conn.execute("DELETE FROM sync_state WHERE key = 'synced_at'")
+        self.logger.info(f"履歴ミラーに列を追加しました（次回は全件同期）: {self.path}")
+
+    @classmethod
+    def from_config(cls, config: Dict, logger: Optional[logging.Logger] = None) -> Optional['HistoryMirror']:
+        """設定辞書（history_mirrorセクション）から生成（無効時はNone）"""
+        if not config.get('enabled', False):
+            return None
+        mirror = cls(
+            config.get('path', 'cache/archive_history.db'),
+            overlap_minutes=config.get('overlap_minutes', 60.0),
+            max_stale_hours=config.get('max_stale_hours', 24.0),
+            batch_rows=config.get('batch_rows', 50000),
+            logger=logger
+        )
+        mirror.logger.info(f"履歴ミラー: {mirror.path}")
+        return mirror
+
+    def _state(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _resume_id(self) -> int:
+        """差分同期の起点 id（前回同期時刻 - overlap より前に作成された行の最大 id）"""
+        synced_at = self._state('synced_at')
+        if synced_at is None:
+            return 0
+        cutoff = datetime.datetime.fromisoformat(synced_at) - self.overlap
+        row = self._conn.execute(
+            "SELECT MAX(id) FROM history WHERE created_at < ?", (_timestamp_text(cutoff),)
+        ).fetchone()
+        return row[0] or 0
+
+    def sync(self, pg_conn, full: bool = False) -> int:
+        """
+        PostgreSQL からの同期
+
+        Args:
+            pg_conn: psycopg2接続
+            full: ミラーを空にして全件取り込む
+
+        Returns:
+            int: 取り込んだ行数（重ねて読んだ既存行を含む）
+        """
+        started = time.monotonic()
+        with self._lock:
+            if full:
+                with self._conn:
+                    self._conn.execute("DELETE FROM history")
+                    self._conn.execute("DELETE FROM sync_state")
+            resume_id = self._resume_id()
+
+            with pg_conn.cursor() as cursor:
+                # 同期時刻は created_at と同じDBサーバの時計で記録
+                cursor.execute("SELECT LOCALTIMESTAMP")
+                db_now = cursor.fetchone()[0]
+                identity_columns = _identity_select(cursor)
+
+            rows = 0
+            with pg_conn.cursor(name='history_mirror_sync') as cursor:
+                cursor.itersize = self.batch_rows
+                cursor.execute(SYNC_SQL.format(identity_columns=identity_columns), (resume_id,))
+                while True:
+                    batch = cursor.fetchmany(self.batch_rows)
+                    if not batch:
+                        break
+                    with self._conn:
+                        self._conn.executemany(
+                            "INSERT OR REPLACE INTO history VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            [(row[0], row[1], row[2], row[3], row[4], _timestamp_text(row[5]), row[6],
+                              _timestamp_text(row[7]), row[8], row[9]) for row in batch]
+                        )
+                    rows += len(batch)
+            pg_conn.commit()
+
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO sync_state VALUES (?, ?)",
+                    [('synced_at', db_now.isoformat()), ('last_success', str(time.time()))]
+                )
+        self.logger.info(f"履歴ミラー同期完了: {rows:,}行 (起点 id > {resume_id:,}, "
+                         f"{time.monotonic() - started:,.1f}秒)")
+        return rows
+
+    def refresh(self, connect: Callable, full: bool = False) -> None:
+        """
+        同期して検索可能な状態にする（同期失敗時は最終同期が max_stale_hours 以内ならミラーのまま継続）
+
+        Args:
+            connect: psycopg2接続を返す処理
+            full: ミラーを空にして全件取り込む
+        """
+        try:
+            pg_conn = connect()
+            try:
+                self.sync(pg_conn, full)
+            finally:
+                pg_conn.close()
+        except Exception as e:
+            with self._lock:
+                last_success = self._state('last_success')
+            age = time.time() - float(last_success) if last_success else None
+            if age is None or age > self.max_stale_seconds:
+                raise Exception(f"履歴ミラー同期失敗（利用可能なミラーなし）: {e}")
+            self.logger.warning(f"履歴ミラー同期失敗 - {age / 3600:.1f}時間前の同期内容で検索します: {e}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # PostgresHistorySource と共通の検索
+    def find_exact(self, path: str) -> List[HistoryRow]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT original_file_path, s3_path, archive_date, file_size FROM history "
+                "WHERE original_file_path = ?", (path,)
+            ).fetchall()
+
+    def _like_condition(self, pattern: str) -> Tuple[str, Tuple]:
+        """LIKE パターンの検索条件（前方一致はインデックスの範囲検索、それ以外は GLOB）"""
+        prefix = like_prefix(pattern)
+        if prefix == '':
+            return '1 = 1', ()
+        if prefix is not None:
+            upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+            return 'original_file_path >= ? AND original_file_path < ?', (prefix, upper)
+        return 'original_file_path GLOB ?', (like_to_glob(pattern),)
+
+    def find_like(self, pattern: str) -> List[HistoryRow]:
+        condition, params = self._like_condition(pattern)
+        with self._lock:
+            return self._conn.execute(
+                "SELECT original_file_path, s3_path, archive_date, file_size FROM history "
+                f"WHERE {condition} ORDER BY original_file_path", params
+            ).fetchall()
+
+    def count_like(self, pattern: str) -> int:
+        condition, params = self._like_condition(pattern)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM history WHERE {condition}", params).fetchone()[0]
+
+    def lookup_paths(self, paths: Iterable[str]) -> Dict[str, ArchivedFile]:
+        """パスごとの最新のアーカイブ（s3_path, file_size, file_mtime, checksum）"""
+        found = {}
+        paths = list(paths)
+        with self._lock:
+            for start in range(0, len(paths), LOOKUP_CHUNK_SIZE):
+                chunk = paths[start:start + LOOKUP_CHUNK_SIZE]
+                rows = self._conn.execute(
+                    "SELECT original_file_path, s3_path, file_size, file_mtime, checksum FROM history "
+                    f"WHERE original_file_path IN ({', '.join('?' * len(chunk))}) "
+                    "ORDER BY archive_date", chunk
+                )
+                for path, s3_path, file_size, file_mtime, checksum in rows:
+                    found[path] = ArchivedFile(s3_path, file_size, file_mtime, checksum)
+        return found
+
+
+class PostgresHistorySource:
+    """archive_history の検索（PostgreSQL、HistoryMirror と同じメソッド）"""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self._identity_columns = None
+
+    def find_exact(self, path: str) -> List[HistoryRow]:
+        self.cursor.execute(
+            "SELECT original_file_path, s3_path, archive_date, file_size FROM archive_history WHERE original_file_path = %s",
+            (path,)
+        )
+        return self.cursor.fetchall()
+
+    def find_like(self, pattern: str) -> List[HistoryRow]:
+        self.cursor.execute(
+            "SELECT original_file_path, s3_path, archive_date, file_size FROM archive_history WHERE original_file_path LIKE %s ORDER BY original_file_path",
+            (pattern,)
+        )
+        return self.cursor.fetchall()
+
+    def count_like(self, pattern: str) -> int:
+        self.cursor.execute("SELECT COUNT(*) FROM archive_history WHERE original_file_path LIKE %s", (pattern,))
+        return self.cursor.fetchone()[0]
+
+    def lookup_paths(self, paths: Iterable[str], chunk_size: int = 10000) -> Dict[str, ArchivedFile]:
+        """パスごとの最新のアーカイブ（s3_path, file_size, file_mtime, checksum）"""
+        if self._identity_columns is None:
+            self._identity_columns = _identity_select(self.cursor)
+        found = {}
+        paths = list(paths)
+        for start in range(0, len(paths), chunk_size):
+            self.cursor.execute(
+                f"""
+                SELECT DISTINCT ON (original_file_path) original_file_path, s3_path, file_size,
+                       {self._identity_columns}
+                FROM archive_history
+                WHERE original_file_path = ANY(%s)
+                ORDER BY original_file_path, archive_date DESC
+                """,
+                (paths[start:start + chunk_size],)
+            )
+            for path, s3_path, file_size, file_mtime, checksum in self.cursor.fetchall():
+                found[path] = ArchivedFile(s3_path, file_size, file_mtime, checksum)
+        return found
+
+
+@contextmanager
+def history_source(mirror: Optional[HistoryMirror], connect: Callable):
+    """
+    アーカイブ履歴の検索先（ミラー有効時は同期したミラー、無効時は PostgreSQL）
+
+    Args:
+        mirror: 履歴ミラー（無効時はNone）
+        connect: psycopg2接続を返す処理
+    """
+    if mirror:
+        mirror.refresh(connect)
+        yield mirror
+        return
+    conn = connect()
+    try:
+        with conn:
+            with conn.cursor() as cursor:
+                yield PostgresHistorySource(cursor)
+    finally:
+        conn.close()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ファイル列挙（フォルダ単位の一覧取得）とディスク上の列挙キャッシュ
+- os.scandir でフォルダを1回読み、ファイル名・サイズ・更新日時とサブフォルダ名を取得
+  （Windows では一覧取得時の情報を DirEntry.stat() が再利用するため、ファイルごとの問い合わせが発生しない）
+- 列挙キャッシュ（SQLite）はフォルダパスとフォルダの更新日時をキーに一覧を保持し、
+  更新日時が変わっていないフォルダは一覧を取得し直さずにローカルから読み出す
+  （SMB越しの再列挙をフォルダごとの stat 1回に置き換える）
+- 同じCSVを複数回実行する運用（ドライラン、失敗分の再実行）向け
+
+注意: フォルダの更新日時はファイルの追加・削除・名前変更で更新されるが、既存ファイルの上書きでは
+更新されない。上書きされたファイルのサイズを拾うため、キャッシュは max_age_hours で失効させる。
+確実に再列挙する場合は --refresh-inventory（対象ディレクトリ配下のキャッシュを破棄）を指定する。
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# フォルダ一覧: ([(ファイル名, サイズ, 更新日時), ...], [サブフォルダ名, ...])
+Listing = Tuple[List[Tuple[str, int, float]], List[str]]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    scanned_at REAL NOT NULL,
+    files TEXT NOT NULL,
+    subdirs TEXT NOT NULL
+)
+"""
+
+
+def list_directory(folder: str, stat_entry: Optional[Callable] = None,
+                   errors: Optional[List[Tuple[str, OSError]]] = None) -> Listing:
+    """
+    1フォルダ分の一覧取得（stat に失敗したファイルは除外）
+
+    Args:
+        folder: フォルダパス
+        stat_entry: DirEntry を受け取り stat 結果を返す処理（計測・障害注入用、省略時は DirEntry.stat）
+        errors: stat に失敗したファイルの (パス, 例外) を追加するリスト
+    """
+    files = []
+    subdirs = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                    continue
+                if not entry.is_file():
+                    continue
+                stat_info = stat_entry(entry) if stat_entry else entry.stat()
+            except OSError as e:
+                if errors is not None:
+                    errors.append((entry.path, e))
+                continue
+            files.append((entry.name, stat_info.st_size, stat_info.st_mtime))
+    return files, subdirs
+
+
+class InventoryCache:
+    """フォルダ一覧のディスクキャッシュ（スレッドセーフ）"""
+
+    def __init__(self, path: str, max_age_hours: float = 24.0, commit_every: int = 500,
+                 logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            path: キャッシュファイル（SQLite）のパス
+            max_age_hours: キャッシュの有効時間（0以下は無期限）
+            commit_every: まとめて書き込むフォルダ数
+            logger: ログ出力先
+        """
+        self.path = Path(path)
+        self.max_age_seconds = max_age_hours * 3600 if max_age_hours and max_age_hours > 0 else None
+        self.commit_every = max(1, commit_every)
+        self.logger = logger or logging.getLogger(__name__)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._pending = []
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_config(cls, config: Dict, logger: Optional[logging.Logger] = None) -> Optional['InventoryCache']:
+        """設定辞書（inventory_cacheセクション）から生成（無効時はNone）"""
+        if not config.get('enabled', False):
+            return None
+        cache = cls(
+            config.get('path', 'cache/archive_inventory.db'),
+            max_age_hours=config.get('max_age_hours', 24.0),
+            commit_every=config.get('commit_every', 500),
+            logger=logger
+        )
+        cache.logger.info(f"列挙キャッシュ: {cache.path}（有効時間: {config.get('max_age_hours', 24.0)}時間）")
+        return cache
+
+    def get(self, folder: str, mtime: float) -> Optional[Listing]:
+        """更新日時が一致し有効期限内のキャッシュを取得"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT mtime, scanned_at, files, subdirs FROM folders WHERE path = ?", (folder,)
+            ).fetchone()
+        if (row is None or row[0] != mtime
+                or (self.max_age_seconds and time.time() - row[1] > self.max_age_seconds)):
+            return None
+        return [tuple(item) for item in json.loads(row[2])], json.loads(row[3])
+
+    def put(self, folder: str, mtime: float, listing: Listing) -> None:
+        """一覧を保存（commit_every フォルダごとに書き込み）"""
+        files, subdirs = listing
+        row = (folder, mtime, time.time(),
+               json.dumps(files, ensure_ascii=False), json.dumps(subdirs, ensure_ascii=False))
+        with self._lock:
+            self._pending.append(row)
+            if len(self._pending) >= self.commit_every:
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._pending:
+            return
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO folders VALUES (?, ?, ?, ?, ?)", self._pending)
+        self._pending = []
+
+    def flush(self) -> None:
+        """書き込み残りの反映"""
+        with self._lock:
+            self._flush_locked()
+
+    def invalidate(self, directories: Optional[List[str]] = None) -> int:
+        """
+        キャッシュの破棄
+
+        Args:
+            directories: 破棄するディレクトリ（配下のフォルダを含む、省略時は全件）
+
+        Returns:
+            int: 破棄したフォルダ数
+        """
+        with self._lock:
+            self._flush_locked()
+            with self._conn:
+                if directories is None:
+                    return self._conn.execute("DELETE FROM folders").rowcount
+                deleted = 0
+                for directory in directories:
+                    prefix = directory.rstrip('\\/') + os.sep
+                    deleted += self._conn.execute(
+                        "DELETE FROM folders WHERE path = ? OR substr(path, 1, ?) = ?",
+                        (directory, len(prefix), prefix)
+                    ).rowcount
+                return deleted
+
+    def close(self) -> None:
+        """書き込み残りを反映して閉じる"""
+        with self._lock:
+            try:
+                self._flush_locked()
+            finally:
+                self._conn.close()
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+def walk_files(directory: str, stat_entry: Optional[Callable] = None, on_error: Optional[Callable] = None,
+               cache: Optional[InventoryCache] = None) -> Iterator[Tuple[str, str, int, float]]:
+    """
+    ディレクトリ配下のファイル列挙（os.walk と同じくトップダウン、読めないフォルダ・ファイルはスキップ）
+
+    stat に失敗したファイルがあるフォルダの一覧はキャッシュしない
+    （一時的なエラーで欠けた一覧を、フォルダの更新日時が変わるまで使い続けないため）
+
+    Args:
+        directory: 起点ディレクトリ
+        stat_entry: DirEntry を受け取り stat 結果を返す処理（計測・障害注入用）
+        on_error: フォルダの一覧取得・ファイルの stat に失敗した場合に (パス, 例外) を渡して呼び出す処理
+        cache: 列挙キャッシュ（省略時は毎回一覧を取得）
+
+    Yields:
+        (親フォルダ, ファイル名, サイズ, 更新日時)
+    """
+    stack = [directory]
+    while stack:
+        folder = stack.pop()
+        stat_errors = []
+        try:
+            listing = None
+            if cache:
+                mtime = os.stat(folder).st_mtime
+                listing = cache.get(folder, mtime)
+                cache._count(listing is not None)
+            if listing is None:
+                listing = list_directory(folder, stat_entry, stat_errors)
+                if cache:
+                    if stat_errors:
+                        cache.logger.warning(f"stat に失敗したファイルがあるため一覧をキャッシュしません: "
+                                             f"{folder}（{len(stat_errors)}件）")
+                    else:
+                        cache.put(folder, mtime, listing)
+        except OSError as e:
+            if on_error:
+                on_error(folder, e)
+            continue
+        finally:
+            if on_error:
+                for path, error in stat_errors:
+                    on_error(path, error)
+
+        files, subdirs = listing
+        for name, size, mtime in files:
+            yield folder, name, size, mtime
+        stack.extend(os.path.join(folder, name) for name in reversed(subdirs))
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+非同期・バッチ書き込みのログ設定
+- QueueHandler/QueueListener でログ出力をバックグラウンドスレッドに移し、
+  転送ワーカーがファイル・コンソール書き込みを待たないようにする
+- ファイル出力は一定件数・一定間隔ごとにまとめてflush（WARNING以上は即時flush）
+- ファイル単位の詳細ログ（extra=DETAIL）はファイルのみに出力し、
+  コンソールには一定件数・一定間隔ごとの進捗サマリーを出力する
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+# ファイル単位の詳細ログに付与する extra（コンソールには出力しない）
+DETAIL = {'detail': True}
+
+# ロガー名ごとの書き込みスレッド（終了時の停止処理はプロセスで1回だけ登録）
+_active_listeners: Dict[str, 'AsyncLogListener'] = {}
+_listeners_lock = threading.Lock()
+_atexit_registered = False
+
+
+class ConsoleDetailFilter(logging.Filter):
+    """ファイル単位の詳細ログをコンソールから除外するフィルタ"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not getattr(record, 'detail', False)
+
+
+class BatchingFileHandler(logging.FileHandler):
+    """一定件数・一定間隔ごとにまとめてflushするFileHandler"""
+
+    def __init__(self, filename, flush_interval: float = 1.0, flush_records: int = 200,
+                 encoding: Optional[str] = None):
+        super().__init__(filename, encoding=encoding)
+        self.flush_interval = flush_interval
+        self.flush_records = flush_records
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._stopped = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name='log-flusher', daemon=True)
+        self._flusher.start()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(self.format(record) + self.terminator)
+            self._pending += 1
+            if (record.levelno >= logging.WARNING or self._pending >= self.flush_records
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self) -> None:
+        self.acquire()
+        try:
+            if self.stream and self._pending:
+                self.stream.flush()
+            self._pending = 0
+            self._last_flush = time.monotonic()
+        finally:
+            self.release()
+
+    def _flush_loop(self) -> None:
+        """出力が途切れた場合も一定間隔でflush"""
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
+
+    def close(self) -> None:
+        self._stopped.set()
+        super().close()
+
+
+class AsyncLogListener(logging.handlers.QueueListener):
+    """キューからログを取り出して書き込むバックグラウンドスレッド"""
+
+    def stop(self) -> None:
+        """未出力分を書き出して停止（複数回呼び出し可）"""
+        if self._thread is not None:
+            super().stop()
+        for handler in self.handlers:
+            handler.close()
+
+
+def start_queue_logging(logger: logging.Logger, handlers: List[logging.Handler]) -> AsyncLogListener:
+    """
+    ロガーの出力をキュー経由に切り替え、バックグラウンドの書き込みスレッドを開始
+
+    同じロガーで再度呼び出した場合（ワーカーモード等で setup_logger を繰り返す場合）は
+    前回の書き込みスレッドを停止して置き換える。
+    プロセス終了時（sys.exit含む）に残りのログを書き出してから停止する。
+    """
+    global _atexit_registered
+    log_queue = queue.SimpleQueue()
+    listener = AsyncLogListener(log_queue, *handlers, respect_handler_level=True)
+    with _listeners_lock:
+        previous = _active_listeners.pop(logger.name, None)
+        if previous is not None:
+            previous.stop()
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        listener.start()
+        _active_listeners[logger.name] = listener
+        if not _atexit_registered:
+            atexit.register(_stop_all_listeners)
+            _atexit_registered = True
+    return listener
+
+
+def _stop_all_listeners() -> None:
+    """プロセス終了時に全ての書き込みスレッドを停止"""
+    with _listeners_lock:
+        listeners = list(_active_listeners.values())
+        _active_listeners.clear()
+    for listener in listeners:
+        listener.stop()
+
+
+class ProgressReporter:
+    """一定件数・一定間隔ごとの進捗サマリーをログ出力するクラス（スレッドセーフ）"""
+
+    def __init__(self, logger: logging.Logger, label: str, total: int,
+                 every_files: int = 100, every_seconds: float = 10.0):
+        self.logger = logger
+        self.label = label
+        self.total = total
+        self.every_files = max(1, every_files)
+        self.every_seconds = every_seconds
+        self.done = 0
+        self.failed = 0
+        self.bytes_done = 0
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._last_report = self._started
+        self._last_reported_count = 0
+
+    def update(self, success: bool, size_bytes: int = 0) -> None:
+        """1件分の完了を記録（閾値に達したらサマリーを出力）"""
+        with self._lock:
+            self.done += 1
+            if success:
+                self.bytes_done += size_bytes
+            else:
+                self.failed += 1
+            now = time.monotonic()
+            if (self.done - self._last_reported_count < self.every_files
+                    and now - self._last_report < self.every_seconds
+                    and self.done < self.total):
+                return
+            self._last_report = now
+            self._last_reported_count = self.done
+            message = self._summary_text(now)
+        self.logger.info(message)
+
+    def _summary_text(self, now: float) -> str:
+        elapsed = now - self._started
+        percentage = self.done / self.total * 100 if self.total else 100.0
+        rate = self.bytes_done / elapsed / 1048576 if elapsed > 0 else 0.0
+        return (f"{self.label}進捗: {self.done}/{self.total}件 ({percentage:.1f}%) "
+                f"失敗: {self.failed}件 {rate:.2f} MB/s")
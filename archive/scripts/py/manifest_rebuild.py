@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+マニフェストからの archive_history 再構築
+- S3の {manifest.prefix}/ 配下（--request-id 指定時は依頼単位）のマニフェストを一覧取得
+- マニフェストを複数スレッドで並列にダウンロード・展開し、メインスレッドで一時テーブルへ COPY
+- 一時テーブルから archive_history に未登録の行のみ挿入
+  （original_file_path・s3_path・archive_date が一致する行は登録済みとみなすため、再実行しても重複しない）
+
+DB消失時の全件再構築のほか、DB登録エラーで欠落した依頼の補填に使用する。
+--dry-run では挿入件数の確認のみ行いロールバックする。
+"""
+
+import argparse
+import gzip
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from archive_manifest import MANIFEST_COLUMNS
+from archive_script_main import DEFAULT_CONFIG_PATH, ArchiveProcessor
+from history_mirror import has_identity_columns
+
+COPY_SQL = f"COPY manifest_rows ({', '.join(MANIFEST_COLUMNS)}) FROM STDIN WITH (FORMAT csv, HEADER true)"
+
+# {identity_columns}: file_mtime・checksum 列を追加済みのDBのみ登録
+INSERT_SQL = """
+    INSERT INTO archive_history (
+        request_id, requester, request_date,
+        original_file_path, s3_path, archive_date, file_size{identity_columns}
+    )
+    SELECT DISTINCT m.request_id, m.requester, m.request_date,
+           m.original_file_path, m.s3_path, m.archive_date, m.file_size{identity_values}
+    FROM manifest_rows m
+    WHERE NOT EXISTS (
+        SELECT 1 FROM archive_history h
+        WHERE h.s3_path = m.s3_path
+          AND h.original_file_path = m.original_file_path
+          AND h.archive_date = m.archive_date
+    )
+"""
+
+
+def list_manifests(s3_client, retry_policy, bucket: str, prefix: str) -> List[str]:
+    """マニフェストのキー一覧"""
+    keys = []
+    params = {'Bucket': bucket, 'Prefix': prefix}
+    while True:
+        outcome = retry_policy.call(lambda: s3_client.list_objects_v2(**params), 'list_objects', prefix)
+        if not outcome['success']:
+            raise Exception(f"マニフェスト一覧取得失敗: {retry_policy.failure_message(outcome)}")
+        response = outcome['result']
+        keys.extend(item['Key'] for item in response.get('Contents', []) if item['Key'].endswith('.csv.gz'))
+        if not response.get('IsTruncated'):
+            return keys
+        params['ContinuationToken'] = response['NextContinuationToken']
+
+
+def rebuild(processor: ArchiveProcessor, request_ids: Optional[List[str]], workers: int, dry_run: bool) -> int:
+    """
+    archive_history の再構築
+
+    Returns:
+        int: 挿入件数（--dry-run では挿入予定件数）
+    """
+    logger = processor.logger
+    bucket = processor.config['aws']['s3_bucket'].strip()
+    manifest_prefix = processor.config.get('manifest', {}).get('prefix', '_manifests').strip('/')
+    retry_policy = processor.retry_policy
+    s3_client = processor._initialize_s3_client()
+
+    if request_ids:
+        prefixes = [f"{manifest_prefix}/{request_id}/" for request_id in request_ids]
+    else:
+        prefixes = [f"{manifest_prefix}/"]
+    keys = [key for prefix in prefixes for key in list_manifests(s3_client, retry_policy, bucket, prefix)]
+    if not keys:
+        logger.warning(f"マニフェストが見つかりません: s3://{bucket}/{prefixes[0]}")
+        return 0
+    logger.info(f"マニフェスト: {len(keys):,}件を{workers}並列で読み込み")
+
+    def download(key: str) -> bytes:
+        outcome = retry_policy.call(
+            lambda: s3_client.get_object(Bucket=bucket, Key=key)['Body'].read(), 'download', key
+        )
+        if not outcome['success']:
+            raise Exception(f"マニフェスト取得失敗 ({key}): {retry_policy.failure_message(outcome)}")
+        return gzip.decompress(outcome['result'])
+
+    started = time.monotonic()
+    conn = processor._connect_database()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                CREATE TEMP TABLE manifest_rows (
+                    request_id VARCHAR(50), requester VARCHAR(8),
+                    request_date TIMESTAMP, archive_date TIMESTAMP,
+                    original_file_path TEXT, s3_path TEXT, file_size BIGINT,
+                    file_mtime DOUBLE PRECISION, checksum TEXT
+                )
+                """
+            )
+            # ダウンロード・展開はワーカースレッド、COPY はメインスレッドで順次実行
+            # （展開済みのマニフェストを溜め込まないよう、並列数の数倍ずつ投入）
+            workers = max(1, workers)
+            window = workers * 4
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for start in range(0, len(keys), window):
+                    for data in executor.map(download, keys[start:start + window]):
+                        cursor.copy_expert(COPY_SQL, io.BytesIO(data))
+                    logger.info(f"マニフェスト読み込み中: {min(start + window, len(keys)):,}/{len(keys):,}")
+            cursor.execute("SELECT COUNT(*) FROM manifest_rows")
+            manifest_rows = cursor.fetchone()[0]
+            cursor.execute("ANALYZE manifest_rows")
+            logger.info(f"マニフェスト読み込み完了: {manifest_rows:,}行 ({time.monotonic() - started:,.1f}秒)")
+
+            if has_identity_columns(cursor):
+                insert_sql = INSERT_SQL.format(identity_columns=', file_mtime, checksum',
+                                               identity_values=", m.file_mtime, NULLIF(m.checksum, '')")
+            else:
+                insert_sql = INSERT_SQL.format(identity_columns='', identity_values='')
+            cursor.execute(insert_sql)
+            inserted = cursor.rowcount
+        if dry_run:
+            conn.rollback()
+            logger.info(f"ドライラン: 挿入予定 {inserted:,}件 / 登録済み {manifest_rows - inserted:,}件（ロールバック）")
+        else:
+            conn.commit()
+            logger.info(f"archive_history 再構築完了: 挿入 {inserted:,}件 / 登録済み {manifest_rows - inserted:,}件 "
+                        f"({time.monotonic() - started:,.1f}秒)")
+        return inserted
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description='マニフェストからのアーカイブ履歴の再構築')
+    parser.add_argument('--config', default=DEFAULT_CONFIG_PATH,
+                        help=f'設定ファイルパス (デフォルト: {DEFAULT_CONFIG_PATH})')
+    parser.add_argument('--request-id', action='append', dest='request_ids',
+                        help='対象の依頼ID（複数指定可、省略時は全マニフェスト）')
+    parser.add_argument('--workers', type=int, default=8, help='マニフェスト読み込みの並列数 (デフォルト: 8)')
+    parser.add_argument('--dry-run', action='store_true', help='挿入件数の確認のみ行う')
+
+    args = parser.parse_args()
+
+    try:
+        processor = ArchiveProcessor(args.config)
+        rebuild(processor, args.request_ids, args.workers, args.dry_run)
+        return 0
+    except Exception as e:
+        print(f"❌ 再構築エラー: {str(e)}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
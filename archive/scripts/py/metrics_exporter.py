@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prometheus textfile形式のメトリクス出力
+- node_exporter の textfile collector で収集できる .prom ファイルを定期的に書き出す
+- 処理済みファイル数、転送量・転送速度、実行中ワーカー数、リトライ回数、
+  エラー分類別件数、処理待ちファイル数を出力
+- 書き込みは一時ファイル経由の置き換えで行い、収集側が書き込み途中の内容を読まないようにする
+- ファイル名・ラベルに実行単位の識別子（依頼ID・ワーカーID・PID）を含め、
+  同じジョブの複数プロセス（キューワーカー、重なった実行）が互いのファイルを上書きしないようにする
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from run_metrics import RunMetrics
+
+
+def _file_token(value) -> str:
+    """ファイル名に使用できない文字の置き換え"""
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', str(value))
+
+
+def _escape_label(value) -> str:
+    """ラベル値のエスケープ"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class PrometheusTextfileExporter:
+    """RunMetricsの内容を定期的にPrometheus textfile形式で出力するクラス"""
+
+    def __init__(self, metrics: RunMetrics, job: str, primary_operation: str,
+                 textfile_directory: str, interval: float = 15.0, prefix: str = 'archive_system',
+                 labels: Optional[Dict[str, str]] = None, instance: Optional[str] = None,
+                 logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            metrics: 計測値の取得元
+            job: ジョブ名（archive / restore / delete、ファイル名にも使用）
+            primary_operation: 処理済みファイル数として数える処理名（put / download / delete）
+            textfile_directory: node_exporter の --collector.textfile.directory
+            interval: 出力間隔（秒）
+            prefix: メトリクス名の接頭辞
+            labels: 全メトリクスに付与するラベル（request_id等）
+            instance: 実行単位の識別子（ファイル名と instance_id ラベルに使用、省略時はPID）
+            logger: ログ出力先
+        """
+        self.metrics = metrics
+        self.job = job
+        self.primary_operation = primary_operation
+        self.instance = str(instance or os.getpid())
+        self.path = Path(textfile_directory) / f"{prefix}_{job}_{_file_token(self.instance)}.prom"
+        self.interval = interval
+        self.prefix = prefix
+        self.labels = {'job': job, 'instance_id': self.instance, **(labels or {})}
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._last_bytes = 0
+        self._last_time = None
+        self._started = time.time()
+
+    @classmethod
+    def from_config(cls, config: Dict, metrics: RunMetrics, job: str, primary_operation: str,
+                    labels: Optional[Dict[str, str]] = None, instance: Optional[str] = None,
+                    logger: Optional[logging.Logger] = None) -> Optional['PrometheusTextfileExporter']:
+        """設定辞書（metrics.prometheus_textfileセクション）から生成（無効時はNone）"""
+        if not config.get('enabled', False) or not config.get('textfile_directory'):
+            return None
+        return cls(
+            metrics, job, primary_operation,
+            textfile_directory=config['textfile_directory'],
+            interval=config.get('interval', 15.0),
+            prefix=config.get('prefix', 'archive_system'),
+            labels=labels,
+            instance=instance,
+            logger=logger
+        )
+
+    def start(self) -> None:
+        """定期出力スレッドの開始"""
+        self.logger.info(f"メトリクス出力開始: {self.path} ({self.interval:g}秒間隔)")
+        self.write(running=True)
+        self._thread = threading.Thread(target=self._run, name=f"metrics-{self.job}", daemon=True)
+        self._thread.start()
+
+    def stop(self, exit_code: Optional[int] = None) -> None:
+        """定期出力スレッドの停止と最終値の出力"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval)
+            self._thread = None
+        self.write(running=False, exit_code=exit_code)
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.write(running=True)
+
+    def _format(self, name: str, metric_type: str, help_text: str, samples: List) -> List[str]:
+        """1メトリクス分の出力行"""
+        metric_name = f"{self.prefix}_{name}"
+        lines = [f"# HELP {metric_name} {help_text}", f"# TYPE {metric_name} {metric_type}"]
+        for extra_labels, value in samples:
+            labels = {**self.labels, **extra_labels}
+            label_text = ','.join(f'{key}="{_escape_label(val)}"' for key, val in labels.items())
+            lines.append(f"{metric_name}{{{label_text}}} {value}")
+        return lines
+
+    def render(self, running: bool = True, exit_code: Optional[int] = None) -> str:
+        """現在値をPrometheus text形式に変換"""
+        snapshot = self.metrics.snapshot()
+        now = time.time()
+        primary = snapshot['operations'].get(self.primary_operation, {'count': 0, 'errors': 0, 'bytes': 0})
+        in_flight = sum(snapshot['in_flight'].values())
+
+        # 前回出力からの転送速度
+        if self._last_time is None:
+            elapsed = now - self._started
+            bytes_per_sec = primary['bytes'] / elapsed if elapsed > 0 else 0.0
+        else:
+            elapsed = now - self._last_time
+            bytes_per_sec = (primary['bytes'] - self._last_bytes) / elapsed if elapsed > 0 else 0.0
+        self._last_bytes = primary['bytes']
+        self._last_time = now
+
+        queued = snapshot['gauges'].get('queued_files', 0)
+        queue_depth = max(0, queued - primary['count'] - in_flight)
+        retries = sum(value for name, value in snapshot['counters'].items() if name.endswith('_retries'))
+
+        lines = []
+        lines += self._format('files_done_total', 'counter', 'Files processed in this run',
+                              [({'status': 'success'}, primary['count'] - primary['errors']),
+                               ({'status': 'failed'}, primary['errors'])])
+        lines += self._format('bytes_total', 'counter', 'Bytes transferred in this run',
+                              [({}, primary['bytes'])])
+        lines += self._format('bytes_per_second', 'gauge', 'Transfer rate since the previous write',
+                              [({}, round(bytes_per_sec, 1))])
+        lines += self._format('in_flight_workers', 'gauge', 'Operations currently in progress',
+                              [({}, in_flight)])
+        lines += self._format('queue_depth', 'gauge', 'Files waiting to be processed',
+                              [({}, queue_depth)])
+        lines += self._format('retries_total', 'counter', 'Retried transfer attempts',
+                              [({}, retries)])
+        lines += self._format('errors_total', 'counter', 'Errors by class',
+                              [({'class': error_class}, count)
+                               for error_class, count in sorted(snapshot['errors'].items())])
+        lines += self._format('running', 'gauge', '1 while the run is in progress',
+                              [({}, 1 if running else 0)])
+        lines += self._format('last_update_timestamp_seconds', 'gauge', 'Unix time of the last write',
+                              [({}, round(now, 3))])
+        lines += self._format('start_timestamp_seconds', 'gauge', 'Unix time the run started',
+                              [({}, round(self._started, 3))])
+        if exit_code is not None:
+            lines += self._format('exit_code', 'gauge', 'Exit code of the finished run',
+                                  [({}, exit_code)])
+        return '\n'.join(lines) + '\n'
+
+    def write(self, running: bool = True, exit_code: Optional[int] = None) -> None:
+        """.promファイルの書き出し（一時ファイルからの置き換え）"""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(self.render(running, exit_code))
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            self.logger.warning(f"メトリクス出力エラー: {e}")
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+複数アーカイブ依頼の公平スケジューラ
+- 複数の依頼（request_id）を1プロセス内で同時に処理
+- ワーカー枠は依頼単位の重み付きラウンドロビン（Smooth Weighted Round Robin）で割り当て
+- 巨大な依頼の処理中でも小さな依頼が早く完了する
+- 依頼ごとの進捗を定期的にログ出力
+"""
+
+import datetime
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from file_records import FileRecord, FileRecordStore
+from upload_scheduler import UploadScheduler
+
+
+class RequestState:
+    """依頼1件分の処理状態"""
+
+    def __init__(self, request_id: str, csv_path: str, weight: int = 1):
+        self.request_id = request_id
+        self.csv_path = csv_path
+        self.weight = max(1, int(weight))
+        self.current_weight = 0  # 重み付きラウンドロビン用
+        self.pending = deque()  # (連番, ファイル情報)
+        self.total_files = 0
+        self.total_size = 0
+        self.completed_files = 0
+        self.completed_size = 0
+        self.failed_files = 0
+        self.results = FileRecordStore()
+        self.start_time = None
+        self.end_time = None
+        self.finalized = False
+
+    def progress_text(self) -> str:
+        """進捗の表示用文字列"""
+        percentage = self.completed_files / self.total_files * 100 if self.total_files else 100.0
+        return (f"[{self.request_id}] {self.completed_files}/{self.total_files}件 ({percentage:.1f}%) "
+                f"{self.completed_size:,}/{self.total_size:,} bytes 失敗: {self.failed_files}件")
+
+
+class FairShareScheduler:
+    """複数依頼を重み付きラウンドロビンで並列処理するスケジューラ"""
+
+    def __init__(self, processor, workers: Optional[int] = None):
+        """
+        Args:
+            processor: ArchiveProcessor（各処理ステージを利用）
+            workers: 全依頼で共有するワーカー数（省略時は processing.parallel_workers）
+        """
+        self.processor = processor
+        self.logger = processor.logger
+        processing_config = processor.config.get('processing', {})
+        self.workers = max(1, int(workers or processing_config.get('parallel_workers', 1)))
+        self.progress_interval = processing_config.get('progress_interval', 60)
+        self.states = []
+        self._lock = threading.Lock()
+        self._last_progress_log = 0.0
+
+    def add_request(self, csv_path: str, request_id: str, weight: int = 1) -> None:
+        """処理対象の依頼を追加"""
+        self.states.append(RequestState(request_id, csv_path, weight))
+
+    @staticmethod
+    def load_request_list(list_path: str) -> List[Dict]:
+        """
+        依頼一覧CSVの読み込み
+
+        フォーマット（ヘッダー行は任意）:
+            CSV Path,Request ID,Weight
+            requests/dept1.csv,REQ-2025-001,1
+        """
+        import csv
+
+        requests = []
+        with open(list_path, 'r', encoding='utf-8-sig') as f:
+            for i, row in enumerate(csv.reader(f)):
+                if not row or not row[0].strip():
+                    continue
+                if i == 0 and 'csv' in row[0].lower():
+                    continue
+                weight = int(row[2]) if len(row) > 2 and row[2].strip() else 1
+                requests.append({'csv_path': row[0].strip(), 'request_id': row[1].strip(), 'weight': weight})
+        return requests
+
+    def run(self) -> int:
+        """全依頼の実行"""
+        stats = self.processor.stats
+        stats['start_time'] = datetime.datetime.now()
+
+        try:
+            self.logger.info(f"複数依頼の並列処理開始 - 依頼数: {len(self.states)}, ワーカー数: {self.workers}")
+
+            # 1. 依頼ごとにCSV検証・ファイル収集・順序計画
+            for state in self.states:
+                self._prepare_request(state)
+
+            # 2. S3クライアント初期化（全ワーカーで共有）
+            processor = self.processor
+            processor._s3_client = processor._s3_client or processor._initialize_s3_client()
+            aws_config = processor.config['aws']
+            self._bucket_name = aws_config['s3_bucket']
+            self._storage_class = processor._validate_storage_class(aws_config.get('storage_class', 'STANDARD'))
+            self._max_retries = processor.config['processing'].get('retry_count', 3)
+
+            # 3. 重み付きラウンドロビンでワーカー枠を割り当て
+            self._dispatch()
+
+            self.logger.info("複数依頼の並列処理完了")
+            for state in self.states:
+                elapsed = (state.end_time - state.start_time) if state.end_time and state.start_time else None
+                self.logger.info(f"  {state.progress_text()} 所要時間: {elapsed}")
+            return 0
+
+        except Exception as e:
+            self.logger.error(f"複数依頼の並列処理中にエラーが発生しました: {str(e)}")
+            return 1
+
+        finally:
+            stats['end_time'] = datetime.datetime.now()
+            self.processor.print_statistics()
+
+    def _prepare_request(self, state: RequestState) -> None:
+        """依頼のCSV検証・ファイル収集・アップロード順序計画"""
+        processor = self.processor
+        self.logger.info(f"依頼準備開始 - Request ID: {state.request_id} (重み: {state.weight})")
+        state.start_time = datetime.datetime.now()
+
+        directories, csv_errors = processor.validate_csv_input(state.csv_path)
+        if csv_errors:
+            error_csv_path = processor.generate_csv_error_file(state.csv_path)
+            self.logger.warning(f"[{state.request_id}] CSV検証エラーが発生しました: {error_csv_path}")
+
+        files = processor.collect_files(directories) if directories else FileRecordStore()
+
+        processing_config = processor.config.get('processing', {})
+        scheduler = UploadScheduler(
+            workers=self.workers,
+            small_file_threshold=processing_config.get('small_file_threshold', 8388608),
+            per_file_overhead_bytes=processing_config.get('per_file_overhead_bytes', 262144),
+            logger=self.logger
+        )
+        for i, file_info in enumerate(scheduler.plan(files), 1):
+            state.pending.append((i, file_info))
+
+        state.total_files = len(files)
+        state.total_size = files.total_size()
+        processor.stats['total_files'] += state.total_files
+        processor.stats['total_size'] += state.total_size
+
+        self.logger.info(f"[{state.request_id}] 処理対象: {state.total_files}件 ({state.total_size:,} bytes)")
+        if not files:
+            self.logger.warning(f"[{state.request_id}] 処理対象のファイルが見つかりません")
+
+    def _next_request(self) -> Optional[RequestState]:
+        """次にワーカー枠を割り当てる依頼を選択（Smooth Weighted Round Robin）"""
+        active = [state for state in self.states if state.pending]
+        if not active:
+            return None
+        total_weight = sum(state.weight for state in active)
+        for state in active:
+            state.current_weight += state.weight
+        selected = max(active, key=lambda state: state.current_weight)
+        selected.current_weight -= total_weight
+        return selected
+
+    def _dispatch(self) -> None:
+        """ワーカー枠が空くたびに次の依頼のファイルを投入し、完了した依頼を順次確定"""
+        slots = threading.Semaphore(self.workers)
+        finished = queue.Queue()
+
+        # ファイルがない依頼は即時確定
+        for state in self.states:
+            if state.total_files == 0:
+                finished.put(state)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                self._drain_finished(finished)
+                state = self._next_request()
+                if state is None:
+                    break
+
+                while not slots.acquire(timeout=1.0):
+                    self._drain_finished(finished)
+                    self._log_progress()
+
+                index, file_info = state.pending.popleft()
+                future = executor.submit(self._process_file, state, file_info, index)
+                future.add_done_callback(
+                    lambda f, st=state, record=file_info: self._on_file_done(st, record, f, slots, finished)
+                )
+                self._log_progress()
+
+            # 残りの依頼の完了待ち
+            while any(not state.finalized for state in self.states):
+                try:
+                    self._finalize_request(finished.get(timeout=1.0))
+                except queue.Empty:
+                    self._log_progress()
+
+    def _process_file(self, state: RequestState, file_info: FileRecord, index: int) -> FileRecord:
+        """1ファイルのアップロードと元ファイル削除（ワーカースレッド内で実行）"""
+        processor = self.processor
+        result = processor._upload_single_file(
+            processor._s3_client, file_info, index, state.total_files,
+            self._bucket_name, self._storage_class, self._max_retries
+        )
+        if result.success:
+            processor._delete_source_file(result)
+        return result
+
+    def _on_file_done(self, state: RequestState, result: FileRecord, future,
+                      slots: threading.Semaphore, finished: queue.Queue) -> None:
+        """ファイル処理完了時のコールバック（結果はレコードに記録済み）"""
+        try:
+            future.result()
+        except Exception as e:
+            result.success = False
+            result.error = f"予期しないエラー: {str(e)}"
+
+        with self._lock:
+            state.results.append(result)
+            state.completed_files += 1
+            state.completed_size += result.size
+            if not result.success:
+                state.failed_files += 1
+            request_done = state.completed_files == state.total_files
+
+        slots.release()
+        if request_done:
+            finished.put(state)
+
+    def _drain_finished(self, finished: queue.Queue) -> None:
+        """完了済み依頼の確定処理（メインスレッドで実行）"""
+        while True:
+            try:
+                state = finished.get_nowait()
+            except queue.Empty:
+                return
+            self._finalize_request(state)
+
+    def _finalize_request(self, state: RequestState) -> None:
+        """依頼単位の後処理（DB登録・ディレクトリリネーム・エラーCSV生成）"""
+        processor = self.processor
+        processor.request_id = state.request_id
+
+        if state.results:
+            processor.save_to_database(state.results)
+            processor.rename_archived_directories(state.results)
+
+            if state.failed_files:
+                archive_error_csv = processor.generate_error_csv(state.results, state.csv_path)
+                self.logger.warning(f"[{state.request_id}] アーカイブエラーが発生したファイルがあります: {archive_error_csv}")
+
+        processor.stats['processed_files'] += state.completed_files - state.failed_files
+        processor.stats['failed_files'] += state.failed_files
+
+        state.end_time = datetime.datetime.now()
+        state.finalized = True
+        self.logger.info(f"依頼完了 {state.progress_text()} 所要時間: {state.end_time - state.start_time}")
+
+    def _log_progress(self) -> None:
+        """依頼ごとの進捗を一定間隔でログ出力"""
+        now = time.monotonic()
+        if now - self._last_progress_log < self.progress_interval:
+            return
+        self._last_progress_log = now
+
+        self.logger.info("=== 依頼別進捗 ===")
+        for state in self.states:
+            status = "完了" if state.finalized else "処理中"
+            self.logger.info(f"  {state.progress_text()} [{status}]")
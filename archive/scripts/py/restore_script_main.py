@@ -12,10 +12,21 @@ import json
 import logging
 import os
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
+from bandwidth_limiter import BandwidthLimiter
+from concurrency_control import AdaptiveConcurrencyController, HostConcurrencyLimiter
+from fault_injection import FaultInjectingS3Client, FaultInjector
+from history_mirror import HistoryMirror, history_source
+from log_setup import DETAIL, BatchingFileHandler, ConsoleDetailFilter, ProgressReporter, start_queue_logging
+from metrics_exporter import PrometheusTextfileExporter
+from retry_policy import RetryPolicy
+from run_metrics import RunMetrics
+
 # 設定ファイルのデフォルトパス
 DEFAULT_CONFIG_PATH = "config/archive_config.json"
 
@@ -24,8 +35,24 @@ class RestoreProcessor:
     
     def __init__(self, config_path: str = DEFAULT_CONFIG_PATH):
         self.config = self.load_config(config_path)
+        self.log_file = None  # setup_loggerで設定（実行レポートの出力先に使用）
         self.logger = self.setup_logger()
+        self.metrics = RunMetrics('restore', self.logger)
+        self.restore_requests = []  # 実行レポートのティア別集計用
         self.csv_errors = []  # CSV検証エラーを記録
+        self.concurrency_controller = None  # 適応的同時実行数制御（有効時のみ）
+        self.host_limiter = HostConcurrencyLimiter.from_config(
+            self.config.get('file_server', {}).get('host_concurrency', {}), self.logger
+        )
+        self.bandwidth_limiter = BandwidthLimiter.from_config(self.config.get('bandwidth', {}), self.logger)
+        self.fault_injector = FaultInjector.from_config(self.config.get('fault_injection', {}), self.logger)
+        # 並列ダウンロード時の配置先予約（同じ配置先に複数ファイルを配置しないため）
+        self._reserved_destinations = set()
+        self._destination_lock = threading.Lock()
+        self.history_mirror = HistoryMirror.from_config(self.config.get('history_mirror', {}), self.logger)
+        self.retry_policy = RetryPolicy.from_config(
+            self.config.get('retry', {}), self.config.get('processing', {}).get('retry_count', 3), self.metrics, self.logger
+        )
         self.stats = {
             'total_requests': 0,
             'directory_requests': 0,
@@ -44,7 +71,14 @@ class RestoreProcessor:
         default_config = {
             "logging": {
                 "log_directory": "logs",
-                "log_level": "INFO"
+                "log_level": "INFO",
+                "metrics_report": True,  # ステージ別所要時間のJSONレポートを出力
+                "async_logging": True,  # ログ書き込みをバックグラウンドスレッドで実行
+                "flush_interval": 1.0,  # ファイル出力のflush間隔（秒）
+                "flush_records": 200,  # ファイル出力のflush件数
+                "console_detail": False,  # ファイル単位の詳細ログをコンソールにも出力
+                "progress_every_files": 100,  # 進捗サマリーの出力間隔（件数）
+                "progress_every_seconds": 10  # 進捗サマリーの出力間隔（秒）
             },
             "restore": {
                 "check_interval": 300,  # 5分間隔
@@ -52,10 +86,60 @@ class RestoreProcessor:
                 "restore_tier": "Standard",  # Standard, Expedited, Bulk
                 "download_retry_count": 3,
                 "skip_existing_files": True,
-                "temp_download_directory": "temp_downloads"
+                "temp_download_directory": "temp_downloads",
+                "parallel_downloads": 1,
+                "adaptive_concurrency": {
+                    "enabled": False,
+                    "min_workers": 1,
+                    "max_workers": 16,
+                    "adjust_interval": 10.0,
+                    "increase_step": 1,
+                    "decrease_factor": 0.5,
+                    "latency_threshold": 1.5,  # 1MBあたりの所要時間（小・大ファイル別）の基準に対する悪化判定倍率
+                    "small_file_threshold": 8388608,  # レイテンシ比較の小ファイル区分（バイト未満）
+                    "per_file_overhead_bytes": 262144  # 1ファイルあたりの固定コスト（リクエスト往復分をバイト換算）
+                }
+            },
+            "file_server": {
+                "host_concurrency": {
+                    "default_limit": 0,  # サーバ毎の同時アクセス上限（0は無制限）
+                    "hosts": {}  # 例: {"fileserver01": 4}
+                }
             },
             "processing": {
                 "retry_count": 3
+            },
+            "bandwidth": {
+                "enabled": False,
+                "default_mbps": 0,  # スケジュール外の上限（0は無制限）
+                "schedule": []  # 例: [{"start": "08:00", "end": "20:00", "mbps": 200}]
+            },
+            "retry": {
+                "base_delay": 1.0,  # フルジッター付き指数バックオフの基準秒数
+                "max_delay": 30.0,  # バックオフ上限の最大秒数
+                "throttle_delay_factor": 2.0,  # スロットリング時のバックオフ上限倍率
+                "budget_ratio": 0.2,  # 実行全体のリトライ予算（初回呼び出し数に対する比率）
+                "budget_min_retries": 20,  # リトライ予算の最低保証回数
+                "sdk_max_attempts": 1  # botocore側の試行回数（1: SDKでは再試行しない）
+            },
+            "history_mirror": {
+                "enabled": False,  # archive_history をローカル（SQLite）に差分同期し、ファイル検索はミラーで行う
+                "path": "cache/archive_history.db",
+                "overlap_minutes": 60,  # 差分同期で遡る時間（実行中だったトランザクションの行の取りこぼし防止）
+                "max_stale_hours": 24,  # 同期失敗時（DB停止中等）にミラーで検索を継続する最終同期からの時間
+                "batch_rows": 50000  # 1回に取り込む行数
+            },
+            "fault_injection": {
+                "enabled": False,  # 検証環境専用（環境変数 ARCHIVE_FAULT_INJECTION でも有効化可能）
+                "seed": None,
+                "operations": {}  # 例: {"s3_put": {"throttle_rate": 0.05, "latency_ms": 50}}
+            },
+            "metrics": {
+                "prometheus_textfile": {
+                    "enabled": False,
+                    "textfile_directory": "",  # node_exporterの --collector.textfile.directory
+                    "interval": 15  # 出力間隔（秒）
+                }
             }
         }
         
@@ -96,27 +180,55 @@ class RestoreProcessor:
             '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
         )
         
-        # コンソール出力
+        log_config = self.config.get('logging', {})
+        async_logging = log_config.get('async_logging', True)
+        
+        # コンソール出力（ファイル単位の詳細ログは進捗サマリーに置き換え）
         console_handler = logging.StreamHandler()
         console_handler.setLevel(logging.INFO)
         console_handler.setFormatter(formatter)
-        logger.addHandler(console_handler)
+        if not log_config.get('console_detail', False):
+            console_handler.addFilter(ConsoleDetailFilter())
+        handlers = [console_handler]
         
         # ファイル出力
+        log_file_error = None
         try:
-            log_config = self.config.get('logging', {})
             log_dir = Path(log_config.get('log_directory', 'logs'))
             log_dir.mkdir(exist_ok=True)
             
             log_file = log_dir / f"restore_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
-            file_handler = logging.FileHandler(log_file, encoding='utf-8')
+            if async_logging:
+                file_handler = BatchingFileHandler(
+                    log_file,
+                    flush_interval=log_config.get('flush_interval', 1.0),
+                    flush_records=log_config.get('flush_records', 200),
+                    encoding='utf-8'
+                )
+            else:
+                file_handler = logging.FileHandler(log_file, encoding='utf-8')
             file_handler.setLevel(logging.DEBUG)
             file_handler.setFormatter(formatter)
-            logger.addHandler(file_handler)
-            
-            logger.info(f"ログファイル: {log_file}")
+            handlers.append(file_handler)
+            self.log_file = log_file
         except Exception as e:
-            logger.warning(f"ログファイル設定エラー: {e}")
+            log_file_error = e
+        
+        # 非同期出力（書き込みはバックグラウンドスレッドで実行）
+        previous_listener = getattr(self, '_log_listener', None)
+        if previous_listener:
+            previous_listener.stop()
+        self._log_listener = None
+        if async_logging:
+            self._log_listener = start_queue_logging(logger, handlers)
+        else:
+            for handler in handlers:
+                logger.addHandler(handler)
+        
+        if log_file_error:
+            logger.warning(f"ログファイル設定エラー: {log_file_error}")
+        else:
+            logger.info(f"ログファイル: {self.log_file}")
         
         return logger
         
@@ -291,180 +403,166 @@ class RestoreProcessor:
         self.logger.info("データベースからファイル検索開始")
         
         try:
-            # データベース接続
-            conn = self._connect_database()
-            
-            with conn:
-                with conn.cursor() as cursor:
-                    for request in restore_requests:
-                        restore_path = request['restore_path']
-                        restore_mode = request['restore_mode']
-                        
-                        self.logger.info(f"検索開始: {restore_path} ({restore_mode}モード)")
+            # 検索先（履歴ミラー有効時はローカルミラー、無効時はPostgreSQL）
+            with history_source(self.history_mirror, self._connect_database) as source:
+                for request in restore_requests:
+                    restore_path = request['restore_path']
+                    restore_mode = request['restore_mode']
+                    
+                    self.logger.info(f"検索開始: {restore_path} ({restore_mode}モード)")
+                    
+                    if restore_mode == 'directory':
+                        # ディレクトリ復元: 複数パターンでLIKE検索
+                        search_patterns = self._generate_search_patterns(restore_path)
+                        self.logger.info(f"生成された検索パターン数: {len(search_patterns)}")
                         
-                        if restore_mode == 'directory':
-                            # ディレクトリ復元: 複数パターンでLIKE検索
-                            search_patterns = self._generate_search_patterns(restore_path)
-                            self.logger.info(f"生成された検索パターン数: {len(search_patterns)}")
-                            
-                            found_files = []
-                            for i, pattern in enumerate(search_patterns, 1):
-                                self.logger.info(f"検索パターン {i}: {pattern}")
-                                
-                                try:
-                                    # 標準的なLIKE検索
-                                    cursor.execute(
-                                        "SELECT original_file_path, s3_path, archive_date, file_size FROM archive_history WHERE original_file_path LIKE %s ORDER BY original_file_path",
-                                        (pattern,)
-                                    )
-                                    
-                                    results = cursor.fetchall()
-                                    self.logger.info(f"パターン {i} 結果: {len(results)}件")
-                                    
-                                    if results:
-                                        self.logger.info(f"✓ パターン '{pattern}' で {len(results)}件発見")
-                                        # 最初の3件のパスを表示
-                                        for j, row in enumerate(results[:3]):
-                                            self.logger.info(f"  発見 {j+1}: {row[0]}")
-                                        if len(results) > 3:
-                                            self.logger.info(f"  ... 他 {len(results)-3}件")
-                                        found_files.extend(results)
-                                        break  # 成功したらループを抜ける
-                                    else:
-                                        self.logger.debug(f"パターン '{pattern}' では見つからず")
-                                        
-                                except Exception as e:
-                                    self.logger.warning(f"パターン {i} でエラー: {str(e)}")
-                                    continue
+                        found_files = []
+                        for i, pattern in enumerate(search_patterns, 1):
+                            self.logger.info(f"検索パターン {i}: {pattern}")
                             
-                            # パターン検索で見つからない場合の代替検索
-                            if not found_files:
-                                self.logger.info("代替検索を実行中...")
+                            try:
+                                # 標準的なLIKE検索
+                                with self.metrics.timer('db_query'):
+                                    results = source.find_like(pattern)
                                 
-                                # ディレクトリ名部分を抽出
-                                path_parts = restore_path.replace('/', '\\').split('\\')
-                                dir_name = None
-                                for part in reversed(path_parts):
-                                    if part.strip():
-                                        dir_name = part
-                                        break
+                                self.logger.info(f"パターン {i} 結果: {len(results)}件")
                                 
-                                if dir_name:
-                                    alternative_patterns = [
-                                        f"%{dir_name}%",  # ディレクトリ名部分のみ
-                                        f"%{dir_name}\\%"  # ディレクトリ名+区切り文字
-                                    ]
+                                if results:
+                                    self.logger.info(f"✓ パターン '{pattern}' で {len(results)}件発見")
+                                    # 最初の3件のパスを表示
+                                    for j, row in enumerate(results[:3]):
+                                        self.logger.info(f"  発見 {j+1}: {row[0]}")
+                                    if len(results) > 3:
+                                        self.logger.info(f"  ... 他 {len(results)-3}件")
+                                    found_files.extend(results)
+                                    break  # 成功したらループを抜ける
+                                else:
+                                    self.logger.debug(f"パターン '{pattern}' では見つからず")
                                     
-                                    for alt_pattern in alternative_patterns:
-                                        self.logger.info(f"代替パターン: {alt_pattern}")
-                                        try:
-                                            cursor.execute(
-                                                "SELECT original_file_path, s3_path, archive_date, file_size FROM archive_history WHERE original_file_path LIKE %s ORDER BY original_file_path",
-                                                (alt_pattern,)
-                                            )
-                                            
-                                            results = cursor.fetchall()
-                                            if results:
-                                                # 元のパスと関連があるかチェック
-                                                filtered_results = []
-                                                for row in results:
-                                                    original_path = row[0]
-                                                    # より厳密なフィルタリング（サーバー名も一致するか）
-                                                    if restore_path.split('\\')[0] in original_path:
-                                                        filtered_results.append(row)
-                                                
-                                                if filtered_results:
-                                                    self.logger.info(f"✓ 代替パターンで {len(filtered_results)}件発見")
-                                                    found_files.extend(filtered_results)
-                                                    break
-                                        except Exception as e:
-                                            self.logger.warning(f"代替パターンでエラー: {str(e)}")
+                            except Exception as e:
+                                self.logger.warning(f"パターン {i} でエラー: {str(e)}")
+                                continue
+                        
+                        # パターン検索で見つからない場合の代替検索
+                        if not found_files:
+                            self.logger.info("代替検索を実行中...")
                             
-                            # 重複除去
-                            if found_files:
-                                unique_files = []
-                                seen_paths = set()
-                                for row in found_files:
-                                    if row[0] not in seen_paths:
-                                        unique_files.append(row)
-                                        seen_paths.add(row[0])
-                                results = unique_files
-                                self.logger.info(f"重複除去後: {len(results)}件")
-                            else:
-                                results = []
+                            # ディレクトリ名部分を抽出
+                            path_parts = restore_path.replace('/', '\\').split('\\')
+                            dir_name = None
+                            for part in reversed(path_parts):
+                                if part.strip():
+                                    dir_name = part
+                                    break
+                            
+                            if dir_name:
+                                alternative_patterns = [
+                                    f"%{dir_name}%",  # ディレクトリ名部分のみ
+                                    f"%{dir_name}\\%"  # ディレクトリ名+区切り文字
+                                ]
                                 
+                                for alt_pattern in alternative_patterns:
+                                    self.logger.info(f"代替パターン: {alt_pattern}")
+                                    try:
+                                        with self.metrics.timer('db_query'):
+                                            results = source.find_like(alt_pattern)
+                                        if results:
+                                            # 元のパスと関連があるかチェック
+                                            filtered_results = []
+                                            for row in results:
+                                                original_path = row[0]
+                                                # より厳密なフィルタリング（サーバー名も一致するか）
+                                                if restore_path.split('\\')[0] in original_path:
+                                                    filtered_results.append(row)
+                                            
+                                            if filtered_results:
+                                                self.logger.info(f"✓ 代替パターンで {len(filtered_results)}件発見")
+                                                found_files.extend(filtered_results)
+                                                break
+                                    except Exception as e:
+                                        self.logger.warning(f"代替パターンでエラー: {str(e)}")
+                        
+                        # 重複除去
+                        if found_files:
+                            unique_files = []
+                            seen_paths = set()
+                            for row in found_files:
+                                if row[0] not in seen_paths:
+                                    unique_files.append(row)
+                                    seen_paths.add(row[0])
+                            results = unique_files
+                            self.logger.info(f"重複除去後: {len(results)}件")
                         else:
-                            # ファイル復元: 完全一致検索
-                            self.logger.info(f"ファイル検索: {restore_path}")
+                            results = []
                             
-                            cursor.execute(
-                                "SELECT original_file_path, s3_path, archive_date, file_size FROM archive_history WHERE original_file_path = %s",
-                                (restore_path,)
-                            )
-                            results = cursor.fetchall()
-                            self.logger.info(f"ファイル検索結果: {len(results)}件")
+                    else:
+                        # ファイル復元: 完全一致検索
+                        self.logger.info(f"ファイル検索: {restore_path}")
                         
-                        if results:
-                            files_found = []
-                            for row in results:
-                                original_path, s3_path, archive_date, file_size = row
-                                
-                                file_info = {
-                                    'original_file_path': original_path,
-                                    's3_path': s3_path,
-                                    'bucket': self._extract_bucket_from_s3_path(s3_path),
-                                    'key': self._extract_key_from_s3_path(s3_path),
-                                    'archive_date': str(archive_date),
-                                    'file_size': file_size,
-                                    'restore_status': 'pending',
-                                    'relative_path': self._calculate_relative_path(original_path, restore_path, restore_mode)
-                                }
-                                files_found.append(file_info)
-                            
-                            request['files_found'] = files_found
-                            request['total_files_found'] = len(files_found)
-                            
-                            self.logger.info(f"✓ ファイル検索完了: {restore_path} -> {len(files_found)}件")
-                            
-                            # 検出ファイルの例を表示（最初の3件のみ）
-                            for i, file_info in enumerate(files_found[:3]):
-                                self.logger.info(f"  検出ファイル {i+1}: {file_info['original_file_path']}")
-                            if len(files_found) > 3:
-                                self.logger.info(f"  ... 他 {len(files_found)-3}件")
+                        with self.metrics.timer('db_query'):
+                            results = source.find_exact(restore_path)
+                        self.logger.info(f"ファイル検索結果: {len(results)}件")
+                    
+                    if results:
+                        files_found = []
+                        for row in results:
+                            original_path, s3_path, archive_date, file_size = row
                             
-                        else:
-                            request['files_found'] = []
-                            request['total_files_found'] = 0
-                            request['error'] = 'データベースにアーカイブ履歴が見つかりません'
-                            self.logger.error(f"ファイル見つからず: {restore_path}")
+                            file_info = {
+                                'original_file_path': original_path,
+                                's3_path': s3_path,
+                                'bucket': self._extract_bucket_from_s3_path(s3_path),
+                                'key': self._extract_key_from_s3_path(s3_path),
+                                'archive_date': str(archive_date),
+                                'file_size': file_size,
+                                'restore_status': 'pending',
+                                'relative_path': self._calculate_relative_path(original_path, restore_path, restore_mode)
+                            }
+                            files_found.append(file_info)
+                        
+                        request['files_found'] = files_found
+                        request['total_files_found'] = len(files_found)
+                        
+                        self.logger.info(f"✓ ファイル検索完了: {restore_path} -> {len(files_found)}件")
+                        
+                        # 検出ファイルの例を表示（最初の3件のみ）
+                        for i, file_info in enumerate(files_found[:3]):
+                            self.logger.info(f"  検出ファイル {i+1}: {file_info['original_file_path']}")
+                        if len(files_found) > 3:
+                            self.logger.info(f"  ... 他 {len(files_found)-3}件")
+                        
+                    else:
+                        request['files_found'] = []
+                        request['total_files_found'] = 0
+                        request['error'] = 'データベースにアーカイブ履歴が見つかりません'
+                        self.logger.error(f"ファイル見つからず: {restore_path}")
+                        
+                        # デバッグ情報
+                        self.logger.info("=== 検索失敗時のデバッグ情報 ===")
+                        try:
+                            # ディレクトリ名での検索結果を表示
+                            path_parts = restore_path.replace('/', '\\').split('\\')
+                            dir_name = None
+                            for part in reversed(path_parts):
+                                if part.strip():
+                                    dir_name = part
+                                    break
                             
-                            # デバッグ情報
-                            self.logger.info("=== 検索失敗時のデバッグ情報 ===")
-                            try:
-                                # ディレクトリ名での検索結果を表示
-                                path_parts = restore_path.replace('/', '\\').split('\\')
-                                dir_name = None
-                                for part in reversed(path_parts):
-                                    if part.strip():
-                                        dir_name = part
-                                        break
-                                
-                                if dir_name:
-                                    cursor.execute("SELECT COUNT(*) FROM archive_history WHERE original_file_path LIKE %s", (f"%{dir_name}%",))
-                                    related_count = cursor.fetchone()[0]
-                                    self.logger.info(f"関連ファイル数（'{dir_name}'を含む）: {related_count}")
-                            except Exception:
-                                pass
-                
-                # 統計更新
-                total_files = sum(req.get('total_files_found', 0) for req in restore_requests)
-                self.stats['total_files_found'] = total_files
-                
-                self.logger.info("データベースファイル検索完了")
-                self.logger.info(f"  - 総検出ファイル数: {total_files}件")
-                
-                return restore_requests
-                
+                            if dir_name:
+                                related_count = source.count_like(f"%{dir_name}%")
+                                self.logger.info(f"関連ファイル数（'{dir_name}'を含む）: {related_count}")
+                        except Exception:
+                            pass
+            
+            # 統計更新
+            total_files = sum(req.get('total_files_found', 0) for req in restore_requests)
+            self.stats['total_files_found'] = total_files
+            
+            self.logger.info("データベースファイル検索完了")
+            self.logger.info(f"  - 総検出ファイル数: {total_files}件")
+            
+            return restore_requests
+            
         except Exception as e:
             self.logger.error(f"データベース検索エラー: {str(e)}")
             # エラー時は全リクエストにエラーマーク
@@ -473,13 +571,6 @@ class RestoreProcessor:
                 request['total_files_found'] = 0
                 request['error'] = f'データベース接続エラー: {str(e)}'
             return restore_requests
-        
-        finally:
-            try:
-                if 'conn' in locals():
-                    conn.close()
-            except Exception:
-                pass
 
     def _generate_search_patterns(self, restore_path: str) -> List[str]:
         """ディレクトリ検索用の複数検索パターンを生成（PostgreSQLエスケープ対応）"""
@@ -663,6 +754,7 @@ class RestoreProcessor:
             
             successful_requests = 0
             failed_requests = 0
+            self.metrics.set_gauge('queued_files', sum(req['total_files_found'] for req in valid_requests))
             
             for request in valid_requests:
                 self.logger.info(f"復元リクエスト処理中: {request['restore_path']} ({request['total_files_found']}件)")
@@ -676,18 +768,28 @@ class RestoreProcessor:
                         # S3復元リクエスト送信
                         self.logger.debug(f"復元リクエスト送信中: {bucket}/{key}")
                         
-                        s3_client.restore_object(
-                            Bucket=bucket,
-                            Key=key,
-                            RestoreRequest={
-                                'Days': 7,  # 復元後の保持日数
-                                'GlacierJobParameters': {
-                                    'Tier': restore_tier
-                                }
-                            }
-                        )
+                        self.metrics.increment('s3_restore_object_calls')
+                        started = time.perf_counter()
+                        with self.metrics.active('restore_object'):
+                            outcome = self.retry_policy.call(
+                                lambda: s3_client.restore_object(
+                                    Bucket=bucket,
+                                    Key=key,
+                                    RestoreRequest={
+                                        'Days': 7,  # 復元後の保持日数
+                                        'GlacierJobParameters': {
+                                            'Tier': restore_tier
+                                        }
+                                    }
+                                ),
+                                'restore_object', key
+                            )
+                        file_info['restore_retries'] = outcome['retries']
+                        if not outcome['success']:
+                            raise outcome['exception']
                         
                         # 成功
+                        self.metrics.record('restore_object', time.perf_counter() - started)
                         file_info['restore_status'] = 'requested'
                         file_info['restore_request_time'] = datetime.datetime.now().isoformat()
                         file_info['restore_tier'] = restore_tier
@@ -696,9 +798,13 @@ class RestoreProcessor:
                         
                     except Exception as e:
                         error_msg = str(e)
+                        already_in_progress = 'RestoreAlreadyInProgress' in error_msg
+                        self.metrics.record('restore_object', time.perf_counter() - started,
+                                            error=not already_in_progress)
                         
                         # 既に復元中の場合は正常として扱う
-                        if 'RestoreAlreadyInProgress' in error_msg:
+                        if already_in_progress:
+                            self.metrics.increment('restore_already_in_progress')
                             file_info['restore_status'] = 'already_in_progress'
                             file_info['restore_request_time'] = datetime.datetime.now().isoformat()
                             successful_requests += 1
@@ -707,6 +813,7 @@ class RestoreProcessor:
                             file_info['restore_status'] = 'failed'
                             file_info['error'] = error_msg
                             failed_requests += 1
+                            self.metrics.count_error(e)
                             self.logger.error(f"✗ 復元リクエスト失敗: {original_path} - {error_msg}")
             
             # 統計更新
@@ -740,10 +847,12 @@ class RestoreProcessor:
             vpc_endpoint_url = aws_config.get('vpc_endpoint_url', '').strip()
             
             # boto3設定
+            # リトライは共通リトライポリシーで行うため、SDK側の再試行は retry.sdk_max_attempts に制限
+            # （adaptive モードのクライアント側レート制御は有効のまま）
             config = Config(
                 region_name=region,
                 retries={
-                    'max_attempts': 3,
+                    'total_max_attempts': self.config.get('retry', {}).get('sdk_max_attempts', 1),
                     'mode': 'adaptive'
                 }
             )
@@ -757,6 +866,8 @@ class RestoreProcessor:
                 s3_client = boto3.client('s3', config=config)
             
             self.logger.info("S3クライアント初期化成功")
+            if self.fault_injector:
+                s3_client = FaultInjectingS3Client(s3_client, self.fault_injector)
             return s3_client
             
         except ImportError:
@@ -798,7 +909,14 @@ class RestoreProcessor:
                     # S3オブジェクトのメタデータを取得してrestoreステータスを確認
                     self.logger.debug(f"復元ステータス確認中: {bucket}/{key}")
                     
-                    response = s3_client.head_object(Bucket=bucket, Key=key)
+                    self.metrics.increment('s3_head_object_calls')
+                    with self.metrics.timer('head_object'):
+                        outcome = self.retry_policy.call(
+                            lambda: s3_client.head_object(Bucket=bucket, Key=key), 'head_object', key
+                        )
+                        if not outcome['success']:
+                            raise outcome['exception']
+                    response = outcome['result']
                     
                     # Restoreヘッダーの確認
                     restore_header = response.get('Restore')
@@ -857,6 +975,7 @@ class RestoreProcessor:
                     
                     file_info['restore_check_time'] = datetime.datetime.now().isoformat()
                     failed_count += 1
+                    self.metrics.count_error(e)
                     self.logger.error(f"✗ 復元ステータス確認失敗: {original_path} - {error_msg}")
             
             # 統計更新
@@ -898,6 +1017,7 @@ class RestoreProcessor:
             return restore_requests
         
         self.logger.info(f"ダウンロード対象ファイル数: {len(completed_files)}件")
+        self.metrics.set_gauge('queued_files', len(completed_files))
         
         try:
             # S3クライアント初期化
@@ -908,112 +1028,63 @@ class RestoreProcessor:
             retry_count = restore_config.get('download_retry_count', 3)
             skip_existing = restore_config.get('skip_existing_files', True)
             temp_dir = restore_config.get('temp_download_directory', 'temp_downloads')
+            parallel_downloads = max(1, int(restore_config.get('parallel_downloads', 1)))
             
             # 一時ダウンロードディレクトリの作成
             temp_path = Path(temp_dir)
             temp_path.mkdir(exist_ok=True)
             
+            # 適応的同時実行数制御（有効時はスレッドプールを上限サイズで用意）
+            adaptive_config = restore_config.get('adaptive_concurrency', {})
+            pool_size = parallel_downloads
+            self.concurrency_controller = None
+            if adaptive_config.get('enabled', False):
+                self.concurrency_controller = AdaptiveConcurrencyController.from_config(
+                    'download', adaptive_config, parallel_downloads, self.logger
+                )
+                pool_size = self.concurrency_controller.max_workers
+            
             self.logger.info(f"一時ダウンロード先: {temp_path}")
             self.logger.info(f"同名ファイルスキップ: {skip_existing}")
+            self.logger.info(f"並列ダウンロード数: {parallel_downloads}")
+            if self.concurrency_controller:
+                self.logger.info(f"適応的同時実行数制御: 有効 "
+                                 f"({self.concurrency_controller.min_workers}～{pool_size})")
             
-            successful_downloads = 0
-            failed_downloads = 0
-            skipped_files = 0
+            total_count = len(completed_files)
+            log_config = self.config.get('logging', {})
+            progress = ProgressReporter(
+                self.logger, 'ダウンロード', total_count,
+                log_config.get('progress_every_files', 100), log_config.get('progress_every_seconds', 10)
+            )
             
-            for i, file_info in enumerate(completed_files, 1):
-                bucket = file_info['bucket']
-                key = file_info['key']
-                original_path = file_info['original_file_path']
-                restore_dir = file_info['restore_directory']
-                relative_path = file_info['relative_path']
-                restore_mode = file_info['restore_mode']
-                
-                # 進捗ログ
-                self.logger.info(f"[{i}/{len(completed_files)}] ダウンロード処理中: {original_path}")
-                
-                # 復元先ファイルパスの生成（階層構造保持）
-                if restore_mode == 'directory':
-                    # ディレクトリ復元: 相対パスを使用して階層構造を保持
-                    destination_path = os.path.join(restore_dir, relative_path)
-                else:
-                    # ファイル復元: ファイル名のみ
-                    filename = os.path.basename(original_path)
-                    destination_path = os.path.join(restore_dir, filename)
-                
-                # 配置先ディレクトリの作成（階層構造用）
-                destination_dir = os.path.dirname(destination_path)
-                try:
-                    os.makedirs(destination_dir, exist_ok=True)
-                except Exception as e:
-                    self.logger.error(f"✗ 配置先ディレクトリ作成失敗: {destination_dir} - {e}")
-                    file_info['download_status'] = 'failed'
-                    file_info['download_error'] = f'ディレクトリ作成失敗: {str(e)}'
-                    failed_downloads += 1
-                    continue
-                
-                # 同名ファイルの存在チェック
-                if skip_existing and os.path.exists(destination_path):
-                    self.logger.info(f"同名ファイルが存在するためスキップ: {destination_path}")
-                    file_info['download_status'] = 'skipped'
-                    file_info['download_error'] = '同名ファイルが既に存在します'
-                    file_info['destination_path'] = destination_path
-                    skipped_files += 1
-                    continue
-                
-                # 一時ファイルパスの生成
-                temp_filename = f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.path.basename(original_path)}"
-                temp_file_path = temp_path / temp_filename
-                
-                # S3からダウンロード（リトライ付）
-                download_result = self._download_file_with_retry(
-                    s3_client, bucket, key, str(temp_file_path), retry_count
-                )
-                
-                if not download_result['success']:
-                    self.logger.error(f"✗ ダウンロード失敗: {original_path} - {download_result['error']}")
-                    file_info['download_status'] = 'failed'
-                    file_info['download_error'] = download_result['error']
-                    failed_downloads += 1
-                    continue
-                
-                # ファイルサイズ確認
-                try:
-                    downloaded_size = os.path.getsize(temp_file_path)
-                    file_info['downloaded_size'] = downloaded_size
-                except Exception as e:
-                    self.logger.warning(f"ダウンロードサイズ確認エラー: {e}")
-                
-                # 最終配置（一時ファイル → 復元先）
-                placement_result = self._place_file_to_destination(
-                    str(temp_file_path), destination_path
+            def download_one(index: int, file_info: Dict) -> str:
+                outcome = self._download_single_file(
+                    s3_client, file_info, index, total_count, temp_path, retry_count, skip_existing
                 )
-                
-                if placement_result['success']:
-                    # 成功
-                    file_info['download_status'] = 'completed'
-                    file_info['destination_path'] = destination_path
-                    file_info['download_completed_time'] = datetime.datetime.now().isoformat()
-                    successful_downloads += 1
-                    self.logger.info(f"✓ ダウンロード完了: {original_path} -> {destination_path}")
-                    
-                else:
-                    # 配置失敗
-                    self.logger.error(f"✗ ファイル配置失敗: {original_path} - {placement_result['error']}")
-                    file_info['download_status'] = 'failed'
-                    file_info['download_error'] = f"ファイル配置失敗: {placement_result['error']}"
-                    failed_downloads += 1
-                    
-                # 一時ファイルのクリーンアップ
-                try:
-                    if os.path.exists(temp_file_path):
-                        os.remove(temp_file_path)
-                except Exception as e:
-                    self.logger.debug(f"一時ファイル削除エラー: {e}")
+                progress.update(outcome != 'failed', file_info.get('downloaded_size', 0))
+                return outcome
+            
+            if pool_size == 1:
+                outcomes = [download_one(i, file_info) for i, file_info in enumerate(completed_files, 1)]
+            else:
+                with ThreadPoolExecutor(max_workers=pool_size) as executor:
+                    futures = [
+                        executor.submit(download_one, i, file_info)
+                        for i, file_info in enumerate(completed_files, 1)
+                    ]
+                    outcomes = [future.result() for future in futures]
+            
+            successful_downloads = outcomes.count('completed')
+            skipped_files = outcomes.count('skipped')
+            failed_downloads = outcomes.count('failed')
             
             self.logger.info("ファイルダウンロード・配置完了")
             self.logger.info(f"  - 成功: {successful_downloads}件")
             self.logger.info(f"  - スキップ: {skipped_files}件")
             self.logger.info(f"  - 失敗: {failed_downloads}件")
+            if self.bandwidth_limiter:
+                self.logger.info(f"  - 帯域制御による待機時間: {self.bandwidth_limiter.throttled_seconds:,.1f}秒")
             
             return restore_requests
             
@@ -1021,49 +1092,184 @@ class RestoreProcessor:
             self.logger.error(f"ダウンロード・配置処理でエラーが発生: {str(e)}")
             return restore_requests
 
+    def _download_single_file(self, s3_client, file_info: Dict, index: int, total_count: int,
+                              temp_path: Path, retry_count: int, skip_existing: bool) -> str:
+        """
+        単一ファイルのダウンロード・配置（ワーカースレッド内で実行）
+        
+        Returns:
+            str: download_status（'completed' / 'skipped' / 'failed'）
+        """
+        bucket = file_info['bucket']
+        key = file_info['key']
+        original_path = file_info['original_file_path']
+        restore_dir = file_info['restore_directory']
+        relative_path = file_info['relative_path']
+        restore_mode = file_info['restore_mode']
+        
+        # 進捗ログ
+        self.logger.info(f"[{index}/{total_count}] ダウンロード処理中: {original_path}", extra=DETAIL)
+        
+        # 復元先ファイルパスの生成（階層構造保持）
+        if restore_mode == 'directory':
+            # ディレクトリ復元: 相対パスを使用して階層構造を保持
+            destination_path = os.path.join(restore_dir, relative_path)
+        else:
+            # ファイル復元: ファイル名のみ
+            filename = os.path.basename(original_path)
+            destination_path = os.path.join(restore_dir, filename)
+        
+        # 配置先ディレクトリの作成（階層構造用）
+        destination_dir = os.path.dirname(destination_path)
+        try:
+            with self.host_limiter.slot(destination_dir):
+                os.makedirs(destination_dir, exist_ok=True)
+                destination_exists = os.path.exists(destination_path)
+        except Exception as e:
+            self.logger.error(f"✗ 配置先ディレクトリ作成失敗: {destination_dir} - {e}")
+            file_info['download_status'] = 'failed'
+            file_info['download_error'] = f'ディレクトリ作成失敗: {str(e)}'
+            return 'failed'
+        
+        # 同名ファイルの存在チェック（並列実行時は配置先を予約し、同じ配置先への二重配置を防ぐ）
+        if skip_existing:
+            with self._destination_lock:
+                reserved = destination_path in self._reserved_destinations
+                if not reserved and not destination_exists:
+                    self._reserved_destinations.add(destination_path)
+            if reserved or destination_exists:
+                self.logger.info(f"同名ファイルが存在するためスキップ: {destination_path}", extra=DETAIL)
+                file_info['download_status'] = 'skipped'
+                file_info['download_error'] = ('同名ファイルが同じ実行内で配置中です' if reserved
+                                               else '同名ファイルが既に存在します')
+                file_info['destination_path'] = destination_path
+                return 'skipped'
+        
+        # 一時ファイルパスの生成（並列実行時の同名衝突を避けるため連番を付与）
+        temp_filename = f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{index:06d}_{os.path.basename(original_path)}"
+        temp_file_path = temp_path / temp_filename
+        
+        try:
+            # S3からダウンロード（リトライ付）
+            controller = self.concurrency_controller
+            if controller:
+                controller.acquire()
+            try:
+                with self.metrics.active('download'):
+                    started = time.monotonic()
+                    download_result = self._download_file_with_retry(
+                        s3_client, bucket, key, str(temp_file_path), retry_count
+                    )
+                latency = time.monotonic() - started
+                self.metrics.record('download', latency, download_result.get('file_size', 0),
+                                    error=not download_result['success'])
+                if controller and download_result['success']:
+                    controller.record_success(download_result.get('file_size', 0), download_result['latency'])
+            finally:
+                if controller:
+                    controller.release()
+            file_info['download_retries'] = download_result.get('retry_count', 0)
+            
+            if not download_result['success']:
+                self.logger.error(f"✗ ダウンロード失敗: {original_path} - {download_result['error']}")
+                file_info['download_status'] = 'failed'
+                file_info['download_error'] = download_result['error']
+                return 'failed'
+            
+            # ファイルサイズ確認
+            try:
+                downloaded_size = os.path.getsize(temp_file_path)
+                file_info['downloaded_size'] = downloaded_size
+            except Exception as e:
+                self.logger.warning(f"ダウンロードサイズ確認エラー: {e}")
+            
+            # 最終配置（一時ファイル → 復元先、ファイルサーバ毎の同時アクセス数制限付き）
+            with self.host_limiter.slot(destination_path):
+                place_started = time.perf_counter()
+                placement_result = self._place_file_to_destination(
+                    str(temp_file_path), destination_path
+                )
+                self.metrics.record('place', time.perf_counter() - place_started,
+                                    error=not placement_result['success'])
+            
+            if placement_result['success']:
+                # 成功
+                file_info['download_status'] = 'completed'
+                file_info['destination_path'] = destination_path
+                file_info['download_completed_time'] = datetime.datetime.now().isoformat()
+                self.logger.info(f"✓ ダウンロード完了: {original_path} -> {destination_path}", extra=DETAIL)
+                return 'completed'
+            
+            # 配置失敗
+            self.logger.error(f"✗ ファイル配置失敗: {original_path} - {placement_result['error']}")
+            file_info['download_status'] = 'failed'
+            file_info['download_error'] = f"ファイル配置失敗: {placement_result['error']}"
+            return 'failed'
+            
+        except Exception as e:
+            self.logger.error(f"✗ ダウンロード処理エラー: {original_path} - {str(e)}")
+            file_info['download_status'] = 'failed'
+            file_info['download_error'] = f'予期しないエラー: {str(e)}'
+            return 'failed'
+            
+        finally:
+            # 配置できなかった場合は予約を解除（後続の同名ファイルの配置を妨げない）
+            if skip_existing and file_info.get('download_status') != 'completed':
+                with self._destination_lock:
+                    self._reserved_destinations.discard(destination_path)
+            # 一時ファイルのクリーンアップ
+            try:
+                if os.path.exists(temp_file_path):
+                    os.remove(temp_file_path)
+            except Exception as e:
+                self.logger.debug(f"一時ファイル削除エラー: {e}")
+
     def _download_file_with_retry(self, s3_client, bucket: str, key: str, 
                                  local_path: str, max_retries: int) -> Dict:
-        """S3からファイルダウンロード（リトライ付）"""
+        """
+        S3からファイルダウンロード（共通リトライポリシーによる再試行）
         
-        for attempt in range(max_retries):
+        成功時の latency は同時実行数制御用の所要時間（成功した試行のみ、帯域制御で待機した場合は None）
+        """
+        throttle = None
+        
+        def download():
+            nonlocal throttle
             try:
-                self.logger.debug(f"ダウンロード試行 {attempt + 1}/{max_retries}: s3://{bucket}/{key}")
-                
-                # S3からダウンロード
-                s3_client.download_file(bucket, key, local_path)
+                self.metrics.increment('s3_download_file_calls')
+                throttle = self.bandwidth_limiter.tracker() if self.bandwidth_limiter else None
+                s3_client.download_file(
+                    bucket, key, local_path,
+                    Callback=throttle
+                )
                 
                 # ダウンロード成功確認（0バイトファイルも成功として扱う）
-                if os.path.exists(local_path):
-                    file_size = os.path.getsize(local_path)
-                    return {'success': True, 'error': None, 'file_size': file_size}
-                else:
+                if not os.path.exists(local_path):
                     raise Exception("ダウンロード後にファイルが作成されませんでした")
-                    
-            except Exception as e:
-                error_msg = str(e)
-                
-                # 特定のエラーはリトライしない
-                if any(err in error_msg for err in ['NoSuchKey', 'AccessDenied', 'InvalidObjectState']):
-                    return {'success': False, 'error': error_msg}
-                
-                # 最後の試行でも失敗した場合
-                if attempt == max_retries - 1:
-                    return {'success': False, 'error': f'最大リトライ回数到達: {error_msg}'}
-                
-                # リトライ可能なエラーの場合は次の試行へ
-                self.logger.warning(f"ダウンロード失敗 (試行 {attempt + 1}/{max_retries}): {error_msg}")
-                
+                return os.path.getsize(local_path)
+            except Exception:
                 # 失敗した一時ファイルがあれば削除
                 try:
                     if os.path.exists(local_path):
                         os.remove(local_path)
                 except Exception:
                     pass
-                
-                # 少し待機してからリトライ
-                time.sleep(2 ** attempt)  # 指数バックオフ
-        
-        return {'success': False, 'error': '不明なエラー'}
+                raise
+        
+        outcome = self.retry_policy.call(download, 'download', key, max_attempts=max_retries,
+                                         on_error=self._record_transfer_error)
+        if outcome['success']:
+            latency = None if throttle and throttle.waited_seconds > 0 else outcome['attempt_seconds']
+            return {'success': True, 'error': None, 'file_size': outcome['result'],
+                    'retry_count': outcome['retries'], 'latency': latency}
+        return {'success': False, 'error': RetryPolicy.failure_message(outcome),
+                'retry_count': outcome['retries']}
+    
+    def _record_transfer_error(self, error: Exception) -> None:
+        """転送エラーの計上（混雑シグナル（SlowDown等）は同時実行数制御へ通知）"""
+        self.metrics.count_error(error)
+        if self.concurrency_controller:
+            self.concurrency_controller.record_error(error)
 
     def _place_file_to_destination(self, temp_path: str, destination_path: str) -> Dict:
         """一時ファイルを最終配置先に移動"""
@@ -1080,6 +1286,8 @@ class RestoreProcessor:
             
             # ファイル移動
             import shutil
+            if self.fault_injector:
+                self.fault_injector.inject('fs_place', destination_path)
             shutil.move(temp_path, destination_path)
             
             # 移動成功確認
@@ -1260,6 +1468,12 @@ class RestoreProcessor:
         self.logger.info(f"復元リクエスト送信数: {self.stats['restore_requested']}")
         self.logger.info(f"復元完了数: {self.stats['restore_completed']}")
         self.logger.info(f"失敗数: {self.stats['failed_files']}")
+        self.metrics.log_summary()
+        retry_summary = self.retry_policy.summary()
+        self.logger.info(f"リトライ: {retry_summary['retries']}回 (対象 {retry_summary['retried_calls']}件, "
+                         f"予算超過 {retry_summary['budget_exhausted']}回)")
+        if self.fault_injector:
+            self.fault_injector.log_summary()
 
     def run(self, csv_path: str, request_id: str, mode: str = 'request') -> int:
         """
@@ -1274,17 +1488,26 @@ class RestoreProcessor:
         """
         self.stats['start_time'] = datetime.datetime.now()
         self.request_id = request_id
+        self.metrics.run_type = f"restore_{mode}"
+        exit_code = 1
+        exporter = PrometheusTextfileExporter.from_config(
+            self.config.get('metrics', {}).get('prometheus_textfile', {}),
+            self.metrics, 'restore', 'download' if mode == 'download' else 'restore_object',
+            {'request_id': request_id, 'mode': mode}, f"{request_id}_{mode}", self.logger
+        )
+        if exporter:
+            exporter.start()
         
         try:
             self.logger.info(f"復元処理開始 - Request ID: {request_id}, Mode: {mode}")
             
             if mode == 'request':
-                return self._run_restore_request(csv_path)
+                exit_code = self._run_restore_request(csv_path)
             elif mode == 'download':
-                return self._run_download_files(csv_path)
+                exit_code = self._run_download_files(csv_path)
             else:
                 self.logger.error(f"無効なモード: {mode}")
-                return 1
+            return exit_code
                 
         except Exception as e:
             self.logger.error(f"復元処理中にエラーが発生しました: {str(e)}")
@@ -1293,25 +1516,66 @@ class RestoreProcessor:
         finally:
             self.stats['end_time'] = datetime.datetime.now()
             self.print_statistics()
+            self.write_run_report(mode, exit_code)
+            if exporter:
+                exporter.stop(exit_code)
+    
+    def write_run_report(self, mode: str, exit_code: int) -> None:
+        """実行レポート（JSON）の出力"""
+        log_config = self.config.get('logging', {})
+        if not log_config.get('metrics_report', True):
+            return
+        
+        report_path = RunMetrics.report_path_for(
+            self.log_file, log_config.get('log_directory', 'logs'), 'restore'
+        )
+        self.metrics.write_report(report_path, {
+            'request_id': self.request_id,
+            'mode': mode,
+            'exit_code': exit_code,
+            'stats': self.stats,
+            'tiers': self._summarize_tiers(self.restore_requests),
+            'retry': self.retry_policy.summary(),
+            'fault_injection': self.fault_injector.summary() if self.fault_injector else None,
+        })
+    
+    def _summarize_tiers(self, restore_requests: List[Dict]) -> Dict:
+        """復元ティア別のファイル数・サイズ・ステータス内訳"""
+        tiers = {}
+        for request in restore_requests:
+            for file_info in request.get('files_found', []):
+                tier = file_info.get('restore_tier') or 'unknown'
+                summary = tiers.setdefault(tier, {'files': 0, 'bytes': 0, 'restore_status': {}, 'download_status': {}})
+                summary['files'] += 1
+                summary['bytes'] += file_info.get('file_size') or 0
+                restore_status = file_info.get('restore_status', 'unknown')
+                summary['restore_status'][restore_status] = summary['restore_status'].get(restore_status, 0) + 1
+                download_status = file_info.get('download_status')
+                if download_status:
+                    summary['download_status'][download_status] = summary['download_status'].get(download_status, 0) + 1
+        return tiers
     
     def _run_restore_request(self, csv_path: str) -> int:
         """復元リクエスト送信処理"""
         self.logger.info("=== 復元リクエスト送信モード ===")
         
         # 1. CSV読み込み・検証
-        restore_requests, csv_errors = self.validate_csv_input(csv_path)
-        
-        # CSV検証エラー処理
-        if csv_errors:
-            error_csv_path = self.generate_restore_error_csv(csv_path)
-            self.logger.warning(f"CSV検証エラーが発生しました: {error_csv_path}")
+        with self.metrics.stage('csv_validation'):
+            restore_requests, csv_errors = self.validate_csv_input(csv_path)
+            
+            # CSV検証エラー処理
+            if csv_errors:
+                error_csv_path = self.generate_restore_error_csv(csv_path)
+                self.logger.warning(f"CSV検証エラーが発生しました: {error_csv_path}")
         
         if not restore_requests:
             self.logger.error("有効な復元依頼が見つかりません")
             return 1
         
         # 2. データベースからファイル検索
-        restore_requests = self.lookup_files_from_database(restore_requests)
+        with self.metrics.stage('db_lookup'):
+            restore_requests = self.lookup_files_from_database(restore_requests)
+        self.restore_requests = restore_requests
         
         # ファイルが見つからない依頼をフィルタリング
         valid_restore_requests = [req for req in restore_requests if req.get('total_files_found', 0) > 0]
@@ -1327,10 +1591,13 @@ class RestoreProcessor:
             return 1
         
         # 3. S3復元リクエスト送信
-        restore_requests = self.request_restore(valid_restore_requests + failed_requests)
+        with self.metrics.stage('restore_request'):
+            restore_requests = self.request_restore(valid_restore_requests + failed_requests)
+        self.restore_requests = restore_requests
         
         # 4. ステータスファイル保存
-        self._save_restore_status(restore_requests)
+        with self.metrics.stage('save_status'):
+            self._save_restore_status(restore_requests)
         
         self.logger.info(f"復元リクエスト送信完了 - {self.stats['restore_requested']}件")
         if failed_requests:
@@ -1345,7 +1612,9 @@ class RestoreProcessor:
         self.logger.info("=== ダウンロード実行モード ===")
         
         # 1. ステータスファイル読み込み
-        restore_requests = self._load_restore_status()
+        with self.metrics.stage('load_status'):
+            restore_requests = self._load_restore_status()
+        self.restore_requests = restore_requests
         if not restore_requests:
             self.logger.error("復元ステータスファイルが見つかりません")
             self.logger.error("先に復元リクエスト送信を実行してください")
@@ -1357,7 +1626,8 @@ class RestoreProcessor:
         
         # 2. 復元完了確認（最新ステータス取得）
         self.logger.info("復元ステータスを確認しています...")
-        restore_requests = self.check_restore_completion(restore_requests)
+        with self.metrics.stage('restore_check'):
+            restore_requests = self.check_restore_completion(restore_requests)
         
         # 3. 復元完了ファイルの確認
         completed_files = []
@@ -1382,13 +1652,16 @@ class RestoreProcessor:
         self.logger.info(f"復元完了ファイル: {len(completed_files)}件をダウンロードします")
         
         # 4. ファイルダウンロード・配置
-        restore_requests = self.download_and_place_files(restore_requests)
+        with self.metrics.stage('download'):
+            restore_requests = self.download_and_place_files(restore_requests)
         
         # 5. ステータスファイル更新
-        self._save_restore_status(restore_requests)
+        with self.metrics.stage('save_status'):
+            self._save_restore_status(restore_requests)
         
         # 6. 失敗ファイル用リトライCSV生成
-        retry_csv_path = self.generate_failed_files_retry_csv(restore_requests, csv_path)
+        with self.metrics.stage('error_report'):
+            retry_csv_path = self.generate_failed_files_retry_csv(restore_requests, csv_path)
         if retry_csv_path:
             self.logger.warning(f"失敗ファイルがあります。リトライCSV: {retry_csv_path}")
         
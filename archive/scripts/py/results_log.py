@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+処理結果の追記型ファイル（SQLite）
+- ファイルごとの最終結果（アップロード失敗 / 削除完了 / 削除失敗）が確定した時点で追記
+- status・directory にインデックスを作成し、DB登録・ディレクトリリネーム・エラーCSV生成は
+  メモリ上の結果リストを走査せずにこのファイルを検索する
+- 出力先はログファイルと同名の .results.db（実行後の調査用に保持、keep=false で削除）
+
+FileRecordStore と同じ集計・絞り込みメソッド（completed / failed / directory_counts 等）を持つため、
+後処理ステージはどちらを渡されても同じように動作する。
+"""
+
+import datetime
+import logging
+import sqlite3
+import threading
+from collections import namedtuple
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+# 検索結果の1行（FileRecord と同じ属性名で参照できる）
+ResultRow = namedtuple('ResultRow', ['path', 'directory', 'size', 'success', 'archive_completed',
+                                     's3_key', 'error', 'retry_count', 'mtime', 'checksum', 'skipped'])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    path TEXT NOT NULL,
+    directory TEXT,
+    size INTEGER NOT NULL,
+    status TEXT NOT NULL,  -- completed / failed / skipped（アーカイブ済みのため処理せず）
+    archive_completed INTEGER NOT NULL,
+    s3_key TEXT,
+    error TEXT,
+    retry_count INTEGER NOT NULL DEFAULT 0,
+    mtime REAL,
+    checksum TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_results_status ON results (status);
+CREATE INDEX IF NOT EXISTS idx_results_directory ON results (directory);
+"""
+
+SELECT_COLUMNS = ("path, directory, size, status = 'completed', archive_completed, "
+                  "s3_key, error, retry_count, mtime, checksum, status = 'skipped'")
+
+
+class ResultsLog:
+    """処理結果の追記・検索クラス（追記はスレッドセーフ）"""
+
+    def __init__(self, path: Path, batch_size: int = 1000, keep: bool = True,
+                 logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            path: 結果ファイルのパス
+            batch_size: まとめて書き込む件数
+            keep: 実行終了後も結果ファイルを残すか
+            logger: ログ出力先
+        """
+        self.path = Path(path)
+        self.batch_size = max(1, batch_size)
+        self.keep = keep
+        self.logger = logger or logging.getLogger(__name__)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._buffer = []
+
+    @classmethod
+    def from_config(cls, config: Dict, log_file: Optional[Path], log_directory: str,
+                    logger: Optional[logging.Logger] = None) -> Optional['ResultsLog']:
+        """設定辞書（results_logセクション）から生成（無効時はNone）"""
+        if not config.get('enabled', True):
+            return None
+        if log_file:
+            base = Path(log_file).with_suffix('')
+        else:
+            timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+            base = Path(log_directory) / f"archive_{timestamp}"
+        # 同じ秒に開始した別の実行の結果ファイルには追記しない
+        path = Path(f"{base}.results.db")
+        sequence = 1
+        while path.exists():
+            path = Path(f"{base}_{sequence}.results.db")
+            sequence += 1
+        results_log = cls(path, config.get('batch_size', 1000), config.get('keep', True), logger)
+        results_log.logger.info(f"処理結果ファイル: {path}")
+        return results_log
+
+    def append(self, record) -> None:
+        """最終結果の追記（FileRecord）"""
+        row = (
+            record.path, record.directory, record.size,
+            'completed' if record.success else ('skipped' if record.skipped else 'failed'),
+            1 if record.archive_completed else 0,
+            record.s3_key, record.error, record.retry_count or 0,
+            record.mtime, record.checksum
+        )
+        with self._lock:
+            self._buffer.append(row)
+            if len(self._buffer) >= self.batch_size:
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._buffer:
+            return
+        with self._conn:
+            self._conn.executemany("INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self._buffer)
+        self._buffer = []
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def _scalar(self, sql: str, params=()) -> int:
+        self.flush()
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()[0] or 0
+
+    def _rows(self, where: str, fetch_size: int = 10000) -> Iterator[ResultRow]:
+        """条件に一致する行を順次取得（全件をメモリに載せない）"""
+        self.flush()
+        cursor = self._conn.execute(f"SELECT {SELECT_COLUMNS} FROM results WHERE {where} ORDER BY rowid")
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield ResultRow(*row)
+
+    # FileRecordStore と共通の集計・絞り込み
+    def __len__(self) -> int:
+        return self._scalar("SELECT COUNT(*) FROM results")
+
+    def total_size(self) -> int:
+        return self._scalar("SELECT SUM(size) FROM results")
+
+    def count_successful(self) -> int:
+        return self._scalar("SELECT COUNT(*) FROM results WHERE status = 'completed'")
+
+    def count_failed(self) -> int:
+        return self._scalar("SELECT COUNT(*) FROM results WHERE status = 'failed'")
+
+    def count_skipped(self) -> int:
+        return self._scalar("SELECT COUNT(*) FROM results WHERE status = 'skipped'")
+
+    def count_completed(self) -> int:
+        return self._scalar("SELECT COUNT(*) FROM results WHERE status = 'completed' AND archive_completed = 1")
+
+    def completed(self) -> Iterator[ResultRow]:
+        return self._rows("status = 'completed' AND archive_completed = 1")
+
+    def failed(self) -> Iterator[ResultRow]:
+        return self._rows("status = 'failed'")
+
+    def directory_counts(self) -> Dict[str, int]:
+        """処理対象ディレクトリごとのファイル数"""
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute("SELECT directory, COUNT(*) FROM results GROUP BY directory").fetchall()
+        return dict(rows)
+
+    def failed_directories(self) -> List[str]:
+        """失敗ファイルを含むディレクトリ（重複除去・昇順）"""
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT directory FROM results "
+                "WHERE status = 'failed' AND directory IS NOT NULL ORDER BY directory"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def error_counts(self) -> Dict[str, int]:
+        """エラー理由ごとの失敗ファイル数"""
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT COALESCE(error, '不明なエラー'), COUNT(*) FROM results "
+                "WHERE status = 'failed' GROUP BY 1 ORDER BY 2 DESC"
+            ).fetchall()
+        return dict(rows)
+
+    def close(self) -> None:
+        """書き込み残りを反映して閉じる（keep=false の場合はファイルを削除）"""
+        try:
+            self.flush()
+        finally:
+            self._conn.close()
+        if not self.keep:
+            for suffix in ('', '-wal', '-shm'):
+                Path(f"{self.path}{suffix}").unlink(missing_ok=True)
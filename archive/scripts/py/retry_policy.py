@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+アーカイブ・復元共通のリトライポリシー
+- エラー分類（throttle / timeout / transient / fatal）に基づきリトライ可否を判定
+- フルジッター付き指数バックオフ（待機時間を 0～上限 の一様乱数にして、
+  スロットリング発生時に全ワーカーが同じタイミングで再送しないようにする）
+- 実行全体のリトライ予算（初回呼び出し数に対する比率 + 最低保証回数）を超えたら再試行しない
+- ファイル単位のリトライ回数を結果に記録
+
+botocore側のリトライ（retries.total_max_attempts）と重ならないよう、
+S3クライアントは retry.sdk_max_attempts（デフォルト1: SDKでは再試行しない）で初期化する。
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from concurrency_control import classify_transfer_error
+
+# リトライしても解消しないエラー（S3エラーコード等）
+FATAL_ERROR_MARKERS = [
+    'NoSuchKey', 'NoSuchBucket', 'AccessDenied', 'InvalidObjectState', 'InvalidAccessKeyId',
+    'SignatureDoesNotMatch', 'RestoreAlreadyInProgress', '(404)', '(403)'
+]
+
+# ログ出力用の処理名
+OPERATION_LABELS = {
+    'upload': 'アップロード',
+    'download': 'ダウンロード',
+    'restore_object': '復元リクエスト',
+    'head_object': 'メタデータ取得',
+    'head_bucket': 'バケット接続確認',
+    'list_objects': 'オブジェクト一覧取得',
+}
+
+
+def classify_error(error) -> str:
+    """
+    リトライ判定用のエラー分類
+
+    Returns:
+        str: 'throttle' / 'timeout' / 'fatal' / 'transient'
+    """
+    if isinstance(error, (FileNotFoundError, PermissionError, IsADirectoryError)):
+        return 'fatal'
+    signal = classify_transfer_error(error)
+    if signal:
+        return signal
+    message = str(error)
+    if any(marker in message for marker in FATAL_ERROR_MARKERS):
+        return 'fatal'
+    return 'transient'
+
+
+class RetryPolicy:
+    """分類・フルジッターバックオフ・リトライ予算によるリトライ制御クラス（スレッドセーフ）"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 1.0, max_delay: float = 30.0,
+                 throttle_delay_factor: float = 2.0, budget_ratio: float = 0.2,
+                 budget_min_retries: int = 20, metrics=None,
+                 logger: Optional[logging.Logger] = None, seed: Optional[int] = None):
+        """
+        Args:
+            max_attempts: 1回の呼び出しあたりの最大試行回数（初回を含む）
+            base_delay: バックオフの基準秒数（上限 = base_delay * 2^(試行回数-1)）
+            max_delay: バックオフ上限の最大秒数
+            throttle_delay_factor: スロットリング時にバックオフ上限へ掛ける倍率
+            budget_ratio: リトライ予算（初回呼び出し数に対する比率）
+            budget_min_retries: リトライ予算の最低保証回数（実行開始直後の少数呼び出し用）
+            metrics: RunMetrics（リトライ回数・予算超過の記録先）
+            logger: ログ出力先
+            seed: 乱数シード（再現用）
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.throttle_delay_factor = throttle_delay_factor
+        self.budget_ratio = budget_ratio
+        self.budget_min_retries = budget_min_retries
+        self.metrics = metrics
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0  # 初回呼び出し数
+        self.retries = 0  # 実行全体のリトライ回数
+        self.retried_calls = 0  # 1回以上リトライした呼び出し数
+        self.max_retries_per_call = 0
+        self.budget_exhausted = 0  # 予算超過で再試行しなかった回数
+        self._budget_warned = False
+
+    @classmethod
+    def from_config(cls, config: Dict, max_attempts: int = 3, metrics=None,
+                    logger: Optional[logging.Logger] = None) -> 'RetryPolicy':
+        """設定辞書（retryセクション）から生成"""
+        return cls(
+            max_attempts=max_attempts,
+            base_delay=config.get('base_delay', 1.0),
+            max_delay=config.get('max_delay', 30.0),
+            throttle_delay_factor=config.get('throttle_delay_factor', 2.0),
+            budget_ratio=config.get('budget_ratio', 0.2),
+            budget_min_retries=config.get('budget_min_retries', 20),
+            metrics=metrics,
+            logger=logger
+        )
+
+    def backoff(self, attempt: int, error_class: str) -> float:
+        """フルジッター付きバックオフ秒数（attempt: 失敗した試行の番号、1始まり）"""
+        cap = self.base_delay * (2 ** (attempt - 1))
+        if error_class == 'throttle':
+            cap *= self.throttle_delay_factor
+        cap = min(self.max_delay, cap)
+        with self._lock:
+            return self._rng.uniform(0, cap)
+
+    def _acquire_retry(self) -> bool:
+        """リトライ予算から1回分を確保"""
+        with self._lock:
+            allowed = self.budget_min_retries + self.budget_ratio * self.calls
+            if self.retries >= allowed:
+                self.budget_exhausted += 1
+                warn = not self._budget_warned
+                self._budget_warned = True
+            else:
+                self.retries += 1
+                return True
+        if self.metrics:
+            self.metrics.increment('retry_budget_exhausted')
+        if warn:
+            self.logger.warning(f"リトライ予算を使い切りました（リトライ {self.retries}回 / 呼び出し {self.calls}回）。"
+                                f"以降は予算が回復するまで再試行しません")
+        return False
+
+    def call(self, func: Callable, operation: str, target: str = '', max_attempts: Optional[int] = None,
+             on_error: Optional[Callable] = None) -> Dict:
+        """
+        リトライ付き呼び出し
+
+        Args:
+            func: 呼び出す処理（引数なし）
+            operation: 処理名（upload / download / restore_object / head_object 等、
+                       リトライ回数は metrics の {operation}_retries に加算）
+            target: 対象（ログ出力用のファイルパス・S3キー）
+            max_attempts: 最大試行回数（省略時はポリシーの値）
+            on_error: 失敗した試行ごとに例外を渡して呼び出す処理（エラー計上・混雑シグナル通知等）
+
+        Returns:
+            Dict: success, result, error（メッセージ）, exception, error_class,
+                  reason（fatal / exhausted / budget）, attempts, retries,
+                  attempt_seconds（最後の試行の所要時間、バックオフの待機を含まない）
+        """
+        attempts = max(1, max_attempts or self.max_attempts)
+        label = OPERATION_LABELS.get(operation, operation)
+        with self._lock:
+            self.calls += 1
+
+        attempt = 0
+        while True:
+            attempt += 1
+            attempt_started = time.monotonic()
+            try:
+                result = func()
+                self._record_call(attempt - 1)
+                return {'success': True, 'result': result, 'error': None, 'exception': None,
+                        'error_class': None, 'reason': None, 'attempts': attempt, 'retries': attempt - 1,
+                        'attempt_seconds': time.monotonic() - attempt_started}
+            except Exception as e:
+                attempt_seconds = time.monotonic() - attempt_started
+                error_class = classify_error(e)
+                if on_error:
+                    on_error(e)
+
+                if error_class == 'fatal':
+                    reason = 'fatal'
+                elif attempt >= attempts:
+                    reason = 'exhausted'
+                elif not self._acquire_retry():
+                    reason = 'budget'
+                else:
+                    reason = None
+
+                if reason:
+                    self._record_call(attempt - 1)
+                    return {'success': False, 'result': None, 'error': str(e), 'exception': e,
+                            'error_class': error_class, 'reason': reason,
+                            'attempts': attempt, 'retries': attempt - 1, 'attempt_seconds': attempt_seconds}
+
+                delay = self.backoff(attempt, error_class)
+                if self.metrics:
+                    self.metrics.increment(f"{operation}_retries")
+                self.logger.warning(f"{label}失敗 (試行 {attempt}/{attempts}, {error_class}): {e} "
+                                    f"- {delay:.1f}秒後に再試行 {target}")
+                time.sleep(delay)
+
+    def _record_call(self, retries: int) -> None:
+        """呼び出し単位のリトライ回数の集計"""
+        if not retries:
+            return
+        with self._lock:
+            self.retried_calls += 1
+            self.max_retries_per_call = max(self.max_retries_per_call, retries)
+
+    @staticmethod
+    def failure_message(outcome: Dict) -> str:
+        """失敗結果のエラーメッセージ（リトライ打ち切り理由付き）"""
+        if outcome['reason'] == 'exhausted' and outcome['attempts'] > 1:
+            return f"最大リトライ回数到達: {outcome['error']}"
+        if outcome['reason'] == 'budget':
+            return f"リトライ予算超過: {outcome['error']}"
+        return outcome['error']
+
+    def summary(self) -> Dict:
+        """実行レポート用の集計"""
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'retries': self.retries,
+                'retried_calls': self.retried_calls,
+                'max_retries_per_call': self.max_retries_per_call,
+                'budget_exhausted': self.budget_exhausted,
+            }
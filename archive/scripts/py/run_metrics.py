@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+処理時間計測・実行レポート出力
+- 処理ステージ（CSV検証、ファイル収集、アップロード等）ごとの所要時間
+- ファイル単位の処理（stat、PUT、削除、DB登録等）のレイテンシ（p50/p95/p99）と転送速度
+  （レイテンシは件数・合計・最大値と対数バケットのヒストグラムで保持し、ファイル数に比例してメモリを使わない）
+- API呼び出し回数等のカウンター
+- 実行結果をJSONレポートとしてログファイルと同じディレクトリに出力
+"""
+
+import datetime
+import json
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from concurrency_control import classify_transfer_error
+
+
+def percentile(sorted_values: List[float], ratio: float) -> float:
+    """ソート済みリストのパーセンタイル値（nearest-rank法）"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(ratio * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class LatencyHistogram:
+    """
+    処理時間の対数バケットヒストグラム（固定サイズ）
+
+    1マイクロ秒～約38時間を 1 バケットあたり約 9%（2^(1/8) 倍）の幅で区切る。
+    パーセンタイルはバケットの上端（最大値で頭打ち）を返すため、誤差は最大で約 9%。
+    """
+
+    MIN_SECONDS = 1e-6
+    BUCKETS_PER_DOUBLING = 8
+    BUCKET_COUNT = 37 * BUCKETS_PER_DOUBLING
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * self.BUCKET_COUNT
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if seconds <= self.MIN_SECONDS:
+            index = 0
+        else:
+            index = min(self.BUCKET_COUNT - 1,
+                        math.ceil(math.log2(seconds / self.MIN_SECONDS) * self.BUCKETS_PER_DOUBLING))
+        self.buckets[index] += 1
+
+    def percentile(self, ratio: float) -> float:
+        """パーセンタイル値（nearest-rank法、該当バケットの上端）"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(ratio * self.count))
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= rank:
+                return min(self.max, self.MIN_SECONDS * 2 ** (index / self.BUCKETS_PER_DOUBLING))
+        return self.max
+
+
+class RunMetrics:
+    """1回の実行分の計測値を保持するクラス（スレッドセーフ）"""
+
+    def __init__(self, run_type: str, logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            run_type: 実行種別（archive / restore_request / restore_download 等）
+            logger: ログ出力先
+        """
+        self.run_type = run_type
+        self.logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self.stages = {}  # ステージ名 -> {'seconds', 'count'}（実行順を保持）
+        self.operations = {}  # 処理名 -> {'latencies'（LatencyHistogram）, 'bytes', 'errors'}
+        self.counters = {}  # カウンター名 -> 値
+        self.errors = {}  # エラー分類 -> 件数
+        self.gauges = {}  # ゲージ名 -> 現在値（処理待ちファイル数等）
+        self.in_flight = {}  # 処理名 -> 実行中の件数
+        self.attributes = {}  # レポートに含める付加情報
+        self.started_at = datetime.datetime.now()
+        self._started = time.monotonic()
+
+    @contextmanager
+    def stage(self, name: str):
+        """処理ステージの所要時間を計測"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                stage = self.stages.setdefault(name, {'seconds': 0.0, 'count': 0})
+                stage['seconds'] += elapsed
+                stage['count'] += 1
+
+    @contextmanager
+    def timer(self, operation: str, size_bytes: int = 0):
+        """ファイル単位の処理時間を計測（例外発生時はエラーとして記録）"""
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.record(operation, time.perf_counter() - started, 0, error=True)
+            raise
+        self.record(operation, time.perf_counter() - started, size_bytes)
+
+    def record(self, operation: str, seconds: float, size_bytes: int = 0, error: bool = False) -> None:
+        """処理時間の記録"""
+        with self._lock:
+            op = self.operations.get(operation)
+            if op is None:
+                op = self.operations[operation] = {'latencies': LatencyHistogram(), 'bytes': 0, 'errors': 0}
+            op['latencies'].add(seconds)
+            op['bytes'] += size_bytes
+            if error:
+                op['errors'] += 1
+
+    def increment(self, counter: str, amount: int = 1) -> None:
+        """カウンターの加算"""
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def count_error(self, error) -> None:
+        """エラー分類別の件数を加算（throttle / timeout / 例外クラス名）"""
+        error_class = classify_transfer_error(error) or type(error).__name__
+        with self._lock:
+            self.errors[error_class] = self.errors.get(error_class, 0) + 1
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """ゲージ値の設定"""
+        with self._lock:
+            self.gauges[name] = value
+
+    @contextmanager
+    def active(self, operation: str):
+        """実行中の件数を計上（メトリクス出力の in-flight ワーカー数に使用）"""
+        with self._lock:
+            self.in_flight[operation] = self.in_flight.get(operation, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight[operation] -= 1
+
+    def snapshot(self) -> Dict:
+        """現在の累積値（定期出力用、パーセンタイル計算なし）"""
+        with self._lock:
+            return {
+                'operations': {name: {'count': op['latencies'].count, 'errors': op['errors'], 'bytes': op['bytes']}
+                               for name, op in self.operations.items()},
+                'counters': dict(self.counters),
+                'errors': dict(self.errors),
+                'gauges': dict(self.gauges),
+                'in_flight': dict(self.in_flight),
+            }
+
+    def set_attribute(self, key: str, value) -> None:
+        """レポートへの付加情報の設定"""
+        with self._lock:
+            self.attributes[key] = value
+
+    def _summarize_operation(self, op: Dict) -> Dict:
+        """処理単位の集計"""
+        latencies = op['latencies']
+        total_seconds = latencies.total
+        summary = {
+            'count': latencies.count,
+            'errors': op['errors'],
+            'total_seconds': round(total_seconds, 6),
+            'p50_seconds': round(latencies.percentile(0.50), 6),
+            'p95_seconds': round(latencies.percentile(0.95), 6),
+            'p99_seconds': round(latencies.percentile(0.99), 6),
+            'max_seconds': round(latencies.max, 6),
+        }
+        if op['bytes']:
+            summary['bytes'] = op['bytes']
+            # 1処理あたりの所要時間の合計に対する速度（並列時は実効値より低くなる）
+            summary['bytes_per_sec'] = round(op['bytes'] / total_seconds, 1) if total_seconds > 0 else None
+        return summary
+
+    def summary(self) -> Dict:
+        """レポート用の集計結果"""
+        elapsed = time.monotonic() - self._started
+        with self._lock:
+            operations = {name: self._summarize_operation(op) for name, op in self.operations.items()}
+            stages = {name: {'seconds': round(stage['seconds'], 6), 'count': stage['count']}
+                      for name, stage in self.stages.items()}
+            return {
+                'run_type': self.run_type,
+                'started_at': self.started_at.isoformat(timespec='seconds'),
+                'finished_at': datetime.datetime.now().isoformat(timespec='seconds'),
+                'elapsed_seconds': round(elapsed, 3),
+                'stages': stages,
+                'operations': operations,
+                'counters': dict(self.counters),
+                'errors': dict(self.errors),
+                **self.attributes,
+            }
+
+    @staticmethod
+    def report_path_for(log_file: Optional[Path], log_directory: str, prefix: str) -> Path:
+        """レポート出力先（ログファイルと同名の .metrics.json）"""
+        if log_file:
+            return Path(log_file).with_suffix('.metrics.json')
+        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        return Path(log_directory) / f"{prefix}_{timestamp}.metrics.json"
+
+    def write_report(self, report_path: Path, extra: Optional[Dict] = None) -> Optional[Path]:
+        """JSONレポートの出力"""
+        try:
+            report = self.summary()
+            if extra:
+                report.update(extra)
+            report_path = Path(report_path)
+            report_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(report_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+            self.logger.info(f"実行レポート出力: {report_path}")
+            return report_path
+        except Exception as e:
+            self.logger.warning(f"実行レポート出力エラー: {e}")
+            return None
+
+    def log_summary(self) -> None:
+        """ステージ別所要時間と主要処理のレイテンシをログ出力"""
+        report = self.summary()
+        self.logger.info("=== ステージ別所要時間 ===")
+        for name, stage in report['stages'].items():
+            self.logger.info(f"  {name}: {stage['seconds']:.3f}秒")
+        for name, op in report['operations'].items():
+            throughput = f", {op['bytes_per_sec'] / 1048576:.2f} MB/s" if op.get('bytes_per_sec') else ""
+            self.logger.info(f"  [{name}] {op['count']}件 p50={op['p50_seconds']:.3f}s "
+                             f"p95={op['p95_seconds']:.3f}s p99={op['p99_seconds']:.3f}s"
+                             f" エラー={op['errors']}{throughput}")
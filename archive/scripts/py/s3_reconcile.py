@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+S3バケットと archive_history の突合
+- バケットをプレフィックス単位に分割し、list_objects_v2 のページングを複数スレッドで並列実行
+- 一覧は COPY で一時テーブル（s3_inventory）に逐次投入し、メモリに全件を保持しない
+- 一時テーブルと archive_history を s3_path で突合（アンチジョイン）して以下を出力
+    孤立オブジェクト: S3にあるがDBに登録がない（アップロード後、DB登録前に異常終了した場合等）
+    欠損オブジェクト: DBに登録があるがS3にない
+    サイズ不一致: 両方にあるがサイズが異なる
+- 出力先: {log_directory}/reconcile_{YYYYMMDD_HHMMSS}_{orphans|missing|size_mismatch}.csv と .json（集計）
+
+プレフィックスの分割は、起点プレフィックスから --split-depth 階層まで区切り文字 "/" 付きで一覧を取得して行う。
+（キーのシャードプレフィックス（s3_key.shard_chars）を使用している場合は1階層目で十分に分散する）
+"""
+
+import argparse
+import csv
+import datetime
+import io
+import json
+import queue
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from archive_script_main import DEFAULT_CONFIG_PATH, ArchiveProcessor
+
+COPY_SQL = "COPY s3_inventory (s3_path, size, storage_class, last_modified) FROM STDIN WITH (FORMAT csv)"
+
+# 一覧1行: (s3_path, サイズ, ストレージクラス, 最終更新日時)
+InventoryRow = Tuple[str, int, str, str]
+
+
+class S3PrefixLister:
+    """プレフィックス単位の並列一覧取得クラス"""
+
+    def __init__(self, s3_client, bucket: str, workers: int, split_depth: int, retry_policy, logger):
+        """
+        Args:
+            s3_client: boto3 S3クライアント
+            bucket: バケット名
+            workers: 並列数
+            split_depth: 区切り文字付きの一覧取得でプレフィックスを分割する階層数
+            retry_policy: RetryPolicy（list_objects_v2 の再試行）
+            logger: ログ出力先
+        """
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.workers = max(1, workers)
+        self.split_depth = max(0, split_depth)
+        self.retry_policy = retry_policy
+        self.logger = logger
+        self.list_calls = 0
+        self.objects = 0
+
+    def _pages(self, prefix: str, delimiter: Optional[str] = None):
+        """list_objects_v2 のページング（ページごとにリトライ付き）"""
+        params = {'Bucket': self.bucket, 'Prefix': prefix, 'MaxKeys': 1000}
+        if delimiter:
+            params['Delimiter'] = delimiter
+        while True:
+            outcome = self.retry_policy.call(
+                lambda: self.s3_client.list_objects_v2(**params), 'list_objects', prefix
+            )
+            if not outcome['success']:
+                raise Exception(f"一覧取得失敗 ({prefix}): {self.retry_policy.failure_message(outcome)}")
+            response = outcome['result']
+            self.list_calls += 1
+            yield response
+            if not response.get('IsTruncated'):
+                return
+            params['ContinuationToken'] = response['NextContinuationToken']
+
+    def _rows(self, response: Dict) -> List[InventoryRow]:
+        rows = [
+            (f"s3://{self.bucket}/{item['Key']}", item.get('Size', 0), item.get('StorageClass', ''),
+             item['LastModified'].isoformat() if item.get('LastModified') else '')
+            for item in response.get('Contents', [])
+        ]
+        self.objects += len(rows)
+        return rows
+
+    def _split(self, prefix: str) -> Tuple[List[str], List[InventoryRow]]:
+        """区切り文字付き一覧（直下のプレフィックスと、直下のオブジェクト）"""
+        prefixes = []
+        rows = []
+        for response in self._pages(prefix, '/'):
+            prefixes.extend(item['Prefix'] for item in response.get('CommonPrefixes', []))
+            rows.extend(self._rows(response))
+        return prefixes, rows
+
+    def _list_prefix(self, prefix: str, pages: queue.Queue) -> None:
+        """プレフィックス配下の全オブジェクトをページ単位でキューへ投入（ワーカースレッド内で実行）"""
+        for response in self._pages(prefix):
+            rows = self._rows(response)
+            if rows:
+                pages.put(rows)
+
+    def run(self, root_prefix: str, write: Callable[[List[InventoryRow]], None]) -> int:
+        """
+        一覧取得の実行（write はメインスレッドからのみ呼び出す）
+
+        Returns:
+            int: 一覧を取得したプレフィックス数
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            # プレフィックスの分割（分割途中の階層にあるオブジェクトはここで出力）
+            level = [root_prefix]
+            for _ in range(self.split_depth):
+                next_level = []
+                for prefixes, rows in executor.map(self._split, level):
+                    next_level.extend(prefixes)
+                    if rows:
+                        write(rows)
+                if not next_level:
+                    self.logger.info("プレフィックス分割: 下位プレフィックスなし")
+                    return len(level)
+                level = next_level
+            self.logger.info(f"プレフィックス分割: {len(level)}件を{self.workers}並列で一覧取得")
+
+            # 分割後のプレフィックスを並列に一覧取得し、ページ単位でDBへ投入
+            pages = queue.Queue(maxsize=self.workers * 4)
+            futures = [executor.submit(self._list_prefix, prefix, pages) for prefix in level]
+            pending = list(futures)
+            last_log = time.monotonic()
+            while pending or not pages.empty():
+                try:
+                    write(pages.get(timeout=0.5))
+                except queue.Empty:
+                    pass
+                pending = [future for future in pending if not future.done()]
+                if time.monotonic() - last_log >= 30:
+                    last_log = time.monotonic()
+                    self.logger.info(f"一覧取得中: {self.objects:,}件 (残りプレフィックス: {len(pending)}件)")
+            for future in futures:
+                future.result()
+            return len(level)
+
+
+class InventoryTable:
+    """一時テーブル s3_inventory への COPY 投入と archive_history との突合"""
+
+    def __init__(self, conn, batch_rows: int = 50000):
+        self.conn = conn
+        self.batch_rows = batch_rows
+        self._buffer = []
+        self.rows = 0
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                CREATE TEMP TABLE s3_inventory (
+                    s3_path TEXT NOT NULL,
+                    size BIGINT,
+                    storage_class TEXT,
+                    last_modified TIMESTAMPTZ
+                ) ON COMMIT PRESERVE ROWS
+                """
+            )
+        conn.commit()
+
+    def write(self, rows: List[InventoryRow]) -> None:
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self.batch_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(self._buffer)
+        buffer.seek(0)
+        with self.conn.cursor() as cursor:
+            cursor.copy_expert(COPY_SQL, buffer)
+        self.conn.commit()
+        self.rows += len(self._buffer)
+        self._buffer = []
+
+    def finish(self) -> None:
+        """投入完了後のインデックス作成・統計情報更新"""
+        self.flush()
+        with self.conn.cursor() as cursor:
+            cursor.execute("CREATE INDEX ON s3_inventory (s3_path)")
+            cursor.execute("ANALYZE s3_inventory")
+        self.conn.commit()
+
+    def export(self, name: str, sql: str, params: Tuple, header: List[str], output_path: Path) -> int:
+        """突合結果をサーバサイドカーソルで順次取得してCSV出力"""
+        count = 0
+        with open(output_path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            with self.conn.cursor(name=f"reconcile_{name}") as cursor:
+                cursor.itersize = 10000
+                cursor.execute(sql, params)
+                for row in cursor:
+                    writer.writerow(row)
+                    count += 1
+        self.conn.commit()
+        return count
+
+
+ORPHANS_SQL = """
+    SELECT i.s3_path, i.size, i.storage_class, i.last_modified
+    FROM s3_inventory i
+    WHERE i.last_modified < %s
+      AND left(i.s3_path, %s) <> %s
+      AND NOT EXISTS (SELECT 1 FROM archive_history h WHERE h.s3_path = i.s3_path)
+    ORDER BY i.s3_path
+"""
+
+MISSING_SQL = """
+    SELECT h.id, h.request_id, h.original_file_path, h.s3_path, h.file_size, h.archive_date
+    FROM archive_history h
+    WHERE left(h.s3_path, %s) = %s
+      AND NOT EXISTS (SELECT 1 FROM s3_inventory i WHERE i.s3_path = h.s3_path)
+    ORDER BY h.s3_path
+"""
+
+SIZE_MISMATCH_SQL = """
+    SELECT h.id, h.request_id, h.original_file_path, h.s3_path, h.file_size, i.size
+    FROM archive_history h
+    JOIN s3_inventory i ON i.s3_path = h.s3_path
+    WHERE left(h.s3_path, %s) = %s
+      AND h.file_size IS DISTINCT FROM i.size
+    ORDER BY h.s3_path
+"""
+
+
+def reconcile(processor: ArchiveProcessor, prefix: str, workers: int, split_depth: int,
+              min_age_hours: float, batch_rows: int, output_dir: Path) -> Dict:
+    """突合の実行"""
+    logger = processor.logger
+    bucket = processor.config['aws']['s3_bucket'].strip()
+    path_prefix = f"s3://{bucket}/{prefix}"
+    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    output_dir.mkdir(parents=True, exist_ok=True)
+    logger.info(f"S3突合開始 - 対象: {path_prefix}")
+
+    s3_client = processor._initialize_s3_client()
+    conn = processor._connect_database()
+    try:
+        # 1. 一覧取得と一時テーブルへの投入
+        started = time.monotonic()
+        table = InventoryTable(conn, batch_rows)
+        lister = S3PrefixLister(s3_client, bucket, workers, split_depth, processor.retry_policy, logger)
+        prefix_count = lister.run(prefix, table.write)
+        table.finish()
+        listing_seconds = time.monotonic() - started
+        logger.info(f"一覧取得完了: {table.rows:,}件 / {prefix_count}プレフィックス / "
+                    f"list_objects_v2 {lister.list_calls:,}回 ({listing_seconds:,.1f}秒)")
+
+        # 2. archive_history との突合
+        # 一覧取得開始より min_age_hours 以上前に更新されたオブジェクトのみ孤立判定（実行中のアーカイブを除外）
+        started = time.monotonic()
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=min_age_hours)
+        # マニフェスト（archive_manifest.py）は履歴に登録されないため孤立判定から除外
+        manifest_prefix = processor.config.get('manifest', {}).get('prefix', '_manifests').strip('/')
+        manifest_prefix = f"s3://{bucket}/{manifest_prefix}/"
+        reports = {
+            'orphans': table.export(
+                'orphans', ORPHANS_SQL, (cutoff, len(manifest_prefix), manifest_prefix),
+                ['s3_path', 'size', 'storage_class', 'last_modified'],
+                output_dir / f"reconcile_{timestamp}_orphans.csv"
+            ),
+            'missing': table.export(
+                'missing', MISSING_SQL, (len(path_prefix), path_prefix),
+                ['id', 'request_id', 'original_file_path', 's3_path', 'file_size', 'archive_date'],
+                output_dir / f"reconcile_{timestamp}_missing.csv"
+            ),
+            'size_mismatch': table.export(
+                'size_mismatch', SIZE_MISMATCH_SQL, (len(path_prefix), path_prefix),
+                ['id', 'request_id', 'original_file_path', 's3_path', 'db_file_size', 's3_size'],
+                output_dir / f"reconcile_{timestamp}_size_mismatch.csv"
+            ),
+        }
+        diff_seconds = time.monotonic() - started
+    finally:
+        conn.close()
+
+    summary = {
+        'bucket': bucket,
+        'prefix': prefix,
+        'started_at': timestamp,
+        'objects': table.rows,
+        'prefixes': prefix_count,
+        'list_calls': lister.list_calls,
+        'listing_seconds': round(listing_seconds, 1),
+        'diff_seconds': round(diff_seconds, 1),
+        'min_age_hours': min_age_hours,
+        **reports,
+    }
+    with open(output_dir / f"reconcile_{timestamp}.json", 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    logger.info("=== S3突合結果 ===")
+    logger.info(f"孤立オブジェクト（DB未登録）: {reports['orphans']:,}件")
+    logger.info(f"欠損オブジェクト（S3になし）: {reports['missing']:,}件")
+    logger.info(f"サイズ不一致: {reports['size_mismatch']:,}件")
+    logger.info(f"突合所要時間: {diff_seconds:,.1f}秒 / 出力先: {output_dir}/reconcile_{timestamp}_*.csv")
+    return summary
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description='S3バケットとアーカイブ履歴の突合（孤立・欠損オブジェクトの検出）')
+    parser.add_argument('--config', default=DEFAULT_CONFIG_PATH,
+                        help=f'設定ファイルパス (デフォルト: {DEFAULT_CONFIG_PATH})')
+    parser.add_argument('--prefix', default='', help='突合対象のキープレフィックス (デフォルト: バケット全体)')
+    parser.add_argument('--workers', type=int, default=16, help='一覧取得の並列数 (デフォルト: 16)')
+    parser.add_argument('--split-depth', type=int, default=2,
+                        help='プレフィックスを分割する階層数 (デフォルト: 2)')
+    parser.add_argument('--min-age-hours', type=float, default=24.0,
+                        help='孤立判定の対象とするオブジェクトの経過時間 (デフォルト: 24)')
+    parser.add_argument('--batch-rows', type=int, default=50000, help='COPY 1回あたりの行数 (デフォルト: 50000)')
+    parser.add_argument('--output-dir', help='出力先ディレクトリ (デフォルト: ログディレクトリ)')
+
+    args = parser.parse_args()
+
+    try:
+        processor = ArchiveProcessor(args.config)
+        output_dir = Path(args.output_dir or processor.config.get('logging', {}).get('log_directory', 'logs'))
+        reconcile(processor, args.prefix, args.workers, args.split_depth,
+                  args.min_age_hours, args.batch_rows, output_dir)
+        return 0
+    except Exception as e:
+        print(f"❌ S3突合エラー: {str(e)}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,14 +3,19 @@
 """
 アーカイブスクリプト検証用テストデータ生成スクリプト
 サイズ混在のダミーファイルを生成
+- 大規模モード（--scale）: 数百万ファイル規模の深い・広いディレクトリツリーを並列生成
 """
 
 import os
 import random
 import argparse
+import bisect
 import datetime
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Tuple
+from typing import Iterator, List, Tuple
 
 class TestDataGenerator:
     """テストデータ生成クラス"""
@@ -215,6 +220,193 @@ class TestDataGenerator:
         
         print(f"CSV生成完了: {len(directories)}ディレクトリを記載")
 
+class ScaleTestDataGenerator:
+    """
+    大規模テストデータ生成クラス
+    
+    - 部署/年度/案件の階層を模した深い・広いディレクトリツリー
+    - ディレクトリごとのファイル数は偏りのある分布（一部のディレクトリに集中）
+    - 拡張子ごとの対数正規分布によるファイルサイズ
+    - 大きなファイルはスパースファイルとして作成（ディスク容量・書き込み時間を節約）
+    - ファイル作成はスレッドプールで並列実行し、バッチ単位で投入してメモリ使用量を抑える
+    """
+    
+    # (拡張子, 出現比率, サイズ中央値, 対数標準偏差)
+    EXTENSION_PROFILES = [
+        ('.txt',  8,  4 * 1024,           1.0),
+        ('.csv',  6,  50 * 1024,          1.5),
+        ('.docx', 18, 60 * 1024,          1.0),
+        ('.xlsx', 20, 80 * 1024,          1.2),
+        ('.pptx', 6,  2 * 1024 * 1024,    1.0),
+        ('.pdf',  18, 300 * 1024,         1.5),
+        ('.jpg',  12, 2560 * 1024,        0.6),
+        ('.msg',  6,  100 * 1024,         1.0),
+        ('.dwg',  3,  1536 * 1024,        1.0),
+        ('.zip',  2,  20 * 1024 * 1024,   1.5),
+        ('.mp4',  1,  200 * 1024 * 1024,  1.0),
+    ]
+    
+    DEPARTMENTS = ['営業部', '総務部', '経理部', '設計部', '開発部', '品質保証部', '製造部', '人事部']
+    NAME_WORDS = ['見積書', '議事録', '図面', '報告書', '契約書', '請求書', '写真', '資料',
+                  '仕様書', '検査記録', 'design', 'spec', 'report', 'minutes', 'backup']
+
+    # サイズ分布集計の区切り（1KB, 10KB, 100KB, 1MB, 10MB, 100MB, 1GB）
+    SIZE_BUCKET_BOUNDS = [1024 * 10 ** i for i in range(3)] + [1048576 * 10 ** i for i in range(3)] + [1073741824]
+    SIZE_BUCKET_LABELS = ['1KB未満', '1KB-10KB', '10KB-100KB', '100KB-1MB', '1MB-10MB',
+                          '10MB-100MB', '100MB-1GB', '1GB以上']
+
+    def __init__(self, seed: int = 0, workers: int = 8, sparse_threshold: int = 1024 * 1024,
+                 max_file_size: int = 1024 * 1024 * 1024, batch_size: int = 10000):
+        """
+        Args:
+            seed: 乱数シード（同じシードで同じツリーを再現）
+            workers: 並列書き込み数
+            sparse_threshold: このサイズ以上のファイルはスパースファイルとして作成
+            max_file_size: ファイルサイズ上限
+            batch_size: スレッドプールへの投入単位
+        """
+        self.rng = random.Random(seed)
+        self.workers = max(1, workers)
+        self.sparse_threshold = sparse_threshold
+        self.max_file_size = max_file_size
+        self.batch_size = batch_size
+        
+        self.file_count = 0
+        self.total_size = 0
+        self.sparse_files = 0
+        self.extension_counts = {}
+        self.size_buckets = {}
+        
+        weights = [profile[1] for profile in self.EXTENSION_PROFILES]
+        self._extension_cum_weights = list(itertools.accumulate(weights))
+    
+    def build_directory_tree(self, base_dir: str, top_dirs: int, depth: int, branch: int) -> Tuple[List[str], List[str]]:
+        """
+        ディレクトリツリーの作成
+        
+        Args:
+            base_dir: 出力ディレクトリ
+            top_dirs: 最上位ディレクトリ数（アーカイブ依頼CSVに記載する単位）
+            depth: 最上位ディレクトリ配下の階層数
+            branch: 各階層のサブディレクトリ数
+            
+        Returns:
+            (最上位ディレクトリのリスト, ファイル配置先となる全ディレクトリのリスト)
+        """
+        top_level = []
+        all_dirs = []
+        for i in range(top_dirs):
+            department = self.DEPARTMENTS[i % len(self.DEPARTMENTS)]
+            top = os.path.join(base_dir, f"{department}_{i + 1:03d}")
+            top_level.append(top)
+            
+            level = [top]
+            all_dirs.append(top)
+            for d in range(depth):
+                next_level = []
+                for parent in level:
+                    for b in range(branch):
+                        name = f"{2015 + b}年度" if d == 0 else f"案件_{d}_{b + 1:04d}"
+                        next_level.append(os.path.join(parent, name))
+                all_dirs.extend(next_level)
+                level = next_level
+        
+        for directory in all_dirs:
+            os.makedirs(directory, exist_ok=True)
+        
+        print(f"ディレクトリ作成完了: 最上位 {len(top_level)}個 / 全体 {len(all_dirs)}個")
+        return top_level, all_dirs
+    
+    def _file_specs(self, all_dirs: List[str], file_count: int) -> Iterator[Tuple[str, int, float]]:
+        """生成するファイルの (パス, サイズ, 更新日時) を順に返す"""
+        # ディレクトリごとの偏り（パレート分布: 一部のディレクトリにファイルが集中）
+        dir_weights = [self.rng.paretovariate(1.2) for _ in all_dirs]
+        dir_cum_weights = list(itertools.accumulate(dir_weights))
+        now = time.time()
+        
+        for index in range(file_count):
+            directory = all_dirs[bisect.bisect_left(dir_cum_weights, self.rng.random() * dir_cum_weights[-1])]
+            ext_index = bisect.bisect_left(self._extension_cum_weights,
+                                           self.rng.random() * self._extension_cum_weights[-1])
+            ext, _, median, sigma = self.EXTENSION_PROFILES[ext_index]
+            size = min(self.max_file_size, int(self.rng.lognormvariate(0, sigma) * median))
+            word = self.NAME_WORDS[self.rng.randrange(len(self.NAME_WORDS))]
+            filename = f"{word}_{index:08d}{ext}"
+            mtime = now - self.rng.uniform(0, 10 * 365 * 86400)  # 過去10年間に分布
+            yield os.path.join(directory, filename), size, mtime
+    
+    def _write_file(self, spec: Tuple[str, int, float]) -> bool:
+        """1ファイルの作成（スパースファイル対応）"""
+        file_path, size, mtime = spec
+        header = b'TEST_DATA_' * 4
+        with open(file_path, 'wb') as f:
+            if size >= self.sparse_threshold:
+                # 先頭のみ書き込み、残りは truncate で確保（実データは書き込まない）
+                f.write(header)
+                f.truncate(size)
+                sparse = True
+            else:
+                f.write((header * (size // len(header) + 1))[:size])
+                sparse = False
+        os.utime(file_path, (mtime, mtime))
+        return sparse
+    
+    def _record(self, size: int, ext: str) -> None:
+        """生成結果の集計"""
+        self.file_count += 1
+        self.total_size += size
+        self.extension_counts[ext] = self.extension_counts.get(ext, 0) + 1
+        bucket = bisect.bisect_right(self.SIZE_BUCKET_BOUNDS, size)
+        self.size_buckets[bucket] = self.size_buckets.get(bucket, 0) + 1
+    
+    def create_tree(self, base_dir: str, file_count: int, top_dirs: int = 10,
+                    depth: int = 3, branch: int = 5) -> List[str]:
+        """
+        大規模ツリーの生成
+        
+        Returns:
+            最上位ディレクトリのリスト（アーカイブ依頼CSVに記載）
+        """
+        print(f"大規模テストデータ生成開始: {file_count:,}ファイルを{base_dir}に作成 "
+              f"(並列数: {self.workers}, スパース閾値: {self.sparse_threshold:,} bytes)")
+        started = time.monotonic()
+        top_level, all_dirs = self.build_directory_tree(base_dir, top_dirs, depth, branch)
+        
+        specs = self._file_specs(all_dirs, file_count)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                batch = list(itertools.islice(specs, self.batch_size))
+                if not batch:
+                    break
+                for spec, sparse in zip(batch, executor.map(self._write_file, batch)):
+                    self._record(spec[1], os.path.splitext(spec[0])[1])
+                    self.sparse_files += 1 if sparse else 0
+                
+                elapsed = time.monotonic() - started
+                print(f"  生成中... {self.file_count:,}/{file_count:,} "
+                      f"({self.file_count / elapsed:,.0f} files/sec)")
+        
+        self._print_summary(base_dir, time.monotonic() - started)
+        return top_level
+    
+    def _print_summary(self, base_dir: str, elapsed: float) -> None:
+        """生成結果のサマリー表示"""
+        print(f"\n=== 大規模テストデータ生成完了 ===")
+        print(f"出力先: {base_dir}")
+        print(f"生成ファイル数: {self.file_count:,}")
+        print(f"総ファイルサイズ（論理）: {self.total_size / 1024 / 1024:,.2f} MB")
+        print(f"スパースファイル数: {self.sparse_files:,}")
+        print(f"所要時間: {elapsed:.1f}秒 ({self.file_count / elapsed:,.0f} files/sec)" if elapsed > 0 else "")
+        
+        print(f"\n拡張子別ファイル数:")
+        for ext, count in sorted(self.extension_counts.items(), key=lambda item: -item[1]):
+            print(f"  {ext}: {count:,}")
+        
+        print(f"\nファイルサイズ分布:")
+        for bucket in sorted(self.size_buckets):
+            print(f"  {self.SIZE_BUCKET_LABELS[bucket]}: {self.size_buckets[bucket]:,}")
+
+
 def main():
     """メイン処理"""
     parser = argparse.ArgumentParser(description='アーカイブスクリプト検証用テストデータ生成')
@@ -226,8 +418,42 @@ def main():
     parser.add_argument('--csv-output', default='test_archive_request.csv',
                        help='アーカイブ依頼CSV出力パス (デフォルト: test_archive_request.csv)')
     
+    # 大規模モード
+    parser.add_argument('--scale', action='store_true',
+                       help='大規模モード（深い・広いツリーに並列生成、大きなファイルはスパースファイル）')
+    parser.add_argument('--depth', type=int, default=3,
+                       help='大規模モード: 最上位ディレクトリ配下の階層数 (デフォルト: 3)')
+    parser.add_argument('--branch', type=int, default=5,
+                       help='大規模モード: 各階層のサブディレクトリ数 (デフォルト: 5)')
+    parser.add_argument('--workers', type=int, default=8,
+                       help='大規模モード: 並列書き込み数 (デフォルト: 8)')
+    parser.add_argument('--sparse-threshold', type=int, default=1048576,
+                       help='大規模モード: スパースファイルにするサイズ閾値 bytes (デフォルト: 1048576)')
+    parser.add_argument('--max-file-size', type=int, default=1073741824,
+                       help='大規模モード: ファイルサイズ上限 bytes (デフォルト: 1073741824)')
+    parser.add_argument('--seed', type=int, default=0,
+                       help='大規模モード: 乱数シード (デフォルト: 0)')
+    
     args = parser.parse_args()
     
+    if args.scale:
+        try:
+            generator = ScaleTestDataGenerator(
+                seed=args.seed,
+                workers=args.workers,
+                sparse_threshold=args.sparse_threshold,
+                max_file_size=args.max_file_size
+            )
+            directories = generator.create_tree(args.base_dir, args.file_count, args.dir_count,
+                                                args.depth, args.branch)
+            TestDataGenerator().generate_csv_file(directories, args.csv_output)
+            print(f"\n次のコマンドでアーカイブ処理を実行できます:")
+            print(f"python archive_script_main.py {args.csv_output} TEST-REQ-001")
+        except Exception as e:
+            print(f"❌ エラーが発生しました: {str(e)}")
+            return 1
+        return 0
+    
     try:
         generator = TestDataGenerator()
         
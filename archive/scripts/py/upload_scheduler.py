@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+アップロード順序スケジューラ
+- 大きいファイルから順に割り当て（LPT: Longest Processing Time first）
+- 小さいファイルは空いたワーカー枠を埋めるように後続へ配置
+- 計画内容（推定メイクスパン・ワーカー負荷）をログ出力
+"""
+
+import heapq
+import logging
+from operator import attrgetter
+from typing import List, Optional
+
+from file_records import FileRecord, FileRecordStore
+
+_SIZE = attrgetter('size')
+
+
+class UploadScheduler:
+    """サイズを考慮したアップロードキューの並び替えクラス"""
+
+    def __init__(self, workers: int = 1, small_file_threshold: int = 8388608,
+                 per_file_overhead_bytes: int = 262144,
+                 logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            workers: 並列ワーカー数
+            small_file_threshold: この値未満のファイルを小ファイルとして扱う（バイト）
+            per_file_overhead_bytes: 1ファイルあたりの固定コスト（リクエスト往復分をバイト換算）
+            logger: 計画出力先のロガー
+        """
+        self.workers = max(1, int(workers))
+        self.small_file_threshold = small_file_threshold
+        self.per_file_overhead_bytes = per_file_overhead_bytes
+        self.logger = logger or logging.getLogger(__name__)
+        self.last_plan = None
+
+    def _cost(self, record: FileRecord) -> int:
+        """ファイル1件の推定コスト（バイト換算）"""
+        return record.size + self.per_file_overhead_bytes
+
+    def plan(self, files: FileRecordStore) -> List[FileRecord]:
+        """
+        アップロード順序を計画
+
+        大ファイルを降順で先に流し、小ファイルは各ワーカーの空き時間を
+        埋める位置に配置する。共有キューから先頭順に取り出す前提で、
+        推定開始時刻の順に並べたリストを返却する。
+
+        Args:
+            files: 収集したファイル（FileRecordStore、キューのタスクは from_mappings で変換済みのもの）
+
+        Returns:
+            List[FileRecord]: 並び替え後のファイルリスト（要素は元のレコード）
+        """
+        if not files:
+            self.last_plan = None
+            return []
+
+        large_files = [record for record in files if record.size >= self.small_file_threshold]
+        small_files = [record for record in files if record.size < self.small_file_threshold]
+        large_files.sort(key=_SIZE, reverse=True)
+        small_files.sort(key=_SIZE, reverse=True)
+
+        # ワーカー毎の推定負荷を最小ヒープで管理（負荷, ワーカー番号）
+        slots = [(0, worker_id) for worker_id in range(self.workers)]
+        heapq.heapify(slots)
+        worker_loads = [0] * self.workers
+        scheduled = []  # (推定開始位置, 投入順, ファイル)
+
+        for record in large_files + small_files:
+            load, worker_id = heapq.heappop(slots)
+            scheduled.append((load, len(scheduled), record))
+            load += self._cost(record)
+            worker_loads[worker_id] = load
+            heapq.heappush(slots, (load, worker_id))
+
+        scheduled.sort(key=lambda item: (item[0], item[1]))
+        ordered_files = [record for _, _, record in scheduled]
+
+        makespan = max(worker_loads)
+        total_cost = sum(worker_loads)
+        self.last_plan = {
+            'workers': self.workers,
+            'total_files': len(files),
+            'large_files': len(large_files),
+            'small_files': len(small_files),
+            'small_file_threshold': self.small_file_threshold,
+            'estimated_makespan_bytes': makespan,
+            'ideal_makespan_bytes': total_cost // self.workers,
+            'worker_loads': worker_loads,
+            'largest_files': [(record.path, record.size) for record in large_files[:5]]
+        }
+        return ordered_files
+
+    def log_plan(self, worker_bytes_per_sec: Optional[float] = None) -> None:
+        """直近の計画内容をログ出力（ワーカー1本あたりの転送速度があれば所要時間も推定）"""
+        plan = self.last_plan
+        if not plan:
+            return
+
+        self.logger.info("=== アップロード計画 ===")
+        self.logger.info(f"並列ワーカー数: {plan['workers']}")
+        self.logger.info(f"対象ファイル数: {plan['total_files']}件 "
+                         f"(大: {plan['large_files']}件 / 小: {plan['small_files']}件, "
+                         f"閾値: {plan['small_file_threshold']:,} bytes)")
+        self.logger.info(f"推定メイクスパン: {plan['estimated_makespan_bytes']:,} bytes "
+                         f"(理想値: {plan['ideal_makespan_bytes']:,} bytes)")
+
+        loads = plan['worker_loads']
+        if loads and max(loads) > 0:
+            balance = min(loads) / max(loads) * 100
+            self.logger.info(f"ワーカー負荷バランス: {balance:.1f}% (最小/最大)")
+
+        if worker_bytes_per_sec:
+            estimated_seconds = plan['estimated_makespan_bytes'] / worker_bytes_per_sec
+            self.logger.info(f"推定所要時間: {estimated_seconds:,.0f}秒")
+
+        for i, (path, size) in enumerate(plan['largest_files'], 1):
+            self.logger.info(f"  大ファイル {i}: {path} ({size:,} bytes)")
@@ -4,6 +4,10 @@
 -- データベース作成（必要に応じて）
 -- CREATE DATABASE archive_system;
 
+-- 既存DBへの列追加（file_mtime・checksum、アーカイブ済み判定用）
+-- ALTER TABLE archive_history ADD COLUMN IF NOT EXISTS file_mtime DOUBLE PRECISION;
+-- ALTER TABLE archive_history ADD COLUMN IF NOT EXISTS checksum VARCHAR(64);
+
 -- テーブル作成前の準備
 DROP TABLE IF EXISTS archive_history CASCADE;
 
@@ -17,6 +21,8 @@ CREATE TABLE archive_history (
     s3_path TEXT NOT NULL,
     archive_date TIMESTAMP NOT NULL,
     file_size BIGINT CHECK (file_size >= 0),
+    file_mtime DOUBLE PRECISION,  -- アーカイブ時の元ファイル更新日時（epoch秒）
+    checksum VARCHAR(64),  -- アーカイブ時の元ファイルSHA-256（manifest.checksum=sha256 の場合のみ）
     created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
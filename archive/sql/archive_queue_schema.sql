@@ -0,0 +1,70 @@
+-- アーカイブ作業キュー データベース作成スクリプト
+-- PostgreSQL用（archive_history と同じデータベースに作成）
+-- 複数ワーカー（複数プロセス・複数EC2）でファイル単位のタスクを分担処理する
+
+-- テーブル作成前の準備
+DROP TABLE IF EXISTS archive_tasks CASCADE;
+DROP TABLE IF EXISTS archive_jobs CASCADE;
+
+-- アーカイブジョブテーブル（依頼1件 = 1ジョブ）
+CREATE TABLE archive_jobs (
+    job_id BIGSERIAL PRIMARY KEY,
+    request_id VARCHAR(50) NOT NULL UNIQUE,
+    requester VARCHAR(8) NOT NULL CHECK (requester ~ '^\d{8}$'),
+    csv_path TEXT NOT NULL,
+    -- completed: 全タスク成功 / failed: 失敗タスクを含んで終了
+    status VARCHAR(20) NOT NULL DEFAULT 'pending'
+        CHECK (status IN ('pending', 'running', 'completed', 'failed')),
+    total_tasks INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    completed_at TIMESTAMP
+);
+
+-- アーカイブタスクテーブル（ファイル1件 = 1タスク）
+CREATE TABLE archive_tasks (
+    task_id BIGSERIAL PRIMARY KEY,
+    job_id BIGINT NOT NULL REFERENCES archive_jobs(job_id) ON DELETE CASCADE,
+    file_path TEXT NOT NULL,
+    directory TEXT NOT NULL,
+    file_size BIGINT CHECK (file_size >= 0),
+    modified_time TIMESTAMP,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending'
+        CHECK (status IN ('pending', 'running', 'completed', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker_id VARCHAR(100),
+    s3_key TEXT,
+    error TEXT,
+    claimed_at TIMESTAMP,
+    completed_at TIMESTAMP,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (job_id, file_path)
+);
+
+-- 取得待ちタスクの検索用（SELECT ... FOR UPDATE SKIP LOCKED で使用）
+CREATE INDEX idx_archive_tasks_pending ON archive_tasks(job_id, task_id) WHERE status = 'pending';
+
+-- 処理中タスクの期限切れ検出用
+CREATE INDEX idx_archive_tasks_running ON archive_tasks(claimed_at) WHERE status = 'running';
+
+-- ジョブ単位の集計用
+CREATE INDEX idx_archive_tasks_job_status ON archive_tasks(job_id, status);
+
+-- updated_atの自動更新トリガー（archive_db_schema.sql の関数を利用）
+CREATE TRIGGER update_archive_jobs_updated_at
+    BEFORE UPDATE ON archive_jobs
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- 進捗確認用クエリ
+SELECT
+    j.request_id,
+    j.status,
+    j.total_tasks,
+    COUNT(*) FILTER (WHERE t.status = 'completed') AS completed,
+    COUNT(*) FILTER (WHERE t.status = 'failed') AS failed,
+    COUNT(*) FILTER (WHERE t.status = 'running') AS running,
+    COUNT(*) FILTER (WHERE t.status = 'pending') AS pending
+FROM archive_jobs j
+LEFT JOIN archive_tasks t ON t.job_id = j.job_id
+GROUP BY j.job_id
+ORDER BY j.created_at;